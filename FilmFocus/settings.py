@@ -66,6 +66,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'webapp.page_cache.page_cache_version',
             ],
         },
     },
@@ -84,6 +85,21 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory cache, per process. A shared backend (Redis, Memcached or FileBasedCache) can be swapped in here
+# when running several worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'filmfocus',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,6 +142,16 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Letterboxd scrape cache
+# Parsed rating pages are reused for this many seconds, then revalidated with their ETag/Last-Modified
+LETTERBOXD_CACHE_TTL = 60 * 60 * 24 * 7
+# Movies whose Letterboxd page was not found are probed again after this many days, doubling with each miss
+LETTERBOXD_MISS_BACKOFF_DAYS = 7
+# Seconds the pages and movie cards of anonymous users stay cached, unless a movie changes first
+PAGE_CACHE_SECONDS = 60 * 15
+# TMDB person searches and person movie credits are reused for this many seconds
+TMDB_PERSON_CACHE_TTL = 60 * 60 * 24
+
 # Email Settings
 # Currently using a placeholder mail host
 # To run python's test smtp mail server:
@@ -30,7 +30,7 @@ from update_tmdb_master_list import update_tmdb_master_list
 # Handle the test display page and manage the movie database
 def api_fetch_data():
     # Initialize settings list
-    settings = [False] * 9
+    settings = [False] * 10
 
     # popular_pages is the main method for getting a mass amount of new movies
     popular_pages = 20              # Number of popular pages from 1 to x with 20 results each, TMDb
@@ -47,6 +47,7 @@ def api_fetch_data():
         'update_letterboxd',                    # settings[6], performed on entire movie database
         'update_omdb_movie_ratings',            # settings[7], performed on entire movie database
         'update_all_db_movie_entries',          # settings[8], Takes a while, performs updates on all movies in db (ratings, streaming, recs)
+        'update_movie_credits',                 # settings[9], performed on movies stored without credits
     ]
 
     descriptions = [
@@ -59,6 +60,7 @@ def api_fetch_data():
         'Updates all movie Letterboxd info from webscraper',
         'Updates all movie IMDb, RT, and Metacritic ratings from OMDB',
         'Updates all movie entries (letterboxd, streaming, ratings, recs)',
+        'Fetches the TMDB directors and actors of movies stored without them',
     ]
 
     # Print the menu
@@ -128,8 +130,7 @@ def api_fetch_data():
             timer(function_name="update_letterboxd_ratings", fetch_func=update_letterboxd_ratings, args={})
             timer(function_name='update_omdb_movie_ratings', fetch_func=update_omdb_movie_ratings, args={})
         if get_recommendations:
-            # timer(function_name='update_movie_recommendations', fetch_func=update_movie_recommendations, args={})     # needs to be threaded
-            pass
+            timer(function_name='update_movie_recommendations', fetch_func=update_movie_recommendations, args={})
         if get_streaming:
             timer(function_name='update_streaming_providers', fetch_func=update_streaming_providers, args={})
         if get_movies:
@@ -137,6 +138,9 @@ def api_fetch_data():
             timer(function_name='fetch_now_playing_movies', fetch_func=fetch_now_playing_movies, args={'start_page': 1, 'end_page': now_playing_pages })
             timer(function_name='fetch_tmdb_discover_movies', fetch_func=fetch_tmdb_discover_movies, args={'start_page': 1, 'end_page': fetch_discover_count})
 
+    if settings[9]:
+        timer(function_name='update_movie_credits', fetch_func=update_movie_credits, args={})
+
     # Prints which settings are set
     print("==========================")
     for flag, setting in zip(flags, settings):
@@ -1,61 +1,52 @@
 import json
 import requests
 import os
+import sys
 import datetime
 import gzip
+import io
 
-def update_tmdb_master_list():
-    # Define the URL for downloading the TMDB master movie list
-    today = datetime.date.today().strftime("%m_%d_%Y")  # Get today's date in "MM_DD_YYYY" format
-    download_url = f"http://files.tmdb.org/p/exports/movie_ids_{today}.json.gz"
-
-    # Specify the file paths
-    download_file_path = "tmdb_movie_master_list.json.gz"
-    output_file_path = "webapp/data/tmdb_master_movie_list.json"
-
-    # Download the TMDB master movie list
-    response = requests.get(download_url)
-
-    # Check if the download was successful
-    if response.status_code == 200:
-        # Save the downloaded file
-        with open(download_file_path, 'wb') as download_file:
-            download_file.write(response.content)
+# Get the directory of the current script
+current_dir = os.path.dirname(os.path.abspath(__file__))
+# Append the parent directory (FilmFocus) to the system path
+parent_dir = os.path.abspath(os.path.join(current_dir, os.pardir))
+sys.path.append(parent_dir)
 
-        print("Download completed. File saved as:", download_file_path)
+from webapp.master_list_store import update_master_list, MASTER_LIST_DB
 
-        # Decompress the downloaded file
-        with gzip.open(download_file_path, 'rb') as compressed_file:
-            # Read the decompressed data
-            data = compressed_file.readlines()
 
-        # Initialize list to store the converted data
-        converted_data = []
-
-        # Process each line of data
-        for line in data:
-            # Parse JSON from each line
+# Stream (id, original title) pairs out of the gzipped TMDB export, one line at a time
+def stream_movie_entries(response):
+    # GzipFile reads the raw socket stream in chunks and decompresses incrementally
+    with gzip.GzipFile(fileobj=response.raw) as decompressed_file:
+        for line in io.TextIOWrapper(decompressed_file, encoding='utf-8'):
+            if not line.strip():
+                continue
             movie_data = json.loads(line)
+            yield movie_data["id"], movie_data["original_title"]
+
 
-            # Extract relevant fields and create a dictionary
-            movie_entry = {
-                "original_title": movie_data["original_title"],
-                "id": movie_data["id"]
-            }
+def update_tmdb_master_list():
+    # Define the URL for downloading the TMDB master movie list
+    today = datetime.date.today().strftime("%m_%d_%Y")  # Get today's date in "MM_DD_YYYY" format
+    download_url = f"http://files.tmdb.org/p/exports/movie_ids_{today}.json.gz"
 
-            # Append the dictionary to the list
-            converted_data.append(movie_entry)
+    # Specify the file path
+    output_file_path = MASTER_LIST_DB
 
-        # Write the converted data to the output file
-        with open(output_file_path, 'w') as output_file:
-            json.dump(converted_data, output_file, indent=4)
+    # Stream the TMDB master movie list instead of downloading it into memory
+    with requests.get(download_url, stream=True, timeout=30) as response:
+        # Check if the download was successful
+        if response.status_code != 200:
+            print("Failed to download the TMDB master movie list.")
+            return
 
-        print("Processing completed. Output file saved as:", output_file_path)
+        # Apply the export to the master list store, only new, renamed and removed ids are written
+        # A truncated download raises before anything is committed, so the previous list is kept
+        counts = update_master_list(stream_movie_entries(response), output_file_path)
 
-        # Delete the downloaded file to clean up
-        os.remove(download_file_path)
-    else:
-        print("Failed to download the TMDB master movie list.")
+    print(f"Processing completed: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed.")
+    print("Output file saved as:", output_file_path)
 
 if __name__ == "__main__":
-    update_tmdb_master_list()
\ No newline at end of file
+    update_tmdb_master_list()
@@ -9,4 +9,9 @@ admin.site.register(UserProfile)
 admin.site.register(Watchlist)
 admin.site.register(WatchlistEntry)
 admin.site.register(FriendRequest)
-admin.site.register(MovieRating)
\ No newline at end of file
+admin.site.register(MovieRating)
+admin.site.register(LetterboxdRatingCache)
+admin.site.register(Person)
+admin.site.register(Credit)
+admin.site.register(PersonSearchCache)
+admin.site.register(PersonCreditsCache)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class WebappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webapp'
+
+    # Connect the page cache invalidation and filter index update signals
+    def ready(self):
+        import webapp.page_cache
+        import webapp.filter_index
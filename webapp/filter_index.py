@@ -0,0 +1,287 @@
+"""
+Name of code artifact: filter_index.py
+Brief description: In-memory filter index of the Movie database, with a bitset per genre and per streaming provider, and
+                    sorted release year and IMDb rating values with the bitset of their movies. Resolves any catalog
+                    filter to the ordered list of matching movie ids without querying the database.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: 10/18/2026
+Brief description of each revision & author: Initial creation of the filter index (agent)
+                                              Reads of the shared index hold its lock, like the updates (agent)
+                                              Bulk writes update the index in place instead of discarding it (agent)
+Preconditions: Django environment must be set up correctly.
+Acceptable and unacceptable input values or types: FilterIndex expects (id, release_year, imdb_rating_num) movie rows in
+                                                   id order, and (movie_id, genre_id) and (movie_id, provider_id) rows.
+Postconditions: FilterIndex.filter() and filter_movies() return the ids of the matching movies, in id order.
+Return values or types: Lists of Movie ids (ints).
+Error and exception condition values or types that can occur: None expected; unknown genres and providers match no movies.
+Side effects: get_filter_index() builds the index from the database on first use (three queries), and again once it is
+              older than FILTER_INDEX_MAX_AGE or was invalidated. Signals, add_movies() and update_links() change the
+              built index in place.
+Invariants: Bit i of every bitset is the movie at position i of FilterIndex.movie_ids.
+            The shared index is only read or changed while holding _index_lock.
+Any known faults: The index is per process. Changes made by another process (e.g. the data scripts) are only seen
+                  once the index is rebuilt.
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+from itertools import compress
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from webapp.models import Movie
+
+FILTER_INDEX_MAX_AGE = 60 * 15      # Seconds before the index is rebuilt, to pick up changes made by other processes
+
+
+class FilterIndex:
+    """Bitsets of the movies by genre, streaming provider, release year and IMDb rating."""
+
+    def __init__(self, movies=(), genre_rows=(), provider_rows=()):
+        self.movie_ids = []                 # Movie id at each bit position, in id order
+        self.positions = {}                 # Movie id -> bit position
+        self.movie_values = {}              # Movie id -> (release_year, imdb_rating)
+        self.all_bits = 0
+        self.link_bits = {'genre': defaultdict(int), 'provider': defaultdict(int)}     # Genre/provider id -> bitset
+        self.movie_links = {'genre': defaultdict(set), 'provider': defaultdict(set)}   # Movie id -> genre/provider ids
+        self.value_bits = {'year': {}, 'rating': {}}                                    # Year/rating -> bitset
+        self.sorted_values = {'year': [], 'rating': []}                                 # Sorted keys of value_bits
+        for movie_id, release_year, imdb_rating in movies:
+            self.set_movie(movie_id, release_year, imdb_rating)
+        for movie_id, genre_id in genre_rows:
+            self.add_links('genre', movie_id, [genre_id])
+        for movie_id, provider_id in provider_rows:
+            self.add_links('provider', movie_id, [provider_id])
+
+    def __len__(self):
+        return len(self.positions)
+
+    # Set a bit in the bitset of a year or rating value
+    def _add_value(self, kind, value, bit):
+        if value is None:
+            return
+        if value not in self.value_bits[kind]:
+            bisect.insort(self.sorted_values[kind], value)
+            self.value_bits[kind][value] = 0
+        self.value_bits[kind][value] |= bit
+
+    def _remove_value(self, kind, value, bit):
+        if value is not None and value in self.value_bits[kind]:
+            self.value_bits[kind][value] &= ~bit
+
+    # Add or update a movie. Returns False if a new movie's id is lower than the last one, the index must be rebuilt
+    def set_movie(self, movie_id, release_year, imdb_rating):
+        imdb_rating = round(imdb_rating, 1) if imdb_rating is not None else None
+        if movie_id in self.positions:
+            bit = 1 << self.positions[movie_id]
+            old_year, old_rating = self.movie_values[movie_id]
+            self._remove_value('year', old_year, bit)
+            self._remove_value('rating', old_rating, bit)
+        elif self.movie_ids and movie_id <= self.movie_ids[-1]:
+            return False
+        else:
+            self.positions[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+            bit = 1 << self.positions[movie_id]
+            self.all_bits |= bit
+        self.movie_values[movie_id] = (release_year, imdb_rating)
+        self._add_value('year', release_year, bit)
+        self._add_value('rating', imdb_rating, bit)
+        return True
+
+    # Remove a movie, its position stays unused until the index is rebuilt
+    def remove_movie(self, movie_id):
+        if movie_id not in self.positions:
+            return
+        self.clear_links('genre', movie_id)
+        self.clear_links('provider', movie_id)
+        bit = 1 << self.positions.pop(movie_id)
+        release_year, imdb_rating = self.movie_values.pop(movie_id)
+        self._remove_value('year', release_year, bit)
+        self._remove_value('rating', imdb_rating, bit)
+        self.all_bits &= ~bit
+
+    # Add genres or providers (kind 'genre' or 'provider') to a movie
+    def add_links(self, kind, movie_id, link_ids):
+        if movie_id not in self.positions:
+            return
+        bit = 1 << self.positions[movie_id]
+        for link_id in link_ids:
+            self.link_bits[kind][link_id] |= bit
+            self.movie_links[kind][movie_id].add(link_id)
+
+    def remove_links(self, kind, movie_id, link_ids):
+        if movie_id not in self.positions:
+            return
+        bit = 1 << self.positions[movie_id]
+        for link_id in link_ids:
+            self.link_bits[kind][link_id] &= ~bit
+            self.movie_links[kind][movie_id].discard(link_id)
+
+    def clear_links(self, kind, movie_id):
+        self.remove_links(kind, movie_id, list(self.movie_links[kind].get(movie_id, ())))
+
+    # Bitset of the movies with any of the genres or providers
+    def _links_bitset(self, kind, link_ids):
+        bits = 0
+        for link_id in link_ids:
+            bits |= self.link_bits[kind].get(link_id, 0)
+        return bits
+
+    # Bitset of the movies with a year or rating between begin and end, inclusive
+    def _range_bitset(self, kind, begin, end):
+        values = self.sorted_values[kind]
+        bits = 0
+        for value in values[bisect.bisect_left(values, begin):bisect.bisect_right(values, end)]:
+            bits |= self.value_bits[kind][value]
+        return bits
+
+    # Ids of the movies matching every given filter, in id order
+    # Genres and providers match movies with any of the ids, include_unrated also matches movies without a rating
+    def filter(self, genre_ids=None, provider_ids=None, year_range=None, rating_range=None, include_unrated=False,
+               movie_ids=None):
+        bits = self.all_bits
+        if movie_ids is not None:
+            bits &= sum(1 << self.positions[movie_id] for movie_id in set(movie_ids) if movie_id in self.positions)
+        if genre_ids:
+            bits &= self._links_bitset('genre', genre_ids)
+        if provider_ids:
+            bits &= self._links_bitset('provider', provider_ids)
+        if year_range is not None:
+            bits &= self._range_bitset('year', *year_range)
+        if rating_range is not None:
+            rating_bits = self._range_bitset('rating', *rating_range)
+            if include_unrated:
+                rating_bits |= bits & ~self._rated_bitset()
+            bits &= rating_bits
+        return self.bitset_to_ids(bits)
+
+    # Bitset of the movies with a rating
+    def _rated_bitset(self):
+        bits = 0
+        for value_bits in self.value_bits['rating'].values():
+            bits |= value_bits
+        return bits
+
+    # Movie ids of the set bits, in position order
+    def bitset_to_ids(self, bits):
+        if not bits:
+            return []
+        return list(compress(self.movie_ids, (bit == '1' for bit in bin(bits)[:1:-1])))
+
+
+_filter_index = None
+_built_at = 0
+_index_lock = threading.RLock()     # Held to build, update or read the shared index
+
+
+# Build the index from the database
+def build_filter_index():
+    return FilterIndex(
+        Movie.objects.order_by('id').values_list('id', 'release_year', 'imdb_rating_num'),
+        Movie.genres.through.objects.values_list('movie_id', 'genre_id'),
+        Movie.streaming_providers.through.objects.values_list('movie_id', 'streamingprovider_id'))
+
+
+# The filter index of this process, built on first use and when it is older than FILTER_INDEX_MAX_AGE
+def get_filter_index():
+    global _filter_index, _built_at
+    with _index_lock:
+        if _filter_index is None or time.monotonic() - _built_at > FILTER_INDEX_MAX_AGE:
+            _filter_index = build_filter_index()
+            _built_at = time.monotonic()
+        return _filter_index
+
+
+# Ids of the movies matching the filters of FilterIndex.filter(), from the shared index
+# The lock is held for the whole read, so an update applied by another thread is never seen half done
+def filter_movies(**filters):
+    with _index_lock:
+        return get_filter_index().filter(**filters)
+
+
+# Rebuild the index on next use, for explicit full resets
+# Bulk writes that send no signals apply their changes with add_movies() and update_links() instead
+def invalidate_filter_index():
+    global _filter_index
+    with _index_lock:
+        _filter_index = None
+
+
+# Apply a change to the index once it is committed, if the index was built
+# An update returning False cannot be applied in place, and the index is rebuilt on next use instead
+def update_filter_index(update):
+    def apply_update():
+        global _filter_index
+        with _index_lock:
+            if _filter_index is not None and update(_filter_index) is False:
+                _filter_index = None
+    transaction.on_commit(apply_update)
+
+
+# Add movies written with bulk_create(), which sends no signals, to the index once they are committed
+# genre_rows and provider_rows are the (movie_id, genre_id) and (movie_id, provider_id) rows of the new movies
+def add_movies(movies, genre_rows=(), provider_rows=()):
+    movie_rows = sorted((movie.pk, movie.release_year, movie.imdb_rating_num) for movie in movies)
+    genre_rows = list(genre_rows)
+    provider_rows = list(provider_rows)
+
+    def update(index):
+        for movie_id, release_year, imdb_rating in movie_rows:
+            if not index.set_movie(movie_id, release_year, imdb_rating):
+                return False
+        for movie_id, genre_id in genre_rows:
+            index.add_links('genre', movie_id, [genre_id])
+        for movie_id, provider_id in provider_rows:
+            index.add_links('provider', movie_id, [provider_id])
+    update_filter_index(update)
+
+
+# Apply genre or provider rows (kind 'genre' or 'provider') added or removed in bulk to the index once committed
+# added_rows and removed_rows are (movie_id, genre_id/provider_id) pairs
+def update_links(kind, added_rows=(), removed_rows=()):
+    added_rows = list(added_rows)
+    removed_rows = list(removed_rows)
+
+    def update(index):
+        for movie_id, link_id in removed_rows:
+            index.remove_links(kind, movie_id, [link_id])
+        for movie_id, link_id in added_rows:
+            index.add_links(kind, movie_id, [link_id])
+    update_filter_index(update)
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, **kwargs):
+    update_filter_index(lambda index: index.set_movie(instance.pk, instance.release_year, instance.imdb_rating_num))
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    movie_id = instance.pk
+    update_filter_index(lambda index: index.remove_movie(movie_id))
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.streaming_providers.through)
+def movie_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    kind = 'genre' if sender is Movie.genres.through else 'provider'
+    if action == 'post_clear' and not reverse:
+        update_filter_index(lambda index: index.clear_links(kind, instance.pk))
+    elif action in ('post_add', 'post_remove'):
+        # From the movie side pk_set holds genre/provider ids, from the genre/provider side it holds movie ids
+        pairs = [(pk, instance.pk) for pk in pk_set] if reverse else [(instance.pk, pk) for pk in pk_set]
+
+        def update(index):
+            for movie_id, link_id in pairs:
+                if action == 'post_add':
+                    index.add_links(kind, movie_id, [link_id])
+                else:
+                    index.remove_links(kind, movie_id, [link_id])
+        update_filter_index(update)
+    elif action == 'post_clear':
+        # A genre or provider lost all of its movies, rebuild
+        transaction.on_commit(invalidate_filter_index)
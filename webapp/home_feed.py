@@ -0,0 +1,116 @@
+"""
+Name of code artifact: home_feed.py
+Brief description: Precomputed home page carousels (New, Popular, Top Rated and More Movies). Several randomized
+                    "shuffles" are kept in the cache and one is picked per request, so the home page does not query
+                    the Movie database. The shuffles are rotated, one at a time, as they get older than the refresh interval.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: 10/18/2026
+Brief description of each revision & author: Initial creation of the home feed (agent)
+                                              Sorted the carousels by the numeric popularity and IMDb rating columns (agent)
+Preconditions: Django environment must be set up correctly, with a cache backend (the default local memory cache works).
+Acceptable and unacceptable input values or types: get_movie_cards() expects a list of Movie ids.
+Postconditions: get_home_feed() returns a dictionary of the four carousels, each a list of Movie instances with their
+                genres and top streaming providers prefetched.
+Return values or types: Dictionaries of lists of Movie instances, or querysets of Movie for get_movie_cards().
+Error and exception condition values or types that can occur: None expected; an empty database gives empty carousels.
+Side effects: Reads and writes the home feed cache entries.
+Invariants: At most HOME_FEED_SHUFFLES shuffles are cached, and at most one request at a time builds a new shuffle.
+Any known faults: New movies only appear on the home page once the shuffles have been rotated or refreshed.
+"""
+
+import random
+import time
+from django.core.cache import cache
+from django.db.models import Case, When
+from webapp.models import Movie
+
+HOME_FEED_SHUFFLES = 6                  # Randomized versions of the home page kept in the cache
+HOME_FEED_REFRESH_SECONDS = 15 * 60     # Age after which the oldest shuffle is replaced by a new one
+HOME_FEED_CACHE_KEY = 'home_feed:shuffles'
+HOME_FEED_LOCK_KEY = 'home_feed:lock'
+HOME_FEED_LOCK_SECONDS = 60             # Longest time a request can hold the lock while building a shuffle
+
+
+# Movies with the given ids, in the order of the ids, with the genres and top streaming providers of the movie cards
+def get_movie_cards(movie_ids):
+    if not movie_ids:
+        return Movie.objects.none()
+    preserved_order = Case(*[When(id=movie_id, then=position) for position, movie_id in enumerate(movie_ids)])
+    return (Movie.objects.filter(id__in=movie_ids)
+            .prefetch_related('genres', 'top_streaming_providers')
+            .order_by(preserved_order))
+
+
+# Build one randomized version of the home page carousels
+# Movies are sampled by id, so only the selected movies are loaded, with their related data prefetched
+def build_shuffle():
+    # Fetch 24 random movies from the now_playing movies for "New Movies"
+    now_playing_ids = list(Movie.objects.filter(now_playing=True).values_list('id', flat=True))
+    new_ids = random.sample(now_playing_ids, min(24, len(now_playing_ids)))
+
+    # Order movies by tmdb_popularity in descending order, exclude the new movies, and take the top 200
+    # The numeric column is sorted by its index, movies without a popularity are left out
+    top_200_popular_ids = list(Movie.objects.exclude(id__in=new_ids)
+                               .filter(tmdb_popularity_num__isnull=False)
+                               .order_by('-tmdb_popularity_num')
+                               .values_list('id', flat=True)[:200])
+    # Randomly select 24 movies from the top 200
+    popular_ids = random.sample(top_200_popular_ids, min(24, len(top_200_popular_ids)))
+
+    # Fetch the top 200 movies based on imdb_rating
+    top_200_rated_ids = list(Movie.objects.exclude(id__in=new_ids + popular_ids)
+                             .filter(imdb_rating_num__isnull=False)
+                             .order_by('-imdb_rating_num')
+                             .values_list('id', flat=True)[:200])
+    # Randomly select 30 movies from the top 200
+    top_rated_ids = random.sample(top_200_rated_ids, min(30, len(top_200_rated_ids)))
+
+    # Fetch 120 random movies for "More Movies", excluding the ones already selected in new_movies, popular_movies, and top_rated_movies
+    selected_ids = set(new_ids + popular_ids + top_rated_ids)
+    remaining_ids = [movie_id for movie_id in Movie.objects.values_list('id', flat=True) if movie_id not in selected_ids]
+    more_ids = random.sample(remaining_ids, min(120, len(remaining_ids)))
+
+    # The cards do not show the recommendations, leave them out of the cache
+    def load(movie_ids):
+        return list(get_movie_cards(movie_ids).defer('recommended_movie_data'))
+
+    top_rated_movies = load(top_rated_ids)
+    # Sorts the selected 30 movies by their imdb_rating, with None values at the end
+    top_rated_movies.sort(key=lambda movie: (movie.imdb_rating_num is not None, movie.imdb_rating_num or 0), reverse=True)
+
+    return {
+        'new_movies': load(new_ids),
+        'popular_movies': load(popular_ids),
+        'top_rated_movies': top_rated_movies,
+        'more_movies': load(more_ids),
+    }
+
+
+# Carousels for a home page request, picked from the cached shuffles
+# While there are fewer than HOME_FEED_SHUFFLES shuffles, or the oldest is due for a refresh, the request that holds
+# the lock builds one new shuffle, so the rebuild cost is spread over time instead of paid by every request.
+def get_home_feed():
+    shuffles = cache.get(HOME_FEED_CACHE_KEY) or []     # List of (built_at, shuffle)
+    rotation_due = len(shuffles) < HOME_FEED_SHUFFLES or shuffles[0][0] < time.time() - HOME_FEED_REFRESH_SECONDS
+
+    if rotation_due and cache.add(HOME_FEED_LOCK_KEY, True, HOME_FEED_LOCK_SECONDS):
+        try:
+            shuffle = build_shuffle()
+            shuffles = (shuffles + [(time.time(), shuffle)])[-HOME_FEED_SHUFFLES:]
+            cache.set(HOME_FEED_CACHE_KEY, shuffles, None)
+            return shuffle
+        finally:
+            cache.delete(HOME_FEED_LOCK_KEY)
+
+    if not shuffles:
+        # Another request is building the first shuffle
+        return build_shuffle()
+    return random.choice(shuffles)[1]
+
+
+# Replace every cached shuffle, e.g. after a large import of movies
+def refresh_home_feed():
+    shuffles = [(time.time(), build_shuffle()) for _ in range(HOME_FEED_SHUFFLES)]
+    cache.set(HOME_FEED_CACHE_KEY, shuffles, None)
+    return len(shuffles)
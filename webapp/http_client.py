@@ -0,0 +1,94 @@
+"""
+Name of code artifact: http_client.py
+Brief description: Shared HTTP client for every upstream API and scraper (TMDB, OMDB, Letterboxd, JustWatch), with pooled
+                    keep-alive connections, a per-host token-bucket rate limiter, retries with backoff, and timeouts.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: 10/18/2026
+Brief description of each revision & author: Initial creation of the shared HTTP client (agent)
+                                              Made create_session() public for the adaptive JustWatch scraper (agent)
+Preconditions: None. This module does not depend on Django.
+Acceptable and unacceptable input values or types: get() accepts the same arguments as requests.get().
+Postconditions: Requests to a host never exceed that host's configured rate.
+Return values or types: get() returns a requests.Response.
+Error and exception condition values or types that can occur: requests.RequestException (including Timeout) once retries are exhausted.
+Side effects: Calls to get() may block until the host's rate limiter allows the request.
+Invariants: Every request to a rate-limited host takes one token from that host's bucket.
+Any known faults: Rate limits are per process; several processes running bulk jobs at once share the upstream budget.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (5, 30)       # (connect, read) timeout in seconds
+POOL_SIZE = 32                  # Keep-alive connections kept open per host
+
+# Requests per second and burst size for each upstream host
+HOST_RATE_LIMITS = {
+    'api.themoviedb.org': (40, 40),                 # TMDB allows around 50 calls/second, keep some headroom
+    'www.omdbapi.com': (100000 / 86400, 5000),      # OMDB is limited to 100,000 calls/day
+    'letterboxd.com': (8, 8),
+    # www.justwatch.com is paced adaptively by the JustWatch scraper (see just_watch_scraper.RateController)
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills at `rate` tokens per second up to `capacity` tokens."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Take a token, sleeping until one is available
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token even if the bucket is empty, so waiting callers are served in order
+            self._tokens -= 1
+            wait_seconds = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+
+# Build a session with connection pooling and retries on rate limiting and server errors
+# Scrapers that pace themselves from the 429 responses pass retries=0 to see every response
+def create_session(retries=3):
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET', 'HEAD'],
+        respect_retry_after_header=True,
+        raise_on_status=False,      # Return the last response so callers can handle the status code
+    )
+    adapter = HTTPAdapter(pool_connections=len(HOST_RATE_LIMITS), pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+session = create_session()
+rate_limiters = {host: TokenBucket(rate, capacity) for host, (rate, capacity) in HOST_RATE_LIMITS.items()}
+
+
+# Wait for the rate limiter of the URL's host, if it has one
+def wait_for_rate_limit(url):
+    limiter = rate_limiters.get(urlsplit(url).hostname)
+    if limiter:
+        limiter.acquire()
+
+
+# Send a rate-limited GET request through the shared session
+def get(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    wait_for_rate_limit(url)
+    return session.get(url, timeout=timeout, **kwargs)
@@ -0,0 +1,176 @@
+"""
+Name of code artifact: hydration_queue.py
+Brief description: Background queue that ingests movies which are referenced (e.g. as recommendations) but not yet in the
+                    Movie database, so the TMDB/OMDB/JustWatch/Letterboxd fetches happen off the request path.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: 10/18/2026
+Brief description of each revision & author: Initial creation of the hydration queue and worker threads (agent)
+                                              Added jobs, whose status is polled by the actor and director pages (agent)
+Preconditions: Django environment must be set up correctly. webapp.services must be importable by the worker threads.
+Acceptable and unacceptable input values or types: enqueue_movies() expects an iterable of TMDB ids (ints); None values are ignored.
+                                                   enqueue_job() expects a function returning such an iterable, and its arguments.
+Postconditions: Enqueued TMDB ids are ingested into the Movie database by a worker thread.
+Return values or types: enqueue_movies() returns the number of ids that were newly queued. enqueue_job() returns a job id
+                        (str), and job_status() a dict with the job's TMDB ids, pending count and done flag, or None.
+Error and exception condition values or types that can occur: Errors raised while ingesting a movie or resolving the ids
+                                                              of a job are printed and the worker continues.
+Side effects: Starts daemon worker threads on first use; workers modify the database.
+Invariants: A TMDB id is queued or in flight at most once per process.
+Any known faults: Deduplication is per process; separate gunicorn workers may ingest the same id once each.
+                  Jobs are also per process, their status is only known to the process that started them.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+HYDRATION_WORKERS = 4           # Number of background threads ingesting movies
+SKIP_SECONDS = 6 * 60 * 60      # How long an id that was not ingested (adult, no poster, banned) is left out of the queue
+JOB_SECONDS = 60 * 60           # How long the status of a job is kept after its last change
+
+_pending = queue.Queue()        # TMDB ids waiting to be ingested
+_queued_ids = set()             # TMDB ids currently queued or being ingested, used to deduplicate across requests
+_skipped_until = {}             # TMDB id -> timestamp until which the id is not queued again
+_jobs = {}                      # Job id -> {'tmdb_ids', 'pending' (ids not ingested yet), 'resolved', 'updated_at'}
+_queued_lock = threading.Lock()
+_workers = []
+
+
+# Queue TMDB ids for background ingestion, skipping ids that are already queued or in flight
+def enqueue_movies(tmdb_ids):
+    with _queued_lock:
+        queued_count, _ = _queue_ids(tmdb_ids)
+    return queued_count
+
+
+# Queue TMDB ids, caller must hold _queued_lock
+# Returns the number of ids newly queued, and the set of the given ids that are queued or in flight after the call
+def _queue_ids(tmdb_ids):
+    queued_count = 0
+    accepted_ids = set()
+    now = time.time()
+    for tmdb_id in tmdb_ids:
+        if tmdb_id is None or _skipped_until.get(tmdb_id, 0) > now:
+            continue
+        accepted_ids.add(tmdb_id)
+        if tmdb_id in _queued_ids:
+            continue
+        _queued_ids.add(tmdb_id)
+        _pending.put(tmdb_id)
+        queued_count += 1
+    if queued_count:
+        _start_workers()
+    return queued_count, accepted_ids
+
+
+# Start a job ingesting the TMDB ids returned by resolve(*args), e.g. the movies of a person
+# The ids are resolved on a separate thread, so the caller returns at once with the job id for job_status()
+def enqueue_job(resolve, *args):
+    job_id = uuid.uuid4().hex
+    with _queued_lock:
+        _prune_jobs()
+        _jobs[job_id] = {'tmdb_ids': [], 'pending': set(), 'resolved': False, 'updated_at': time.time()}
+    threading.Thread(target=_resolve_job, args=(job_id, resolve, args), name=f'hydration-job-{job_id[:8]}', daemon=True).start()
+    return job_id
+
+
+# Status of a job, None if it is unknown or expired
+# done is True once the ids of the job are resolved and all of them were ingested (or could not be)
+def job_status(job_id):
+    with _queued_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {
+            'tmdb_ids': list(job['tmdb_ids']),
+            'pending': len(job['pending']),
+            'done': job['resolved'] and not job['pending'],
+        }
+
+
+# Resolve the TMDB ids of a job and queue them
+def _resolve_job(job_id, resolve, args):
+    tmdb_ids = []
+    try:
+        close_old_connections()
+        tmdb_ids = [tmdb_id for tmdb_id in resolve(*args) if tmdb_id is not None]
+    except Exception as e:
+        print(f"Hydration job {job_id} could not resolve its movies: {e}")
+    finally:
+        close_old_connections()
+    with _queued_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        _, job['pending'] = _queue_ids(tmdb_ids)
+        job['tmdb_ids'] = tmdb_ids
+        job['resolved'] = True
+        job['updated_at'] = time.time()
+
+
+# Forget the jobs that have not changed for JOB_SECONDS, caller must hold _queued_lock
+def _prune_jobs():
+    expired = time.time() - JOB_SECONDS
+    for job_id in [job_id for job_id, job in _jobs.items() if job['updated_at'] < expired]:
+        del _jobs[job_id]
+
+
+# Drop the skipped ids whose deadline has passed, so ids that are never requested again do not pile up
+# Caller must hold _queued_lock
+def _prune_skipped(now):
+    for tmdb_id in [tmdb_id for tmdb_id, until in _skipped_until.items() if until <= now]:
+        del _skipped_until[tmdb_id]
+
+
+# Number of TMDB ids currently queued or in flight
+def pending_count():
+    with _queued_lock:
+        return len(_queued_ids)
+
+
+# Start the worker threads once per process, caller must hold _queued_lock
+def _start_workers():
+    if _workers:
+        return
+    for index in range(HYDRATION_WORKERS):
+        worker = threading.Thread(target=_run_worker, name=f'hydration-worker-{index}', daemon=True)
+        _workers.append(worker)
+        worker.start()
+
+
+# Worker loop that ingests queued movies one at a time
+def _run_worker():
+    # Dynamically import the services so this module can be imported from models.py
+    search_and_fetch_movie_by_id = import_string('webapp.services.search_and_fetch_movie_by_id')
+    Movie = import_string('webapp.models.Movie')
+    while True:
+        tmdb_id = _pending.get()
+        ingested = False
+        try:
+            close_old_connections()
+            search_and_fetch_movie_by_id(tmdb_id)
+            ingested = Movie.objects.filter(tmdb_id=tmdb_id).exists()
+        except Exception as e:
+            print(f"Hydration failed for movie (ID: {tmdb_id}): {e}")
+        finally:
+            close_old_connections()
+            _finish_movie(tmdb_id, ingested)
+            _pending.task_done()
+
+
+# Mark a TMDB id as no longer in flight, and as done in the jobs waiting for it
+def _finish_movie(tmdb_id, ingested):
+    with _queued_lock:
+        _queued_ids.discard(tmdb_id)
+        if not ingested:
+            now = time.time()
+            _prune_skipped(now)
+            _skipped_until[tmdb_id] = now + SKIP_SECONDS
+        for job in _jobs.values():
+            if tmdb_id in job['pending']:
+                job['pending'].discard(tmdb_id)
+                job['updated_at'] = time.time()
@@ -0,0 +1,248 @@
+"""
+Name of code artifact: ingestion.py
+Brief description: asyncio ingestion engine that fetches TMDB list pages concurrently, fans the new movie ids out to a
+                    bounded pool of detail fetchers, and commits the fetched movies to the database in batches.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: 10/18/2026
+Brief description of each revision & author: Initial creation of the ingestion engine and its sources (agent)
+                                              Invalidated the page cache after bulk writes (agent)
+                                              Stored the numeric popularity column in PopularSource (agent)
+                                              Stopped invalidating pages on popularity and now_playing updates (agent)
+                                              Existing movie updates are written by the committer, not the page fetches (agent)
+Preconditions: Django environment must be set up correctly, and necessary environment variables (API keys) must be available.
+Acceptable and unacceptable input values or types: ingest_movies() expects the name of a registered source (see SOURCES).
+Postconditions: New movies from the source are stored in the Movie database; existing movies are updated by the source.
+Return values or types: ingest_movies() returns the number of new movies stored.
+Error and exception condition values or types that can occur: Errors fetching a single page or movie are printed and skipped.
+Side effects: Modifies the database.
+Invariants: Database writes happen on one thread at a time, one transaction per batch.
+Any known faults: None.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from importlib import import_module
+from django.db import close_old_connections
+import webapp.http_client as http_client
+from webapp.models import Movie, parse_number
+
+DETAIL_WORKERS = 20         # Movies fetched from the upstream APIs at the same time
+PAGE_FETCHES = 10           # List pages fetched at the same time
+COMMIT_BATCH_SIZE = 20      # Movies stored per database transaction
+
+
+class IngestionSource:
+    """A TMDB listing that provides movies to ingest. Subclasses describe the URLs and how to read them."""
+
+    name = None
+    now_playing = False     # Mark the new movies from this source as now playing
+    paged = True            # Whether the listing uses start_page/end_page
+
+    def __init__(self, **options):
+        self.options = options
+
+    # URL of a list page
+    def page_url(self, page_num):
+        raise NotImplementedError
+
+    # Movie entries from a list page response
+    def extract(self, page_data):
+        return page_data.get('results', [])
+
+    # Whether a new movie from the listing should be fetched
+    def accept(self, movie_data, page_num):
+        return True
+
+    # Called once before any page is fetched
+    def before_run(self):
+        pass
+
+    # Update the movies from a page that are already in the database
+    def update_existing(self, existing_movies, movie_data_by_id):
+        pass
+
+
+class PopularSource(IngestionSource):
+    name = 'popular'
+
+    def page_url(self, page_num):
+        return f"{services().TMDB_BASE_URL}/movie/popular?language=en-US&page={page_num}"
+
+    # Avoid obscure foreign films
+    def accept(self, movie_data, page_num):
+        if page_num > 40 and movie_data.get('original_language') != 'en':
+            print(f"Skipped {movie_data.get('original_language')} film: {movie_data.get('title')} ")
+            return False
+        return True
+
+    # Refresh the tmdb_popularity of movies already in the database
+    # Only the home feed uses the popularity, its rotation picks up the change
+    def update_existing(self, existing_movies, movie_data_by_id):
+        for movie in existing_movies:
+            movie.tmdb_popularity = movie_data_by_id[movie.tmdb_id].get('popularity')
+            movie.tmdb_popularity_num = parse_number(movie.tmdb_popularity)
+        Movie.objects.bulk_update(existing_movies, ['tmdb_popularity', 'tmdb_popularity_num'])
+
+
+class NowPlayingSource(IngestionSource):
+    name = 'now_playing'
+    now_playing = True
+
+    def page_url(self, page_num):
+        return f"{services().TMDB_BASE_URL}/movie/now_playing?language=en-US&page={page_num}"
+
+    # Set now_playing to False for all movies, the listing marks the current ones again
+    # Like the popularity, now_playing is only used by the home feed
+    def before_run(self):
+        Movie.objects.update(now_playing=False)
+
+    def update_existing(self, existing_movies, movie_data_by_id):
+        Movie.objects.filter(pk__in=[movie.pk for movie in existing_movies],
+                             release_year__in=services().NOW_PLAYING_YEARS).update(now_playing=True)
+
+
+class DiscoverSource(IngestionSource):
+    name = 'discover'
+
+    def page_url(self, page_num):
+        return f"{services().TMDB_BASE_URL}/discover/movie?sort_by=popularity.desc&language=en-US&page={page_num}"
+
+
+class PersonCreditsSource(IngestionSource):
+    """Movies credited to a TMDB person. Options: person_id, and role ('actor' or 'director')."""
+
+    name = 'person_credits'
+    paged = False
+
+    def page_url(self, page_num):
+        return f"{services().TMDB_BASE_URL}/person/{self.options['person_id']}/movie_credits"
+
+    def extract(self, page_data):
+        if self.options.get('role') == 'director':
+            return [crew_member for crew_member in page_data.get('crew', [])
+                    if crew_member.get('job') == 'Director' and crew_member.get('release_date')]
+        # Leading roles in released movies with some popularity
+        return [cast_member for cast_member in page_data.get('cast', [])
+                if cast_member.get('order', 99) < 2 and cast_member.get('release_date')
+                and cast_member.get('popularity', 0) > 5]
+
+
+SOURCES = {source.name: source for source in (PopularSource, NowPlayingSource, DiscoverSource, PersonCreditsSource)}
+
+
+# Register an additional ingestion source
+def register_source(source_class):
+    SOURCES[source_class.name] = source_class
+    return source_class
+
+
+# The services module is imported lazily, since it imports this module's callers
+def services():
+    return import_module('webapp.services')
+
+
+# Run a blocking function (HTTP or ORM) on a worker thread, with its own database connection
+async def run_blocking(function, *args, **kwargs):
+    def call():
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return await asyncio.to_thread(call)
+
+
+# Fetch the movies of a source between start_page and end_page and store the new ones
+def ingest_movies(source_name, start_page=1, end_page=5, detail_workers=DETAIL_WORKERS,
+                  batch_size=COMMIT_BATCH_SIZE, **source_options):
+    source = SOURCES[source_name](**source_options)
+    if not source.paged:
+        start_page = end_page = 1
+    return asyncio.run(_ingest(source, start_page, end_page, detail_workers, batch_size))
+
+
+async def _ingest(source, start_page, end_page, detail_workers, batch_size):
+    # Enough threads for every detail fetcher, page fetch and the committer to run at once
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=detail_workers + PAGE_FETCHES + 1))
+    await run_blocking(source.before_run)
+
+    movie_queue = asyncio.Queue(maxsize=detail_workers * 2)     # Movie ids waiting for the detail fetchers
+    record_queue = asyncio.Queue()                              # Fetched movies and existing movie updates waiting to be committed
+    queued_ids = set()                                          # Ids already queued by an earlier page
+    page_limit = asyncio.Semaphore(PAGE_FETCHES)
+    total_pages = end_page - start_page + 1
+    progress = {'pages': 0, 'stored': 0}
+
+    # List page stage: fetch a page, queue the update of the movies already stored, and queue the new ones
+    async def fetch_page(page_num):
+        async with page_limit:
+            try:
+                response = await run_blocking(http_client.get, source.page_url(page_num), headers=services().HEADERS)
+                response.raise_for_status()
+                movies_data = source.extract(response.json())
+            except Exception as e:
+                print(f"Failed to fetch {source.name} page {page_num}: {e}")
+                movies_data = []
+
+        movie_data_by_id = {movie_data['id']: movie_data for movie_data in movies_data if movie_data.get('id')}
+        existing_movies = await run_blocking(
+            lambda: list(Movie.objects.filter(tmdb_id__in=list(movie_data_by_id))))
+        if existing_movies:
+            # Written by the committer, so only one thread writes to the database
+            await record_queue.put(partial(source.update_existing, existing_movies, movie_data_by_id))
+        existing_ids = {movie.tmdb_id for movie in existing_movies}
+
+        for tmdb_id, movie_data in movie_data_by_id.items():
+            if tmdb_id in existing_ids or tmdb_id in queued_ids or str(tmdb_id) in services().BAN_LIST:
+                continue
+            if not source.accept(movie_data, page_num):
+                continue
+            queued_ids.add(tmdb_id)
+            await movie_queue.put(tmdb_id)
+
+        progress['pages'] += 1
+        services().progress_bar_iteration(f'Fetching {source.name} movies', progress['pages'], total_pages)
+
+    # Detail stage: fetch a movie from the upstream APIs without touching the database
+    async def detail_worker():
+        while True:
+            tmdb_id = await movie_queue.get()
+            try:
+                movie_record = await run_blocking(services().fetch_movie_record, tmdb_id, source.now_playing)
+                if movie_record:
+                    await record_queue.put(movie_record)
+            except Exception as e:
+                print(f"An error occurred fetching movie (ID: {tmdb_id}): {e}")
+            finally:
+                movie_queue.task_done()
+
+    # Commit stage: store fetched movies in batches, one transaction per batch, and apply the existing movie updates
+    async def committer():
+        batch = []
+        while True:
+            movie_record = await record_queue.get()
+            if movie_record is None:
+                break
+            if callable(movie_record):
+                await run_blocking(movie_record)
+                continue
+            batch.append(movie_record)
+            if len(batch) >= batch_size:
+                progress['stored'] += len(await run_blocking(services().save_movie_records, batch))
+                batch = []
+        if batch:
+            progress['stored'] += len(await run_blocking(services().save_movie_records, batch))
+
+    workers = [asyncio.create_task(detail_worker()) for _ in range(detail_workers)]
+    commit_task = asyncio.create_task(committer())
+
+    await asyncio.gather(*(fetch_page(page_num) for page_num in range(start_page, end_page + 1)))
+    await movie_queue.join()
+    for worker in workers:
+        worker.cancel()
+    await record_queue.put(None)
+    await commit_task
+
+    print(f"Stored {progress['stored']} new movies from {source.name}.")
+    return progress['stored']
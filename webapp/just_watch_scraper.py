@@ -1,10 +1,111 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import asyncio
+import email.utils
+import re
+import threading
 import time
-import random
+import requests
+import webapp.http_client as http_client
 from webapp.models import Movie
 
 PROVIDER_LIST = ["Tubi TV", "Pluto TV", "Freevee"]
+MAX_ATTEMPTS = 4                # Attempts per page before giving up, 429s, server errors and connection errors are retried
+MAX_CONCURRENT_MOVIES = 8       # Movies scraped at the same time by fetch_justwatch_many()
+
+# Only the elements read by find_search_result() and parse_movie_page() are built into the parse tree
+# While parsing, the strainer sees the whole class attribute (e.g. "buybox-row stream"), hence the patterns
+SEARCH_STRAINER = SoupStrainer("div", class_=re.compile(r"(^|\s)title-list-row__row(\s|$)"))
+MOVIE_PAGE_STRAINER = SoupStrainer("div", class_=re.compile(r"(^|\s)(title-block|buybox-row)(\s|$)"))
+
+# JustWatch pages are requested without urllib3 retries, so the rate controller sees every 429
+session = http_client.create_session(retries=0)
+
+
+class RateController:
+    """AIMD request pacing shared by every JustWatch request, across threads and event loops.
+    The rate grows additively while requests succeed, and is cut multiplicatively on a 429, a server error or a failed
+    connection, which also pauses all requests for the Retry-After duration (default_pause without one)."""
+
+    def __init__(self, rate=2.0, min_rate=0.2, max_rate=10.0, increase=0.1, decrease=0.5, default_pause=10):
+        self.rate = rate                    # Requests per second
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase            # Added to the rate after each successful request
+        self.decrease = decrease            # Multiplies the rate after a 429, server error or failed connection
+        self.default_pause = default_pause  # Pause in seconds after a back off without Retry-After
+        self._next_time = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    # Reserve the next request slot and return how long to wait for it
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time)
+            self._next_time = slot + 1 / self.rate
+            return slot - now
+
+    # Wait for the next request slot, and for any pause that started while waiting
+    async def acquire(self):
+        await asyncio.sleep(self.reserve())
+        while time.monotonic() < self._paused_until:
+            await asyncio.sleep(self._paused_until - time.monotonic())
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_rate_limited(self, retry_after=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            pause = retry_after if retry_after is not None else self.default_pause
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._next_time = max(self._next_time, self._paused_until)
+
+
+rate_controller = RateController()
+
+
+# Seconds to wait from a Retry-After header, given either in seconds or as an HTTP date
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_time.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Fetch a JustWatch page paced by the rate controller, returning None once MAX_ATTEMPTS are used up
+# Only 2xx responses raise the rate. 429s, server errors and failed connections lower it and are retried after the
+# pause, other responses (e.g. 404) are returned as they are.
+async def fetch_page(url, controller=None):
+    controller = controller or rate_controller
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await controller.acquire()
+        try:
+            response = await asyncio.to_thread(session.get, url, timeout=http_client.DEFAULT_TIMEOUT)
+        except requests.RequestException as e:
+            controller.on_rate_limited()
+            print(f"JustWatch request failed ({attempt}/{MAX_ATTEMPTS}): {url}: {e}")
+            continue
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            controller.on_rate_limited(retry_after)
+            print(f"Received {response.status_code} status code for {url} ({attempt}/{MAX_ATTEMPTS}), "
+                  f"rate lowered to {controller.rate:.2f} requests/sec")
+            continue
+        if 200 <= response.status_code < 300:
+            controller.on_success()
+        return response
+    print(f"Giving up on {url} after {MAX_ATTEMPTS} attempts")
+    return None
+
 
 def generate_movie_justwatch_url(movie):
     slug = movie.title.lower().replace(" ", "-").replace(":", "").replace("&", "and")
@@ -14,30 +115,32 @@ def generate_search_justwatch_url(movie):
     formatted_title = '+'.join(movie.title.split())
     return f"https://www.justwatch.com/us/search?q={formatted_title}"
 
+# Find the JustWatch URL of the movie among the rows of a parsed search page
+def find_search_result(soup, movie):
+    # Find all title rows
+    title_rows = soup.find_all("div", class_="title-list-row__row")
+    # Loop through title rows to find matching movie
+    for row in title_rows:
+        # Extract title
+        title_element = row.find("span", class_="header-title")
+        if title_element:
+            title = title_element.text.strip()
+            # Check if the title matches the movie we're looking for
+            if title == movie.title:
+                # Extract the URL from the anchor tag within the row
+                anchor_tag = row.find("a")
+                if anchor_tag and "href" in anchor_tag.attrs:
+                    url = anchor_tag["href"]
+                    return f"https://www.justwatch.com{url}"
+    return None
+
 def fetch_search_justwatch(response, movie):
     try:
         # Check if the response is successful
         if response.status_code == 200:
-            # Parse the HTML content of the page
-            soup = BeautifulSoup(response.content, 'html.parser')
-            # Find all title rows
-            title_rows = soup.find_all("div", class_="title-list-row__row")
-            # Loop through title rows to find matching movie
-            for row in title_rows:
-                # Extract title
-                title_element = row.find("span", class_="header-title")
-                if title_element:
-                    title = title_element.text.strip()
-                    # Check if the title matches the movie we're looking for
-                    if title == movie.title:
-                        # Extract the URL from the anchor tag within the row
-                        anchor_tag = row.find("a")
-                        if anchor_tag and "href" in anchor_tag.attrs:
-                            url = anchor_tag["href"]
-                            return f"https://www.justwatch.com{url}"
-            return None
-        elif response.status_code == 429:
-            return 429
+            # Parse only the title rows of the page
+            soup = BeautifulSoup(response.content, 'lxml', parse_only=SEARCH_STRAINER)
+            return find_search_result(soup, movie)
         else:
             print(f"Failed JustWatch scrape for {movie.title} : status code {response.status_code}")
             return None
@@ -81,86 +184,69 @@ def parse_movie_page(movie, soup, jw_url_movie):
     return None, successful, jw_url_movie
 
 
-def fetch_search_loop(movie, jw_url_search):
-    sleep_add = 0
-    jw_url_movie = None    
-    while True:
-        time.sleep(random.uniform(0, 3))
-        response = requests.get(jw_url_search)
-        if response.status_code == 200:
-            jw_url_movie = fetch_search_justwatch(response, movie)
-            return jw_url_movie
-        elif response.status_code == 429:
-            sleep_time = sleep_add + 10
-            sleep_add += 5
-            print(f"Received 429 status code for search request. Retrying in {sleep_time} seconds...")
-            time.sleep(sleep_time)
-        else:
-            print(f"Failed JustWatch scrape for {movie.title} (search request): status code {response.status_code}")
-            return jw_url_movie
+# Find the JustWatch URL of a movie through the search page
+async def fetch_search_url(movie):
+    response = await fetch_page(generate_search_justwatch_url(movie))
+    if response is None:
+        return None
+    return fetch_search_justwatch(response, movie)
 
 
-def fetch_movie_loop(movie, jw_url_movie, add_delay=False):
-    sleep_add = 0
-    while True:
-        if add_delay:   # Add a delay for update_streaming_providers()
-            time.sleep(1.5)
-        time.sleep(random.uniform(0, 4))
-        response = requests.get(jw_url_movie)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            return parse_movie_page(movie, soup, jw_url_movie)
-        elif response.status_code == 429:
-            sleep_time = sleep_add + 10
-            sleep_add += 5
-            print(f"Received 429 status code for movie request. Retrying in {sleep_time} seconds...")
-            time.sleep(sleep_time)
-        else:
-            print(f"Failed JW scrape for {movie.title} (movie request): status code {response.status_code}")
-            return None, False, jw_url_movie
+# Fetch a movie page and parse it, returns (found_providers, successful, jw_url_movie)
+async def fetch_movie_page(movie, jw_url_movie):
+    response = await fetch_page(jw_url_movie)
+    if response is None:
+        return None, False, jw_url_movie
+    if response.status_code != 200:
+        print(f"Failed JW scrape for {movie.title} (movie request): status code {response.status_code}")
+        return None, False, jw_url_movie
+    # Parse only the title block and the offer rows of the page
+    soup = BeautifulSoup(response.content, 'lxml', parse_only=MOVIE_PAGE_STRAINER)
+    return parse_movie_page(movie, soup, jw_url_movie)
 
 
-def fetch_justwatch(movie, add_delay=False, count=0):
+# Find the Tubi TV, Pluto TV, and Freevee offers of a movie, returns (found_providers, jw_url_movie)
+async def fetch_justwatch_async(movie):
+    jw_url_movie = movie.justwatch_url
     try:
-        jw_url_movie = movie.justwatch_url
-
         if jw_url_movie:
             if jw_url_movie == "Not Found":
                 return [], jw_url_movie
-        
-            found_providers, successful, jw_url_movie = fetch_movie_loop(movie, jw_url_movie, add_delay)
+
+            found_providers, successful, jw_url_movie = await fetch_movie_page(movie, jw_url_movie)
             # If fetching is successful, return the list of providers
             return found_providers, jw_url_movie
-        else:
-            # If JustWatch URL is not available and it's the first attempt
-            if count == 0:      # f"https://www.justwatch.com/us/search?q={formatted_title}"
-                # Generate JustWatch search URL for the movie
-                jw_url_search = generate_search_justwatch_url(movie)
-                # Fetch JustWatch URL through search
-                jw_url_movie = fetch_search_loop(movie, jw_url_search)
-                if jw_url_movie:
-                    found_providers, successful, jw_url_movie = fetch_movie_loop(movie, jw_url_movie, add_delay)
-                    # If fetching is successful, return the list of providers
-                    if successful:
-                        return found_providers, jw_url_movie
-                return fetch_justwatch(movie, count=1)
-            elif count == 1:    # f"https://www.justwatch.com/us/movie/{slug}"
-                jw_url_movie = generate_movie_justwatch_url(movie)
-                found_providers, successful, jw_url_movie = fetch_movie_loop(movie, jw_url_movie, add_delay)
-                # If fetching is successful, return the list of providers
-                if successful:
-                    return found_providers, jw_url_movie
-                return fetch_justwatch(movie, count=2)
-            elif count == 2:    # f"https://www.justwatch.com/us/movie/{slug}-{movie.release_year}"
-                jw_url_movie = generate_movie_justwatch_url(movie)
-                jw_url_movie = f"{jw_url_movie}-{movie.release_year}"
-                found_providers, successful, jw_url_movie = fetch_movie_loop(movie, jw_url_movie, add_delay)
-                # If fetching is successful, return the list of providers
-                if successful:
-                    return found_providers, jw_url_movie
-                return [], None
-            else:
-                return [], None
+
+        # Without a JustWatch URL, try the search result, then f"https://www.justwatch.com/us/movie/{slug}",
+        # then f"https://www.justwatch.com/us/movie/{slug}-{movie.release_year}"
+        candidate_urls = [generate_movie_justwatch_url(movie), f"{generate_movie_justwatch_url(movie)}-{movie.release_year}"]
+        jw_url_search = await fetch_search_url(movie)
+        if jw_url_search:
+            candidate_urls.insert(0, jw_url_search)
+        for candidate_url in candidate_urls:
+            found_providers, successful, jw_url_movie = await fetch_movie_page(movie, candidate_url)
+            if successful:
+                return found_providers, jw_url_movie
+        return [], None
     except Exception as e:
         print(f"An error occurred: {e}")
-    return [], jw_url_movie
\ No newline at end of file
+    return [], jw_url_movie
+
+
+# Scrape several movies concurrently, returns (found_providers, jw_url_movie) for each movie, in order
+async def fetch_justwatch_many_async(movies, concurrency=MAX_CONCURRENT_MOVIES):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def fetch(movie):
+        async with limit:
+            return await fetch_justwatch_async(movie)
+
+    return await asyncio.gather(*(fetch(movie) for movie in movies))
+
+
+# Synchronous entry points, interrupting them (e.g. Ctrl+C) cancels the pending requests
+def fetch_justwatch(movie):
+    return asyncio.run(fetch_justwatch_async(movie))
+
+def fetch_justwatch_many(movies, concurrency=MAX_CONCURRENT_MOVIES):
+    return asyncio.run(fetch_justwatch_many_async(movies, concurrency))
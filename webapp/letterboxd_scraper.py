@@ -4,10 +4,10 @@ letterboxd_scraper.py
 Description:
     This script is designed to scrape the movie rating information from letterboxd.com. It retrieves details such as histogram counts and weights of ratings, and calculates the weighted average rating for a given movie. The script uses requests to fetch data from web pages and BeautifulSoup for HTML parsing.
 
-    Caching functionality is included to minimize redundant network requests during development and testing. The script converts movie titles to a format compatible with Letterboxd's URL structure and handles direct requests to fetch rating data. It's capable of handling timeouts and retries for robustness.
+    Parsed pages are cached by URL in the LetterboxdRatingCache table for LETTERBOXD_CACHE_TTL seconds and then revalidated with their ETag/Last-Modified, so repeated refreshes only download pages that changed. The script converts movie titles to a format compatible with Letterboxd's URL structure and handles direct requests to fetch rating data. It's capable of handling timeouts and retries for robustness.
 
 Usage:
-    Call the `get_rating(movie_name, year)` function with the movie name and release year to retrieve the rating information.
+    Call the `get_rating_for_movie(movie)` function with a Movie instance to retrieve the rating information, then save the movie to keep the Letterboxd slug that was found.
 
 Author: John Zheng
 
@@ -15,55 +15,31 @@ Note:
     This script is for educational purposes. Ensure compliance with Letterboxd's terms of service regarding web scraping and automated data retrieval.
 
 Dependencies:
-    - requests: For making HTTP requests.
-    - BeautifulSoup: For parsing HTML content.
-    - os: For file path and directory handling.
-    - csv: For reading and writing cached data.
+    - requests: For making HTTP requests, sent through the shared rate-limited webapp.http_client.
+    - BeautifulSoup and lxml: For parsing HTML content, restricted to the rating elements.
+    - Django ORM: For the LetterboxdRatingCache table of parsed pages.
 """
 
 import requests
-from bs4 import BeautifulSoup
-import os
-import csv
-from webapp.models import Movie
-
-                                                # CAUTION: Caching to reduce traffic on letterboxd during testing/development
-do_caching = False                              # option whether or not to perform caching
-cache_dir = "letterboxd_rating_cache" + "/"     # need the '/' at the end for directory
-
-# Save or load information for caching and cached items
-def save_rating(filepath, rating_info):
-    # Write a Cached Version of rating_info
-    with open(filepath, 'w', newline='') as csv_file:
-        writer = csv.writer(csv_file)
-        for key, value in rating_info.items():
-            writer.writerow([key, value])
-def load_rating(filepath):
-    # Read Rating Information to loaded_dict
-    loaded_dict = {}
-    with open(filepath, 'r') as csv_file:
-        reader = csv.reader(csv_file)
-        for row in reader:
-            key, value = row
-            loaded_dict[key] = value
-
-    # Caste Weighted Average as a Float
-    if "Weighted Average" in loaded_dict:
-        loaded_dict["Weighted Average"] = float(loaded_dict["Weighted Average"])
-
-    # Caste Rating 
-    if "Histogram Counts" in loaded_dict:
-        increment_percents_str = loaded_dict["Histogram Counts"]
-        loaded_dict["Histogram Counts"] = [int(x) for x in increment_percents_str.strip('[]').split(',')]
-
-    # Caste Rating 
-    if "Histogram Weights" in loaded_dict:
-        increment_percents_str = loaded_dict["Histogram Weights"]
-        loaded_dict["Histogram Weights"] = [float(x) for x in increment_percents_str.strip('[]').split(',')]
-
-    # Return Rating Info
-    return loaded_dict
-    
+from bs4 import BeautifulSoup, SoupStrainer
+import re
+import datetime
+import webapp.http_client as http_client
+from django.conf import settings
+from django.utils import timezone
+from webapp.models import LetterboxdRatingCache
+
+MAX_MISS_BACKOFF_DAYS = 180     # Longest wait before probing again for a movie whose page was not found
+
+
+class LetterboxdRequestError(Exception):
+    """Letterboxd could not be reached or answered with an error other than 404 (timeout, 429, 5xx), so whether the page
+    exists is unknown."""
+
+# Only the elements read by parse_rating_histogram() are built into the parse tree
+# While parsing, the strainer sees the whole class attribute (e.g. "tooltip display-rating"), hence the pattern
+RATING_STRAINER = SoupStrainer(class_=re.compile(r"(^|\s)(rating-histogram-bar|display-rating)(\s|$)"))
+
 def convert_to_hyphenated_name(input_string):
     # Whitelisted Characters
     whitelist_char = [' ', '-']
@@ -82,43 +58,14 @@ def convert_to_hyphenated_name(input_string):
 
     return hyphenated_string
 
-# Used by get_rating() to request from letterboxd using movie_name
-def get_rating_direct(movie_name, url=None):
-    # Return Cached Version of Rating Info If Already Exist
-    if do_caching and os.path.exists(cache_dir+movie_name+".csv"):
-        print("Cached Version Found")
-        return load_rating(cache_dir+movie_name+".csv")
-
+# Read the histogram counts, weights and weighted average from a parsed rating histogram page
+def parse_rating_histogram(soup):
     # Dictionary of Returned Rating Information
     rating_info = {
         "Histogram Counts" : [],
         "Histogram Weights" : [],
     }
 
-    # Make URL
-    if not url:
-        url = "https://letterboxd.com/csi/film/" + movie_name + "/rating-histogram"
-    
-    # Form Request Header
-    headers = {"User-Agent" : "Mozilla/5.0 (Windows NT 10.5;) Gecko/20100101 Firefox/56.7"}
-
-    # Attempt to Make Request to Letterboxd 3 Times Before Giving Up
-    for i in range(3):
-        try:
-            response = requests.get(url, headers=headers,timeout=5) # Attempt Request
-            response.raise_for_status()                             # Throw Exception When Failed
-            break                                                   # Break Loop If No Problems
-        except requests.exceptions.Timeout:
-            print("Attempt", i+1, "Timeout Reached. Retrying...")   # Notify Timeout
-        except Exception as e:
-            return None
-
-    # Convert Response to HTML
-    html = response.text
-
-    # Create BeautifulSoup parser object
-    soup = BeautifulSoup(html, "html.parser")
-
     # Get histogramed Ratings by Percent
     rating_histogram_elements = soup.find_all(class_="rating-histogram-bar")
     if rating_histogram_elements:
@@ -148,34 +95,121 @@ def get_rating_direct(movie_name, url=None):
             rating += current_rating * (rating_info["Histogram Weights"][i] * 0.01)
         rating_info["Weighted Average"] = rating
 
+    return rating_info
+
+# Used by get_rating_for_movie() to request from letterboxd using movie_name
+# Parsed pages are cached by URL in LetterboxdRatingCache. A cached page younger than LETTERBOXD_CACHE_TTL is returned
+# without a request, an older one is revalidated with its ETag/Last-Modified and only parsed again if it changed.
+# Returns None if the page does not exist (404), and raises LetterboxdRequestError if the request failed.
+def get_rating_direct(movie_name, url=None):
+    # Make URL
+    if not url:
+        url = "https://letterboxd.com/csi/film/" + movie_name + "/rating-histogram"
+
+    # Return Cached Version of Rating Info If It Is Still Fresh
+    cached_page = LetterboxdRatingCache.objects.filter(url=url).first()
+    if cached_page and cached_page.is_fresh(settings.LETTERBOXD_CACHE_TTL):
+        return cached_page.rating_info()
+
+    # Form Request Header, Asking for the Page Only If It Changed Since It Was Cached
+    headers = {"User-Agent" : "Mozilla/5.0 (Windows NT 10.5;) Gecko/20100101 Firefox/56.7"}
+    if cached_page and cached_page.etag:
+        headers["If-None-Match"] = cached_page.etag
+    if cached_page and cached_page.last_modified:
+        headers["If-Modified-Since"] = cached_page.last_modified
+
+    # Attempt to Make Request to Letterboxd 3 Times Before Giving Up
+    for i in range(3):
+        try:
+            response = http_client.get(url, headers=headers,timeout=5) # Attempt Request
+            break                                                   # Break Loop If No Problems
+        except requests.exceptions.Timeout:
+            print("Attempt", i+1, "Timeout Reached. Retrying...")   # Notify Timeout
+        except requests.exceptions.RequestException as e:
+            raise LetterboxdRequestError(f"Request to {url} failed: {e}")
+    else:
+        raise LetterboxdRequestError(f"Request to {url} timed out")
+
+    # The Page Does Not Exist
+    if response.status_code == 404:
+        return None
+    # Any Other Error (Rate Limited, Server Error) Says Nothing About the Page
+    if response.status_code >= 400:
+        raise LetterboxdRequestError(f"Letterboxd answered {response.status_code} for {url}")
+
+    # The Cached Version Is Still Current
+    if response.status_code == 304 and cached_page:
+        cached_page.fetched_at = timezone.now()
+        cached_page.save(update_fields=["fetched_at"])
+        return cached_page.rating_info()
+
+    # Convert Response to HTML
+    html = response.text
+
+    # Parse only the rating elements of the page
+    soup = BeautifulSoup(html, "lxml", parse_only=RATING_STRAINER)
+    rating_info = parse_rating_histogram(soup)
+
     # Letterboxd URL saved in services.update_letterboxd_ratings() if Weighted Average is Found, 
     if rating_info["Weighted Average"]:
         rating_info["Letterboxd URL"] = url
 
     # Save to Cache
-    if do_caching:
-        save_rating(cache_dir+movie_name+".csv", rating_info)
+    LetterboxdRatingCache.objects.update_or_create(url=url, defaults={
+        "histogram_counts": rating_info["Histogram Counts"],
+        "histogram_weights": rating_info["Histogram Weights"],
+        "weighted_average": rating_info["Weighted Average"],
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": timezone.now(),
+    })
 
     # Returns the Rating Information and Notifies it was Scraped
     return rating_info
     
-# Returns a dictionary of rating information from a movie name and year
-def get_rating(movie_name, year):
+# Whether a movie whose Letterboxd page was not found should be probed again
+def is_retry_due(movie):
+    if not movie.letterboxd_misses or not movie.letterboxd_checked_at:
+        return True
+    backoff_days = min(settings.LETTERBOXD_MISS_BACKOFF_DAYS * 2 ** (movie.letterboxd_misses - 1), MAX_MISS_BACKOFF_DAYS)
+    return timezone.now() >= movie.letterboxd_checked_at + datetime.timedelta(days=backoff_days)
+
+# Returns a dictionary of rating information for a Movie instance
+# The slug that found the page, or the miss, is recorded on the instance (letterboxd_slug, letterboxd_checked_at and
+# letterboxd_misses) for the caller to save. Later calls request the known page directly, falling back to the slugs
+# of the title if it is not found anymore, and movies whose page was not found are skipped until their backoff has
+# passed. Only pages that do not exist count as a miss: if a request fails, nothing is recorded and None is returned.
+def get_rating_for_movie(movie):
     try:
-        movie = Movie.objects.get(title=movie_name, release_year=year)
         if movie.letterboxd_url:
-            rating_dict = get_rating_direct(movie_name, url=movie.letterboxd_url)
+            rating_dict = get_rating_direct(movie.title, url=movie.letterboxd_url)
             if rating_dict:
                 return rating_dict
-    except Movie.DoesNotExist:
-        pass
-
-    # Convert movie_name to something that makes sense for letterboxd
-    title_name = convert_to_hyphenated_name(movie_name)
 
-    # Try to get rating information from url with and without the year appended to movie title
-    rating_dict = get_rating_direct(movie_name=title_name+"-"+str(year), url=None)
-    if not rating_dict:
-        rating_dict = get_rating_direct(movie_name=title_name, url=None)
+        # Convert the title to something that makes sense for letterboxd, with and without the year appended
+        title_name = convert_to_hyphenated_name(movie.title)
+        title_slugs = [title_name+"-"+str(movie.release_year), title_name]
+        if movie.letterboxd_slug:
+            candidate_slugs = [movie.letterboxd_slug] + [slug for slug in title_slugs if slug != movie.letterboxd_slug]
+        elif is_retry_due(movie):
+            candidate_slugs = title_slugs
+        else:
+            return None
 
-    return rating_dict
+        checked_at = timezone.now()
+        for slug in candidate_slugs:
+            rating_dict = get_rating_direct(movie_name=slug, url=None)
+            if rating_dict:
+                movie.letterboxd_slug = slug
+                movie.letterboxd_misses = 0
+                movie.letterboxd_checked_at = checked_at
+                return rating_dict
+    except LetterboxdRequestError as e:
+        print(f"Letterboxd request failed for '{movie.title}': {e}")
+        return None
+
+    # None of the pages exist, look for the page again once the backoff has passed
+    movie.letterboxd_slug = None
+    movie.letterboxd_misses += 1
+    movie.letterboxd_checked_at = checked_at
+    return None
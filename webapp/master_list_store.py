@@ -0,0 +1,149 @@
+"""
+Name of code artifact: master_list_store.py
+Brief description: Compact SQLite-backed store of the TMDB master movie list (id and original title), opened lazily and
+                    read-only so every process shares the same memory-mapped file instead of loading the full list.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: 10/18/2026
+Brief description of each revision & author: Initial creation of the master list store and writer (agent)
+                                              Replaced the full rewrite with an incremental, streaming update (agent)
+Preconditions: The store file must have been written by update_master_list() (see scripts/update_tmdb_master_list.py).
+Acceptable and unacceptable input values or types: update_master_list() expects an iterable of (tmdb_id, title) pairs.
+Postconditions: Lookups return TMDB ids or titles without materializing the master list in memory.
+Return values or types: Lists of TMDB ids (ints), or the title string for an id.
+Error and exception condition values or types that can occur: sqlite3.Error if the store file is missing or corrupt.
+Side effects: update_master_list() creates or modifies the store file on disk.
+Invariants: The store is only opened read-only by the web application.
+Any known faults: None.
+"""
+
+import os
+import sqlite3
+import threading
+from itertools import islice
+from pathlib import Path
+from webapp.title_index import normalize_title, title_trigrams
+
+MASTER_LIST_DB = "webapp/data/tmdb_master_movie_list.sqlite3"
+MMAP_SIZE = 512 * 1024 * 1024   # Map up to 512 MB of the store so the OS page cache is shared between processes
+WRITE_BATCH_SIZE = 10000        # Entries parsed and written per batch while updating the store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    normalized_title TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS movies_normalized_title ON movies (normalized_title);
+CREATE VIRTUAL TABLE IF NOT EXISTS movies_trigram USING fts5(
+    normalized_title, content='movies', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS movies_after_insert AFTER INSERT ON movies BEGIN
+    INSERT INTO movies_trigram (rowid, normalized_title) VALUES (new.id, new.normalized_title);
+END;
+CREATE TRIGGER IF NOT EXISTS movies_after_delete AFTER DELETE ON movies BEGIN
+    INSERT INTO movies_trigram (movies_trigram, rowid, normalized_title) VALUES ('delete', old.id, old.normalized_title);
+END;
+CREATE TRIGGER IF NOT EXISTS movies_after_update AFTER UPDATE ON movies BEGIN
+    INSERT INTO movies_trigram (movies_trigram, rowid, normalized_title) VALUES ('delete', old.id, old.normalized_title);
+    INSERT INTO movies_trigram (rowid, normalized_title) VALUES (new.id, new.normalized_title);
+END;
+"""
+
+
+class MasterListStore:
+    """Read-only view of the TMDB master list stored in SQLite."""
+
+    def __init__(self, path=MASTER_LIST_DB):
+        self.path = Path(path).resolve()
+        self._local = threading.local()     # SQLite connections cannot be shared between threads
+
+    # Open (or reopen, if the file was replaced) the connection for the current thread
+    def _connection(self):
+        file_id = os.stat(self.path).st_ino
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.file_id != file_id:
+            if connection is not None:
+                connection.close()
+            connection = sqlite3.connect(f'{self.path.as_uri()}?mode=ro', uri=True)
+            connection.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+            self._local.connection = connection
+            self._local.file_id = file_id
+        return connection
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM movies').fetchone()[0]
+
+    # TMDB ids whose title exactly matches, ignoring case and extra whitespace
+    def search_title(self, title):
+        rows = self._connection().execute(
+            'SELECT id FROM movies WHERE normalized_title = ? ORDER BY id', (normalize_title(title),))
+        return [row[0] for row in rows]
+
+    # Title for a TMDB id
+    def search_id(self, tmdb_id):
+        row = self._connection().execute('SELECT title FROM movies WHERE id = ?', (tmdb_id,)).fetchone()
+        return row[0] if row else None
+
+    # TMDB ids whose title starts with the prefix, in title order
+    def search_prefix(self, prefix, limit=20):
+        prefix = normalize_title(prefix)
+        if not prefix:
+            return []
+        rows = self._connection().execute(
+            'SELECT id FROM movies WHERE normalized_title >= ? AND normalized_title < ? '
+            'ORDER BY normalized_title, id LIMIT ?', (prefix, prefix + '\U0010ffff', limit))
+        return [row[0] for row in rows]
+
+    # TMDB ids with the most trigrams in common with the query, best match first
+    def search_similar(self, query, limit=20):
+        trigrams = [trigram for trigram in title_trigrams(normalize_title(query)) if trigram.strip() == trigram]
+        if not trigrams:
+            return []
+        match = ' OR '.join('"{}"'.format(trigram.replace('"', '""')) for trigram in sorted(trigrams))
+        rows = self._connection().execute(
+            'SELECT rowid FROM movies_trigram WHERE movies_trigram MATCH ? ORDER BY rank LIMIT ?', (match, limit))
+        return [row[0] for row in rows]
+
+
+# Update the master list store from (tmdb_id, title) pairs, creating it if needed
+# Only new and renamed ids are written and ids missing from the entries are removed, so a daily refresh
+# touches just the rows that changed. Entries are consumed in batches, so memory use does not grow with the export.
+def update_master_list(entries, path=MASTER_LIST_DB):
+    connection = sqlite3.connect(path)
+    counts = {'added': 0, 'changed': 0, 'removed': 0}
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')   # Readers keep working while the update is applied
+        connection.executescript(SCHEMA)
+        connection.execute('CREATE TEMP TABLE seen_ids (id INTEGER PRIMARY KEY)')
+
+        with connection:
+            entries = iter(entries)
+            while True:
+                batch = [(tmdb_id, title, normalize_title(title)) for tmdb_id, title in islice(entries, WRITE_BATCH_SIZE)]
+                if not batch:
+                    break
+                connection.executemany('INSERT OR IGNORE INTO seen_ids (id) VALUES (?)', ((row[0],) for row in batch))
+
+                # Count the changes before writing, since the upsert does not report inserts and updates separately
+                batch_ids = [row[0] for row in batch]
+                existing = dict(_select_titles(connection, batch_ids))
+                counts['added'] += sum(1 for row in batch if row[0] not in existing)
+                counts['changed'] += sum(1 for row in batch if row[0] in existing and existing[row[0]] != row[1])
+
+                connection.executemany(
+                    'INSERT INTO movies (id, title, normalized_title) VALUES (?, ?, ?) '
+                    'ON CONFLICT (id) DO UPDATE SET title = excluded.title, normalized_title = excluded.normalized_title '
+                    'WHERE movies.title != excluded.title', batch)
+
+            counts['removed'] = connection.execute(
+                'DELETE FROM movies WHERE id NOT IN (SELECT id FROM seen_ids)').rowcount
+    finally:
+        connection.close()
+    return counts
+
+
+# Current titles for a batch of ids, used to count changes in update_master_list()
+def _select_titles(connection, tmdb_ids):
+    placeholders = ', '.join('?' * len(tmdb_ids))
+    return connection.execute(f'SELECT id, title FROM movies WHERE id IN ({placeholders})', tmdb_ids)
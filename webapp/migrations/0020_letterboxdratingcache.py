@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0019_movie_letterboxd_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LetterboxdRatingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=255, unique=True)),
+                ('histogram_counts', models.JSONField(blank=True, default=list)),
+                ('histogram_weights', models.JSONField(blank=True, default=list)),
+                ('weighted_average', models.FloatField(blank=True, null=True)),
+                ('etag', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_modified', models.CharField(blank=True, max_length=255, null=True)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0020_letterboxdratingcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='letterboxd_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='letterboxd_misses',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='letterboxd_slug',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
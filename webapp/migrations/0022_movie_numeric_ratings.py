@@ -0,0 +1,44 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0021_movie_letterboxd_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='metacritic_score',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rt_score',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='tmdb_popularity_num',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-tmdb_popularity_num'], name='movie_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-imdb_rating_num'], name='movie_imdb_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['now_playing', 'id'], name='movie_now_playing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['release_year', 'imdb_rating_num'], name='movie_year_rating_idx'),
+        ),
+    ]
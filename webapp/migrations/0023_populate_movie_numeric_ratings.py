@@ -0,0 +1,48 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+LEADING_NUMBER = re.compile(r'^\s*(\d+(?:\.\d+)?)')
+
+
+# Frozen copy of webapp.models.parse_number() at the time of this migration, so later changes to it do not change
+# what the migration stores
+def parse_number(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = LEADING_NUMBER.match(value)
+    return float(match.group(1)) if match else None
+
+
+# Fill in tmdb_popularity_num, rt_score and metacritic_score for the movies stored before the columns existed
+# imdb_rating_num is not backfilled, the column predates this migration and save() already filled it
+def populate_numeric_ratings(apps, schema_editor):
+    Movie = apps.get_model('webapp', 'Movie')
+    movies = Movie.objects.only('id', 'tmdb_popularity', 'rotten_tomatoes_rating', 'metacritic_rating').order_by('id')
+    batch = []
+    for movie in movies.iterator(chunk_size=BATCH_SIZE):
+        movie.tmdb_popularity_num = parse_number(movie.tmdb_popularity)
+        rt_score = parse_number(movie.rotten_tomatoes_rating)
+        movie.rt_score = int(rt_score) if rt_score is not None else None
+        metacritic_score = parse_number(movie.metacritic_rating)
+        movie.metacritic_score = int(metacritic_score) if metacritic_score is not None else None
+        batch.append(movie)
+        if len(batch) >= BATCH_SIZE:
+            Movie.objects.bulk_update(batch, ['tmdb_popularity_num', 'rt_score', 'metacritic_score'])
+            batch = []
+    if batch:
+        Movie.objects.bulk_update(batch, ['tmdb_popularity_num', 'rt_score', 'metacritic_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0022_movie_numeric_ratings'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_numeric_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0023_populate_movie_numeric_ratings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(fields=['name'], name='genre_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-created_at'], name='movie_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['title', 'release_year'], name='movie_title_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['last_updated', '-release_year'], name='movie_last_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='streamingprovider',
+            index=models.Index(fields=['name'], name='provider_name_idx'),
+        ),
+    ]
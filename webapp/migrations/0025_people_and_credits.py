@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-18 15:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0024_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Person',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tmdb_id', models.IntegerField(unique=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name'], name='person_name_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Credit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('director', 'Director'), ('actor', 'Actor')], max_length=10)),
+                ('order', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='webapp.movie')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='webapp.person')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['person', 'role'], name='credit_person_role_idx')],
+                'unique_together': {('movie', 'person', 'role')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0025_people_and_credits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonCreditsCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('person_tmdb_id', models.IntegerField(unique=True)),
+                ('cast', models.JSONField(blank=True, default=list)),
+                ('crew', models.JSONField(blank=True, default=list)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PersonSearchCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255, unique=True)),
+                ('person_tmdb_id', models.IntegerField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -18,16 +18,28 @@ Any known faults: None.
 from django.contrib.auth.models import User
 from django.db import models
 from django.utils.text import slugify
+from django.utils import timezone
 from django.db.models import Q
 from django.utils.module_loading import import_string
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Semaphore
-import time
 import datetime
+import re
+
+_LEADING_NUMBER = re.compile(r'^\s*(\d+(?:\.\d+)?)')
+
+
+# Leading number of a rating or popularity string ("87%" -> 87.0, "74/100" -> 74.0, "123.4" -> 123.4), None if there is none
+def parse_number(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _LEADING_NUMBER.match(value)
+    return float(match.group(1)) if match else None
+
 
 class Movie(models.Model):
     """Model representing individual movies in the database."""
@@ -47,8 +59,11 @@ class Movie(models.Model):
     imdb_rating = models.CharField(max_length=10, null=True, blank=True)        # A string with the IMDb rating ("7.4/10"), original API form, use for displaying rating out of 10
     imdb_rating_num = models.FloatField(null=True, blank=True)                  # A float with the IMDb rating (7.4), use this for filtering by IMDb rating
     tmdb_popularity = models.CharField(max_length=10, null=True, blank=True)
+    tmdb_popularity_num = models.FloatField(null=True, blank=True)              # A float with the TMDB popularity, use this for sorting by popularity
     rotten_tomatoes_rating = models.CharField(max_length=10, null=True, blank=True)
+    rt_score = models.IntegerField(null=True, blank=True)                       # Rotten Tomatoes score out of 100 ("87%" -> 87)
     metacritic_rating = models.CharField(max_length=10, null=True, blank=True)
+    metacritic_score = models.IntegerField(null=True, blank=True)               # Metacritic score out of 100 ("74/100" -> 74)
     director = models.CharField(max_length=255, null=True, blank=True)
     actors = models.CharField(max_length=1000, null=True, blank=True)
     domestic_box_office = models.CharField(max_length=100, null=True, blank=True)
@@ -60,10 +75,28 @@ class Movie(models.Model):
     recommended_movie_data = models.JSONField(default=list, blank=True)
     letterboxd_url = models.CharField(max_length=255, null=True, blank=True)
     letterboxd_rating = models.FloatField(null=True, blank=True)
+    letterboxd_slug = models.CharField(max_length=255, null=True, blank=True)   # Slug of the Letterboxd page, found by the scraper
+    letterboxd_checked_at = models.DateTimeField(null=True, blank=True)        # Last time the scraper looked for the Letterboxd page
+    letterboxd_misses = models.IntegerField(default=0)                          # Consecutive times the Letterboxd page was not found
     # letterboxd_histogram_weights = JSONField(null=True, blank=True) # TODO: Add histogram weights or remove this line
     justwatch_url = models.CharField(max_length=255, null=True, blank=True)
     original_language = models.CharField(max_length=2, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Home page carousels: the most popular and best rated movies, and the movies now playing
+            models.Index(fields=['-tmdb_popularity_num'], name='movie_popularity_idx'),
+            models.Index(fields=['-imdb_rating_num'], name='movie_imdb_rating_idx'),
+            models.Index(fields=['now_playing', 'id'], name='movie_now_playing_idx'),
+            # Catalog release year and IMDb rating ranges
+            models.Index(fields=['release_year', 'imdb_rating_num'], name='movie_year_rating_idx'),
+            # Recently added movies (recommendation fallback, test for ban page)
+            models.Index(fields=['-created_at'], name='movie_created_at_idx'),
+            # Movie lookups by title and year (JustWatch streamers)
+            models.Index(fields=['title', 'release_year'], name='movie_title_year_idx'),
+            # Least recently updated movies first, newest releases first among those (streaming provider updates)
+            models.Index(fields=['last_updated', '-release_year'], name='movie_last_updated_idx'),
+        ]
 
     # Movie release date in a printable format
     # To run this code, use "{{ movie.formatted_release_date }}" to execute the printable release date
@@ -93,44 +126,25 @@ class Movie(models.Model):
         return reverse('movie_detail', args=[str(self.slug)])
     
     # This method can be used to fetch the recommended movies for a particular movie
+    # Only movies already in the database are returned, missing ones are queued for background ingestion
     def get_recommended_movies(self, num_movies=6):
-        # Dynamically import the process_movie_search function
-        process_movie_search = import_string('webapp.services.process_movie_search')
-        
-        recommended_movies = []
-        processed_movies = set()  # Keep track of processed movies to avoid duplicates
-        fetches_per_second = 20  # Updated to 20 requests per second as per requirement
+        # Dynamically import the hydration queue to avoid a circular import with webapp.services
+        enqueue_movies = import_string('webapp.hydration_queue.enqueue_movies')
 
-        # Semaphore to limit the number of concurrent API fetches
-        semaphore = Semaphore(fetches_per_second)
-
-        def fetch_and_process_movie(movie_data):
-            tmdb_id = movie_data.get('tmdb_id')
-            title = movie_data.get('title')
-            if tmdb_id not in processed_movies:
-                with semaphore:
-                    # Ensure we don't make more than 10 requests per second
-                    time.sleep(1/fetches_per_second)
-                    process_movie_search(tmdb_id, title)
-                    processed_movies.add(tmdb_id)
-
-        # Use a thread pool to process movies in parallel
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(fetch_and_process_movie, movie_data) for movie_data in self.recommended_movie_data]
-            for future in as_completed(futures):
-                try:
-                    # If the function returns a result, it will be available as future.result()
-                    result = future.result()
-                except Exception as e:
-                    # Handle exception
-                    print(f"An error occurred: {str(e)}")
-
-        # Fetch recommended movies from the database
+        recommended_ids = []
         for movie_data in self.recommended_movie_data:
             tmdb_id = movie_data.get('tmdb_id')
-            recommended_movie = Movie.objects.filter(tmdb_id=tmdb_id).first()
-            if recommended_movie:
-                recommended_movies.append(recommended_movie)
+            if tmdb_id is not None and tmdb_id not in recommended_ids:
+                recommended_ids.append(tmdb_id)
+
+        # Fetch recommended movies from the database in a single query, keeping the recommendation order
+        movies_by_tmdb_id = Movie.objects.in_bulk(recommended_ids, field_name='tmdb_id')
+        recommended_movies = [movies_by_tmdb_id[tmdb_id] for tmdb_id in recommended_ids if tmdb_id in movies_by_tmdb_id]
+
+        # Queue the recommendations that are not in the database yet
+        missing_ids = [tmdb_id for tmdb_id in recommended_ids if tmdb_id not in movies_by_tmdb_id]
+        if missing_ids:
+            enqueue_movies(missing_ids)
 
         # If the number of recommended movies is less than the desired number,
         # add the most recently added movies from the existing database.
@@ -153,7 +167,11 @@ class Movie(models.Model):
 
     def save(self, *args, **kwargs):
         self.slug = self.get_slug()
+        self.set_derived_fields()
+        super().save(*args, **kwargs)
 
+    # Fill in the fields computed from other fields, also used before bulk_create() since it skips save()
+    def set_derived_fields(self):
         if not self.shortened_title:
             self.shortened_title = self.truncate_title(self.title)
 
@@ -164,7 +182,12 @@ class Movie(models.Model):
             except ValueError:
                 print(f"Failed to convert rating for: {self.title}")
 
-        super().save(*args, **kwargs)
+        # Numeric copies of the popularity and the Rotten Tomatoes and Metacritic scores, for sorting and filtering
+        self.tmdb_popularity_num = parse_number(self.tmdb_popularity)
+        rt_score = parse_number(self.rotten_tomatoes_rating)
+        self.rt_score = int(rt_score) if rt_score is not None else None
+        metacritic_score = parse_number(self.metacritic_rating)
+        self.metacritic_score = int(metacritic_score) if metacritic_score is not None else None
 
     def truncate_title(self, title, limit=46):
         if len(title) <= limit:
@@ -191,6 +214,26 @@ class Movie(models.Model):
             counter += 1
         return slug
 
+    # Assigns unique slugs to a batch of new movies with a single query, the bulk version of get_slug()
+    @classmethod
+    def set_unique_slugs(cls, movies):
+        base_slugs = [(movie, f"{slugify(movie.title)}-{movie.release_year}") for movie in movies]
+        if not base_slugs:
+            return
+        slug_filter = Q()
+        for base_slug in {base_slug for _, base_slug in base_slugs}:
+            slug_filter |= Q(slug=base_slug) | Q(slug__startswith=f"{base_slug}-")
+        used_slugs = set(cls.objects.filter(slug_filter).values_list('slug', flat=True))
+
+        for movie, base_slug in base_slugs:
+            slug = base_slug
+            counter = 2  # Start counter at 2
+            while slug in used_slugs:
+                slug = f"{base_slug}-{counter}"
+                counter += 1
+            used_slugs.add(slug)
+            movie.slug = slug
+
     # String representation of the Movie model
     def __str__(self):
         return f"{self.title.replace(' ', '_')}_{self.release_year}"
@@ -200,6 +243,9 @@ class Genre(models.Model):
     """Model representing movie genres in the database."""
     name = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [models.Index(fields=['name'], name='genre_name_idx')]   # Genres are looked up by name on ingest
+
     # String representation of the Genre model
     def __str__(self):
         return self.name
@@ -212,10 +258,46 @@ class StreamingProvider(models.Model):
     provider_id = models.IntegerField(unique=True)
     ranking = models.IntegerField(default=1000)  # Lower numbers indicate higher preference
 
+    class Meta:
+        indexes = [models.Index(fields=['name'], name='provider_name_idx')]    # The catalog and JustWatch look up providers by name
+
     def __str__(self):
         return self.name
     
 
+class Person(models.Model):
+    """Model representing a director or actor, keyed by their TMDB person id."""
+    tmdb_id = models.IntegerField(unique=True)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [models.Index(fields=['name'], name='person_name_idx')]   # Director and actor pages look up people by name
+
+    def __str__(self):
+        return self.name
+
+
+class Credit(models.Model):
+    """Model representing a person directing or acting in a movie, from the TMDB credits of the movie."""
+    DIRECTOR = 'director'
+    ACTOR = 'actor'
+    ROLE_CHOICES = [
+        (DIRECTOR, 'Director'),
+        (ACTOR, 'Actor'),
+    ]
+    movie = models.ForeignKey('Movie', related_name='credits', on_delete=models.CASCADE)
+    person = models.ForeignKey(Person, related_name='credits', on_delete=models.CASCADE)
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    order = models.IntegerField(default=0)     # Billing order of the actors, crew order of the directors
+
+    class Meta:
+        unique_together = ('movie', 'person', 'role')   # A person is credited once per role in each movie
+        indexes = [models.Index(fields=['person', 'role'], name='credit_person_role_idx')]   # Movies of a director/actor
+
+    def __str__(self):
+        return f"{self.person.name} ({self.role}) in {self.movie.title}"
+
+
 class UserProfile(models.Model):
     """Model representing user profiles with additional information and friend relationships."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')  # links to built-in Django User model
@@ -281,4 +363,61 @@ class MovieRating(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user.username}'s rating of {self.movie.title}"
\ No newline at end of file
+        return f"{self.user.username}'s rating of {self.movie.title}"
+
+class LetterboxdRatingCache(models.Model):
+    """Parsed Letterboxd rating histogram page, cached by URL by the Letterboxd scraper."""
+    url = models.CharField(max_length=255, unique=True)
+    histogram_counts = models.JSONField(default=list, blank=True)
+    histogram_weights = models.JSONField(default=list, blank=True)
+    weighted_average = models.FloatField(null=True, blank=True)
+    etag = models.CharField(max_length=255, null=True, blank=True)             # Validators sent back when revalidating
+    last_modified = models.CharField(max_length=255, null=True, blank=True)
+    fetched_at = models.DateTimeField()                                         # Last time the page was fetched or revalidated
+
+    # Whether the cached page is younger than the TTL and can be used without revalidating
+    def is_fresh(self, ttl_seconds):
+        return self.fetched_at > timezone.now() - datetime.timedelta(seconds=ttl_seconds)
+
+    # The cached page in the rating information format of letterboxd_scraper.get_rating_direct()
+    def rating_info(self):
+        rating_info = {
+            "Histogram Counts": list(self.histogram_counts),
+            "Histogram Weights": list(self.histogram_weights),
+            "Weighted Average": self.weighted_average,
+        }
+        if self.weighted_average:
+            rating_info["Letterboxd URL"] = self.url
+        return rating_info
+
+    def __str__(self):
+        return self.url
+
+
+class PersonSearchCache(models.Model):
+    """TMDB person search result for a name, cached by services.get_person_id()."""
+    query = models.CharField(max_length=255, unique=True)                      # Searched name, casefolded
+    person_tmdb_id = models.IntegerField(null=True, blank=True)                 # None if TMDB found nobody
+    fetched_at = models.DateTimeField()
+
+    # Whether the cached result is younger than the TTL and can be used without searching again
+    def is_fresh(self, ttl_seconds):
+        return self.fetched_at > timezone.now() - datetime.timedelta(seconds=ttl_seconds)
+
+    def __str__(self):
+        return self.query
+
+
+class PersonCreditsCache(models.Model):
+    """TMDB movie credits of a person, cached by services.get_person_movie_credits()."""
+    person_tmdb_id = models.IntegerField(unique=True)
+    cast = models.JSONField(default=list, blank=True)       # Movies the person acted in (id, order, release_date, popularity)
+    crew = models.JSONField(default=list, blank=True)       # Movies the person worked on (id, job, release_date)
+    fetched_at = models.DateTimeField()
+
+    # Whether the cached credits are younger than the TTL and can be used without fetching them again
+    def is_fresh(self, ttl_seconds):
+        return self.fetched_at > timezone.now() - datetime.timedelta(seconds=ttl_seconds)
+
+    def __str__(self):
+        return f"Credits of person {self.person_tmdb_id}"
@@ -0,0 +1,201 @@
+"""
+Name of code artifact: page_cache.py
+Brief description: Caching of the pages anonymous users browse (catalog, movie details, director/actor, about, faq) and of
+                    the catalog movie cards. Every cached page is tied to versions that are changed when its content may
+                    change: the version of its view, and the version of each movie it shows.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: 10/18/2026
+Brief description of each revision & author: Initial creation of the page cache (agent)
+                                              Replaced the global invalidation with per-view and per-movie versions (agent)
+                                              Pages are also tied to the TMDB ids they would show once stored (agent)
+Preconditions: Django environment must be set up correctly, with CACHES and PAGE_CACHE_SECONDS in the settings.
+Acceptable and unacceptable input values or types: cache_anonymous_page() decorates view functions. track_page_movies()
+                                                   expects the request and an iterable of the Movie instances of the page,
+                                                   and optionally the TMDB ids of movies the page shows once they are stored.
+Postconditions: A GET request from an anonymous user is served from the cache when the same page, with the same query
+                string, was rendered since the versions of its view and of its movies last changed.
+Return values or types: The decorated views return HttpResponse objects.
+Error and exception condition values or types that can occur: None expected; the page is rendered normally on a miss.
+Side effects: Reads and writes cache entries. Saving a movie changes the version of that movie, so only the pages showing
+              it are rendered again. Adding or removing a movie, or changing its genres or providers, also changes the
+              version of the views listing movies (catalog, director, actor). Saving a Genre or StreamingProvider, which
+              every card shows, invalidates every page.
+Invariants: Cached pages never contain a CSRF token or messages of the user they were rendered for.
+Any known faults: Bulk writes (bulk_create, bulk_update, QuerySet.update) do not send signals, code using them must call
+                  invalidate_movies(), invalidate_tmdb_ids(), invalidate_listings() or invalidate_pages() itself.
+                  A saved movie whose release year or rating changes may keep its place in the listings filtered on the
+                  old value until they expire, after PAGE_CACHE_SECONDS.
+                  The home feed is not invalidated here, it follows the rotation of home_feed.py.
+"""
+
+import hashlib
+import re
+import time
+from functools import wraps
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.http import urlencode
+from webapp.models import Movie, Genre, StreamingProvider, MovieRating
+
+PAGE_CACHE_VERSION_KEY = 'page_cache:version'          # Version of every cached page
+VERSION_KEY = 'page_cache:version:{scope}'              # Version of a view ('view:catalog'), a movie ('movie:12') or a
+                                                        # TMDB id that may not be stored yet ('tmdb:550')
+LISTING_VIEWS = ['catalog', 'director', 'actor']        # Views whose pages change when movies are added or removed
+CSRF_TOKEN_PATTERN = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+# Current version of every cached page, part of every page and card key
+# The versions are timestamps, so an evicted version key never brings back pages cached before an invalidation
+def get_cache_version():
+    return cache.get_or_set(PAGE_CACHE_VERSION_KEY, time.time_ns, None)
+
+
+# Current versions of the given scopes, as a {scope: version} dict, starting the scopes without a version
+def get_versions(scopes):
+    keys = {VERSION_KEY.format(scope=scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    missing_keys = [key for key in keys if key not in versions]
+    if missing_keys:
+        for key in missing_keys:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing_keys))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+# Change the versions of the given scopes, the pages and counts cached under them are not used again
+def invalidate(scopes):
+    now = time.time_ns()
+    cache.set_many({VERSION_KEY.format(scope=scope): now for scope in scopes}, None)
+
+
+# Invalidate every cached page and movie card
+def invalidate_pages():
+    cache.set(PAGE_CACHE_VERSION_KEY, time.time_ns(), None)
+
+
+# Invalidate the pages and cards showing the movies with the given ids
+def invalidate_movies(movie_ids):
+    invalidate([f'movie:{movie_id}' for movie_id in movie_ids])
+
+
+# Invalidate the pages that would show the movies with the given TMDB ids once they are stored, after they were added
+def invalidate_tmdb_ids(tmdb_ids):
+    invalidate([f'tmdb:{tmdb_id}' for tmdb_id in tmdb_ids])
+
+
+# Invalidate the pages of the views listing movies, after movies were added or removed
+def invalidate_listings(view_names=LISTING_VIEWS):
+    invalidate([f'view:{view_name}' for view_name in view_names])
+
+
+# Record the movies shown by the page of a request, so the cached page is not used once one of them changes
+# Each movie gets its version as page_cache_version, for the movie card fragment cache keys
+# tmdb_ids are movies the page shows once they are stored (e.g. recommendations waiting for the hydration queue), so the
+# cached page is not used once one of them is added
+def track_page_movies(request, movies, tmdb_ids=()):
+    movies = list(movies)
+    tmdb_scopes = [f'tmdb:{tmdb_id}' for tmdb_id in tmdb_ids if tmdb_id is not None]
+    versions = get_versions([f'movie:{movie.pk}' for movie in movies] + tmdb_scopes)
+    if not hasattr(request, 'page_cache_movies'):
+        request.page_cache_movies = {}
+    for movie in movies:
+        movie.page_cache_version = versions[f'movie:{movie.pk}']
+        request.page_cache_movies[f'movie:{movie.pk}'] = movie.page_cache_version
+    for scope in tmdb_scopes:
+        request.page_cache_movies[scope] = versions[scope]
+    return movies
+
+
+# Cache key of a page, from the versions of all pages and of its view, its path, and its query string with the
+# parameters in a fixed order
+def get_page_key(request, view_name):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    page_hash = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    view_version = get_versions([f'view:{view_name}'])[f'view:{view_name}']
+    return f'page_cache:{get_cache_version()}:{view_version}:{page_hash}'
+
+
+# Cache the GET responses of a view for anonymous users
+# Logged in users, form submissions and requests with pending messages are always rendered
+def cache_anonymous_page(view):
+    @wraps(view)
+    def cached_view(request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated or len(messages.get_messages(request)):
+            return view(request, *args, **kwargs)
+
+        page_key = get_page_key(request, view.__name__)
+        cached_page = cache.get(page_key)
+        if cached_page is not None and get_versions(cached_page['versions']) == cached_page['versions']:
+            # Each visitor gets their own CSRF token in the cached page
+            return HttpResponse(CSRF_TOKEN_PATTERN.sub(rf'\g<1>{get_token(request)}\g<2>', cached_page['content']))
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(page_key, {
+                'content': response.content.decode(response.charset),
+                'versions': getattr(request, 'page_cache_movies', {}),
+            }, settings.PAGE_CACHE_SECONDS)
+        return response
+    return cached_view
+
+
+# Template context processor, for the movie card fragment cache keys
+def page_cache_version(request):
+    return {'page_cache_version': get_cache_version(), 'page_cache_seconds': settings.PAGE_CACHE_SECONDS}
+
+
+# The invalidations run once the change is committed, so a page rendered before the commit is not cached under the
+# new versions
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def movie_changed(sender, instance, created=False, **kwargs):
+    movie_id = instance.pk
+    transaction.on_commit(lambda: invalidate_movies([movie_id]))
+    if created or kwargs['signal'] is post_delete:
+        transaction.on_commit(invalidate_listings)
+    if created:
+        tmdb_id = instance.tmdb_id
+        transaction.on_commit(lambda: invalidate_tmdb_ids([tmdb_id]))
+
+
+# The genres and providers of a movie are shown on its cards and filter the catalog
+@receiver(m2m_changed, sender=Movie.genres.through)
+@receiver(m2m_changed, sender=Movie.streaming_providers.through)
+@receiver(m2m_changed, sender=Movie.top_streaming_providers.through)
+def movie_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        movie_ids = [instance.pk]
+    elif pk_set:
+        movie_ids = list(pk_set)
+    else:
+        # A genre or provider lost all of its movies
+        transaction.on_commit(invalidate_pages)
+        return
+    transaction.on_commit(lambda: invalidate_movies(movie_ids))
+    transaction.on_commit(invalidate_listings)
+
+
+# Every movie card shows the genres and providers
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=StreamingProvider)
+@receiver(post_delete, sender=StreamingProvider)
+def links_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_pages)
+
+
+# A rating changes the FilmFocus rating of the movie page and the rating count of the user
+@receiver(post_save, sender=MovieRating)
+@receiver(post_delete, sender=MovieRating)
+def rating_changed(sender, instance, **kwargs):
+    scopes = [f'movie:{instance.movie_id}', f'ratings:{instance.user_id}']
+    transaction.on_commit(lambda: invalidate(scopes))
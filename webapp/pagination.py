@@ -0,0 +1,147 @@
+"""
+Name of code artifact: pagination.py
+Brief description: Keyset (cursor) pagination over a queryset ordered by (sort field, id). The next and previous pages
+                    are read from the cursor of the current page, so a deep page costs the same as the first one.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: None.
+Brief description of each revision & author: Initial creation of the keyset paginator (agent)
+Preconditions: Django environment must be set up correctly.
+Acceptable and unacceptable input values or types: KeysetPaginator expects a queryset, a page size, and the sort field
+                                                   (prefixed with '-' for descending order). Cursors are the strings of
+                                                   KeysetPage.next_cursor and KeysetPage.previous_cursor.
+Postconditions: KeysetPaginator.page() returns a KeysetPage with the same template API as django.core.paginator.Page.
+Return values or types: KeysetPage objects.
+Error and exception condition values or types that can occur: None expected; invalid page numbers and cursors fall back
+                                                              to the first page.
+Side effects: None.
+Invariants: Rows are ordered by the sort field, then by id in the same direction.
+Any known faults: A page reached with ?page= and no cursor is read with OFFSET, as before.
+"""
+
+import base64
+import binascii
+import json
+import math
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+# Encode the (sort value, id) key of a row as a url-safe string
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+# Decode a cursor, None if it is not valid
+def decode_cursor(cursor):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+class KeysetPage:
+    """A page of rows, with the page number API of django.core.paginator.Page and the cursors of the next and previous pages."""
+
+    def __init__(self, object_list, number, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    # Cursor of the last row, for the next page
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.paginator.get_key(self.object_list[-1])) if self.object_list else ''
+
+    # Cursor of the first row, for the previous page
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.paginator.get_key(self.object_list[0])) if self.object_list else ''
+
+
+class KeysetPaginator:
+    """Paginates a queryset by (sort field, id), with an optional precomputed or cached total count."""
+
+    def __init__(self, queryset, per_page, sort_field='-id', count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = sort_field.startswith('-')
+        self.sort_field = sort_field.lstrip('-')
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count if self._count is not None else self.queryset.count()
+
+    @cached_property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    # (sort value, id) key of a row
+    def get_key(self, row):
+        return getattr(row, self.sort_field), row.pk
+
+    # Order of the rows, reversed to read the rows before a cursor
+    def ordering(self, reverse=False):
+        descending = self.descending != reverse
+        fields = [self.sort_field] if self.sort_field in ('id', 'pk') else [self.sort_field, 'id']
+        return [f'-{field}' if descending else field for field in fields]
+
+    # Rows after (or, with reverse, before) a key in the page order
+    def rows_after(self, key, reverse=False):
+        sort_value, row_id = key
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        if self.sort_field in ('id', 'pk'):
+            condition = Q(**{f'id__{lookup}': row_id})
+        else:
+            condition = Q(**{f'{self.sort_field}__{lookup}': sort_value}) | \
+                        Q(**{self.sort_field: sort_value, f'id__{lookup}': row_id})
+        return self.queryset.filter(condition).order_by(*self.ordering(reverse))
+
+    # Page after or before a cursor, or by page number (with OFFSET) when there is no cursor
+    def page(self, number=1, after=None, before=None):
+        try:
+            number = min(max(int(number), 1), self.num_pages)
+        except (TypeError, ValueError):
+            number = 1
+
+        after_key = decode_cursor(after) if after else None
+        before_key = decode_cursor(before) if before else None
+        if after_key:
+            rows = list(self.rows_after(after_key)[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, True
+            rows = rows[:self.per_page]
+        elif before_key:
+            rows = list(self.rows_after(before_key, reverse=True)[:self.per_page + 1])
+            has_next, has_previous = True, len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+        else:
+            offset = (number - 1) * self.per_page
+            rows = list(self.queryset.order_by(*self.ordering())[offset:offset + self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, number > 1
+            rows = rows[:self.per_page]
+        return KeysetPage(rows, number, self, has_next, has_previous)
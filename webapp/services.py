@@ -1,10 +1,19 @@
 """
 Name of code artifact: services.py
 Brief description: Contains business logic for the FilmFocus web application, including functions to fetch movie details from TMDB and OMDB, and to manage the movie database.
-Programmer’s name: Mark, Aaron, Bill, John, Traizen
+Programmer’s name: Mark, Aaron, Bill, John, Traizen, agent
 Date the code was created: 09/18/2023
-Date the code was revised: 03/25/2024
+Date the code was revised: 10/18/2026
 Brief description of each revision & author: Added threading to multiple API calling functions
+                                             Searched the TMDB master list through a title index, then a read-only SQLite store (agent)
+                                             Routed upstream API and scraper calls through the shared HTTP client (agent)
+                                             Ingested TMDB list sources with the asyncio ingestion engine and bulk inserts (agent)
+                                             Refreshed streaming providers, recommendations and Letterboxd ratings in batches (agent)
+                                             Served the home page from the precomputed home feed (agent)
+                                             Invalidated the page cache and updated the filter index after bulk writes (agent)
+                                             Resolved catalog filters with the filter index and paged ratings with keyset cursors (agent)
+                                             Stored TMDB people and credits, and cached TMDB person searches and credits (agent)
+                                             Ingested actor and director search results in background jobs (agent)
 Preconditions: Django environment must be set up correctly, and necessary environment variables (API keys) must be available.
 Acceptable and unacceptable input values or types: Functions expect specific types as documented in their respective comments.
 Postconditions: Functions return values or modify the database as per their documentation.
@@ -16,6 +25,7 @@ Any known faults: None.
 """
 
 import threading
+import queue
 import time
 import datetime
 import os
@@ -24,9 +34,21 @@ import requests
 import json
 import webapp.letterboxd_scraper as lbd_scrape
 import webapp.just_watch_scraper as jw_scrape
+import webapp.http_client as http_client
+import webapp.ingestion as ingestion
+import webapp.home_feed as home_feed
+import webapp.page_cache as page_cache
+import webapp.filter_index as filter_index
 import concurrent.futures
+from webapp.title_index import TitleIndex
+from webapp.master_list_store import MasterListStore, MASTER_LIST_DB
 from webapp.models import *
 from dotenv import load_dotenv
+from django.db import transaction, close_old_connections
+from django.core.paginator import Paginator, EmptyPage
+from django.core.cache import cache
+from django.conf import settings
+from django.utils import timezone
 from django.db.models import F, Max, Avg
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Semaphore
@@ -35,14 +57,28 @@ from threading import Semaphore
 # Load environment variables
 load_dotenv()
 OMDB_API_KEY = os.environ["OMDB_API_KEY"]               # limited to 100,000 calls/day
-TMDB_API_KEY_STRING = os.environ["TMDB_API_KEY_STRING"] # limited to around 50 calls/second
-MASTER_LIST = "webapp/data/tmdb_master_movie_list.json"
+TMDB_API_KEY_STRING = os.environ["TMDB_API_KEY_STRING"] # limited to around 50 calls/second, enforced by http_client
+MASTER_LIST = "webapp/data/tmdb_master_movie_list.json"   # Legacy JSON export, only used if MASTER_LIST_DB is missing
 ALLOWED_PROVIDERS_LIST = "webapp/data/allowed_providers_list.txt"
+RECOMMENDATIONS_CHECKPOINT = "webapp/data/recommendations_checkpoint.json"   # Progress of update_movie_recommendations()
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
 HEADERS = {
     "accept": "application/json",
     'Authorization': TMDB_API_KEY_STRING,
 }
+NOW_PLAYING_YEARS = [2023, 2024]    # Only movies released in these years are marked as now playing
+JUSTWATCH_PROVIDERS = ["Tubi TV", "Pluto TV", "Freevee"]    # Free providers that TMDB does not list, found with JustWatch
+RECOMMENDATIONS_BATCH_SIZE = 100     # Movies written per bulk_update by update_movie_recommendations()
+STREAMING_UPDATE_BATCH_SIZE = 200    # Movies diffed and written per transaction by update_streaming_providers()
+LETTERBOXD_WORKERS = 8               # Threads scraping Letterboxd, http_client limits the request rate
+LETTERBOXD_BATCH_SIZE = 100          # Movies written per bulk_update by update_letterboxd_ratings()
+LETTERBOXD_PROGRESS_INTERVAL = 500   # Movies between throughput reports of update_letterboxd_ratings()
+RANDOM_PICK_COUNT = 3                # Movies offered by the "select a movie" popups
+ACTOR_CREDITS = 10                   # Top billed actors stored as credits of a movie
+DETAIL_ACTORS = 3                    # Actors linked on the movie details page, as many as OMDB lists
+CREDITS_BATCH_SIZE = 100             # Movies whose credits are written per transaction by update_movie_credits()
+PERSON_LOCK_STRIPES = 64             # Locks shared by the person cache keys, see get_person_lock()
+LETTERBOXD_FIELDS = ['letterboxd_rating', 'letterboxd_url', 'letterboxd_slug', 'letterboxd_checked_at', 'letterboxd_misses']
 
 # Load the ban list from the file
 def load_ban_list():
@@ -51,13 +87,25 @@ def load_ban_list():
         return set(line.strip() for line in file if not line.startswith('#'))
 BAN_LIST = load_ban_list()
 
-# Load the master list from the JSON file into a Python list
-with open(MASTER_LIST, 'r', encoding='utf-8') as file:
-    master_list = json.load(file)
-
-# Convert the master list into dictionaries for faster lookups
-title_to_id_dict = {movie['original_title'].lower(): movie['id'] for movie in master_list}
-id_to_title_dict = {movie['id']: movie['original_title'] for movie in master_list}
+# The master list is opened on first use instead of at import time
+master_list = None
+master_list_lock = threading.Lock()
+
+# Get the TMDB master list lookup, opening the SQLite store (or the legacy JSON export) the first time it is needed
+def get_master_list():
+    global master_list
+    with master_list_lock:
+        if master_list is None:
+            if os.path.exists(MASTER_LIST_DB):
+                master_list = MasterListStore(MASTER_LIST_DB)
+            elif os.path.exists(MASTER_LIST):
+                with open(MASTER_LIST, 'r', encoding='utf-8') as file:
+                    master_list = TitleIndex((movie['id'], movie['original_title']) for movie in json.load(file))
+            else:
+                # Not cached, so the store is picked up once scripts/update_tmdb_master_list.py has been run
+                print(f"TMDB master list not found: run scripts/update_tmdb_master_list.py to create {MASTER_LIST_DB}")
+                return TitleIndex([])
+        return master_list
 
 # Read allowed providers and store them in the filtered_providers list
 filtered_providers = []
@@ -71,16 +119,26 @@ database_lock = threading.Lock()
 
 # Search for movies by their title
 def search_movie_by_title(title):
-    lower_title = title.lower()
-    return [movie['id'] for movie in master_list if movie['original_title'].lower() == lower_title]
+    return get_master_list().search_title(title)
+
+# Search for movies whose title starts with the given prefix
+def search_movie_by_title_prefix(prefix, limit=20):
+    return get_master_list().search_prefix(prefix, limit)
+
+# Search for movies with a title similar to the given title
+def search_movie_by_similar_title(title, limit=20):
+    return get_master_list().search_similar(title, limit)
 
 # Search for a movie by its TMDB ID
 def search_movie_by_id(tmdb_id):
-    return id_to_title_dict.get(tmdb_id)
+    return get_master_list().search_id(tmdb_id)
 
 # Search for movies by their title and fetch their details
-def search_and_fetch_movie_by_title(title):
+# If there is no exact title match, up to prefix_limit movies starting with the title are fetched instead
+def search_and_fetch_movie_by_title(title, prefix_limit=0):
     tmdb_ids = search_movie_by_title(title)
+    if not tmdb_ids and prefix_limit:
+        tmdb_ids = search_movie_by_title_prefix(title, prefix_limit)
     with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:  # Adjust max_workers as needed
         futures = [executor.submit(process_movie_search, tmdb_id, search_movie_by_id(tmdb_id)) for tmdb_id in tmdb_ids]
         for future in concurrent.futures.as_completed(futures):
@@ -189,58 +247,48 @@ def process_movie_search(tmdb_id, title, now_playing=False, allowed_providers=fi
         existing_movie = Movie.objects.get(tmdb_id=tmdb_id)
         existing_release_year = existing_movie.release_year
         
-        # Verify now_playing is either 2023 or 2024
-        if now_playing and existing_release_year not in [2023, 2024]:
+        # Verify now_playing is in one of the now playing years
+        if now_playing and existing_release_year not in NOW_PLAYING_YEARS:
             now_playing = False
 
-        # Update its now_playing status
+        # Update its now_playing status, which only the home feed shows
         Movie.objects.filter(tmdb_id=tmdb_id).update(now_playing=now_playing)
         return
 
+    # Fetch the movie data from the upstream APIs, then store it
+    movie_record = fetch_movie_record(tmdb_id, now_playing, allowed_providers)
+    if movie_record:
+        save_movie_record(movie_record)
+
+
+# Fetch everything needed to store a new movie from TMDB, OMDB, JustWatch and Letterboxd, without using the database
+# Returns None if the movie should not be stored (adult content, or no overview or poster)
+def fetch_movie_record(tmdb_id, now_playing=False, allowed_providers=filtered_providers):
     # Make an API call to fetch more details about the movie from TMDB
     movie_details = fetch_movie_details_from_tmdb(tmdb_id)
     
     # Check if the movie is adult content
     if movie_details.get('adult'):
-        return
+        return None
     
     overview = movie_details.get('overview')
     poster_path=movie_details.get('poster_path')
     # Check if the movie has an overview and a poster
     if not overview or not poster_path:
-        return
+        return None
 
     # Extract release year from release_date
     release_date = movie_details.get('release_date')
     release_year = int(release_date.split('-')[0]) if release_date else None
     
-    # Verify now_playing is either 2023 or 2024
-    if now_playing and release_year not in [2023, 2024]:
+    # Verify now_playing is in one of the now playing years
+    if now_playing and release_year not in NOW_PLAYING_YEARS:
         now_playing = False
 
     # Extract the video results and fetch the trailer key
     videos = movie_details.get('videos', {}).get('results', [])
     trailer_key = fetch_movie_trailer_key(videos)
     
-    imdb_id = movie_details.get('imdb_id')
-    # Create the movie object with TMDB data
-    movie = Movie.objects.create(
-        tmdb_id=movie_details.get('id'),
-        imdb_id=imdb_id,
-        tmdb_popularity=movie_details.get('popularity'),
-        title=movie_details.get('title'),
-        overview=overview,
-        poster_path=poster_path,
-        release_date=release_date,
-        release_year=release_year,
-        runtime=movie_details.get('runtime'),
-        tagline=movie_details.get('tagline'),
-        trailer_key=trailer_key,
-        now_playing=now_playing,
-        original_language = movie_details.get('original_language'),
-    )
-    movie.save()
-    
     # Extract recommendations
     recommendations = movie_details.get('recommendations', {}).get('results', [])
     recommended_movie_data = []
@@ -253,25 +301,37 @@ def process_movie_search(tmdb_id, title, now_playing=False, allowed_providers=fi
                 'tmdb_popularity': rec_popularity  # Store the tmdb_popularity here
             })
 
-    movie.recommended_movie_data = recommended_movie_data
-
     # Fetch additional data from OMDB
+    imdb_id = movie_details.get('imdb_id')
     omdb_data = fetch_movie_data_from_omdb(imdb_id)
-    movie.imdb_rating = omdb_data.get('imdb_rating')
-    movie.rotten_tomatoes_rating = omdb_data.get('rotten_tomatoes_rating')
-    movie.metacritic_rating = omdb_data.get('metacritic_rating')
-    movie.director = omdb_data.get('director')
-    movie.actors = omdb_data.get('actors')
-    movie.mpa_rating = omdb_data.get('mpa_rating')
-    movie.save()
+
+    # Movie fields with TMDB and OMDB data
+    movie_fields = {
+        'tmdb_id': movie_details.get('id'),
+        'imdb_id': imdb_id,
+        'tmdb_popularity': movie_details.get('popularity'),
+        'title': movie_details.get('title'),
+        'overview': overview,
+        'poster_path': poster_path,
+        'release_date': release_date or None,
+        'release_year': release_year,
+        'runtime': movie_details.get('runtime'),
+        'tagline': movie_details.get('tagline'),
+        'trailer_key': trailer_key,
+        'now_playing': now_playing,
+        'original_language': movie_details.get('original_language'),
+        'recommended_movie_data': recommended_movie_data,
+        'imdb_rating': omdb_data.get('imdb_rating'),
+        'rotten_tomatoes_rating': omdb_data.get('rotten_tomatoes_rating'),
+        'metacritic_rating': omdb_data.get('metacritic_rating'),
+        'director': omdb_data.get('director'),
+        'actors': omdb_data.get('actors'),
+        'mpa_rating': omdb_data.get('mpa_rating'),
+    }
 
     # Extract genres
-    genres = movie_details.get('genres', [])        
-    # Associate the movie with its genres from TMDB
-    for genre_data in genres:
-        genre, created = Genre.objects.get_or_create(name=genre_data['name'])
-        movie.genres.add(genre)
-    
+    genre_names = [genre_data['name'] for genre_data in movie_details.get('genres', [])]
+
     # Extract the streaming data
     streaming_data = movie_details.get('watch/providers', {}).get('results', {}).get('US', {}).get('flatrate', [])
 
@@ -279,7 +339,7 @@ def process_movie_search(tmdb_id, title, now_playing=False, allowed_providers=fi
     if not allowed_providers:
         allowed_providers = [provider_data['provider_name'] for provider_data in streaming_data]
 
-    # Loop through the streaming data and update the movie's streaming providers
+    providers = []
     for provider_data in streaming_data:
         # Rename "Amazon Prime Video" to "Amazon Prime"
         provider_name = provider_data['provider_name']
@@ -287,56 +347,215 @@ def process_movie_search(tmdb_id, title, now_playing=False, allowed_providers=fi
             provider_name = "Amazon Prime"
 
         # Check if the provider is in the allowed list
-        if provider_name in filtered_providers:
-            provider, created = StreamingProvider.objects.get_or_create(
-                provider_id=provider_data['provider_id'],
-                defaults={
-                    'name': provider_name,
-                    'logo_path': provider_data['logo_path'],
-                }
-            )
-            movie.streaming_providers.add(provider)
-    
-    # Update the streaming providers using the JustWatch scraper for Tubi TV, Pluto TV, and Freevee
-    movie.save()    # save before
-    process_justwatch_streamers(movie)
-    movie = Movie.objects.filter(title=movie.title, release_year=movie.release_year).first()    # open again after saving
+        if provider_name in allowed_providers:
+            providers.append({
+                'provider_id': provider_data['provider_id'],
+                'name': provider_name,
+                'logo_path': provider_data['logo_path'],
+            })
 
-    providers = movie.streaming_providers.all()
-    sorted_providers = sorted(providers, key=lambda x: x.ranking)
+    # The scrapers only need an unsaved movie
+    movie = Movie(**movie_fields)
 
-    if sorted_providers:
-        top_provider = sorted_providers[0]
-        movie.top_streaming_providers.add(top_provider)
+    # Use the JustWatch scraper for Tubi TV, Pluto TV, and Freevee
+    justwatch_providers = []
+    try:
+        found_providers, movie_fields['justwatch_url'] = jw_scrape.fetch_justwatch(movie)
+        if found_providers:
+            justwatch_providers = [name for name in found_providers if name in JUSTWATCH_PROVIDERS]
+    except Exception as e:
+        print(f"Failure: {e}")
 
-    # Fetch Letterboxd ratings data
+    # Fetch Letterboxd ratings data, keeping the slug that was found (or the miss) for the next refresh
     try:
-        rating_data = lbd_scrape.get_rating(movie.title, movie.release_year)
+        rating_data = lbd_scrape.get_rating_for_movie(movie)
         if rating_data:
-            if isinstance(rating_data, dict):
-                movie.letterboxd_rating = rating_data['Weighted Average']
-            elif isinstance(rating_data, list): 
-                movie.letterboxd_rating = rating_data[0]
+            movie_fields['letterboxd_rating'] = rating_data['Weighted Average']
+            movie_fields['letterboxd_url'] = rating_data.get('Letterboxd URL')
+        movie_fields['letterboxd_slug'] = movie.letterboxd_slug
+        movie_fields['letterboxd_checked_at'] = movie.letterboxd_checked_at
+        movie_fields['letterboxd_misses'] = movie.letterboxd_misses
     except Exception as e:
         print(f"Failure: {e}")
 
-    movie.save()
-    print(f"Movie '{movie.title}' (ID: {tmdb_id}) fetched and saved to the database.")
+    return {
+        'fields': movie_fields,
+        'genres': genre_names,
+        'providers': providers,
+        'justwatch_providers': justwatch_providers,
+        'credits': extract_movie_credits(movie_details.get('credits', {})),
+    }
+
+
+# Store a movie fetched by fetch_movie_record() along with its genres and streaming providers
+def save_movie_record(movie_record):
+    saved_movies = save_movie_records([movie_record])
+    return saved_movies[0] if saved_movies else None
+
+
+# Store a batch of movies fetched by fetch_movie_record() in a single transaction
+# Movies, genres, providers and the many-to-many rows are each written with one bulk insert per batch
+def save_movie_records(movie_records):
+    with transaction.atomic():
+        # Skip movies that were stored since they were fetched (e.g. by another worker)
+        tmdb_ids = [movie_record['fields']['tmdb_id'] for movie_record in movie_records]
+        stored_ids = set(Movie.objects.filter(tmdb_id__in=tmdb_ids).values_list('tmdb_id', flat=True))
+        new_records = {}
+        for movie_record in movie_records:
+            tmdb_id = movie_record['fields']['tmdb_id']
+            if tmdb_id in stored_ids or tmdb_id in new_records:
+                print(f"Movie (ID: {tmdb_id}) is already in the database.")
+                continue
+            new_records[tmdb_id] = movie_record
+        if not new_records:
+            return []
+
+        genres_by_name = get_or_create_genres(
+            {genre_name for movie_record in new_records.values() for genre_name in movie_record['genres']})
+        providers_by_id = get_or_create_providers(
+            [provider_data for movie_record in new_records.values() for provider_data in movie_record['providers']])
+        justwatch_providers_by_name = {provider.name: provider for provider in StreamingProvider.objects.filter(
+            name__in={name for movie_record in new_records.values() for name in movie_record['justwatch_providers']})}
+
+        # Create the movies, with the fields save() would normally compute
+        movies = [Movie(**movie_record['fields']) for movie_record in new_records.values()]
+        Movie.set_unique_slugs(movies)
+        for movie in movies:
+            movie.set_derived_fields()
+        Movie.objects.bulk_create(movies, ignore_conflicts=True)
+        movies = list(Movie.objects.filter(tmdb_id__in=list(new_records)))
+
+        # Build the many-to-many rows for all movies in the batch
+        genre_rows = []
+        provider_rows = []
+        top_provider_rows = []
+        for movie in movies:
+            movie_record = new_records[movie.tmdb_id]
+            for genre_name in movie_record['genres']:
+                genre_rows.append(Movie.genres.through(movie_id=movie.pk, genre_id=genres_by_name[genre_name].pk))
+
+            providers = [providers_by_id[provider_data['provider_id']] for provider_data in movie_record['providers']]
+            for provider_name in movie_record['justwatch_providers']:
+                if provider_name in justwatch_providers_by_name:
+                    providers.append(justwatch_providers_by_name[provider_name])
+                else:
+                    print(f"Streaming provider '{provider_name}' is not in the database.")
+            for provider in providers:
+                provider_rows.append(Movie.streaming_providers.through(movie_id=movie.pk, streamingprovider_id=provider.pk))
+            if providers:
+                top_provider = min(providers, key=lambda x: x.ranking)
+                top_provider_rows.append(
+                    Movie.top_streaming_providers.through(movie_id=movie.pk, streamingprovider_id=top_provider.pk))
+
+        Movie.genres.through.objects.bulk_create(genre_rows, ignore_conflicts=True)
+        Movie.streaming_providers.through.objects.bulk_create(provider_rows, ignore_conflicts=True)
+        Movie.top_streaming_providers.through.objects.bulk_create(top_provider_rows, ignore_conflicts=True)
+        save_movie_credits({movie: new_records[movie.tmdb_id].get('credits', []) for movie in movies})
+        # Bulk inserts send no signals, the new movies are in the listings and the pages recommending them
+        new_tmdb_ids = [movie.tmdb_id for movie in movies]
+        transaction.on_commit(page_cache.invalidate_listings)
+        transaction.on_commit(lambda: page_cache.invalidate_tmdb_ids(new_tmdb_ids))
+        filter_index.add_movies(movies, [(row.movie_id, row.genre_id) for row in genre_rows],
+                                [(row.movie_id, row.streamingprovider_id) for row in provider_rows])
+
+    for movie in movies:
+        print(f"Movie '{movie.title}' (ID: {movie.tmdb_id}) fetched and saved to the database.")
+    return movies
+
+
+# Get the genres with the given names, creating the missing ones in one query
+def get_or_create_genres(genre_names):
+    genres_by_name = {}
+    for genre in Genre.objects.filter(name__in=genre_names):
+        genres_by_name.setdefault(genre.name, genre)
+    missing_names = [genre_name for genre_name in genre_names if genre_name not in genres_by_name]
+    if missing_names:
+        Genre.objects.bulk_create([Genre(name=genre_name) for genre_name in missing_names])
+        for genre in Genre.objects.filter(name__in=missing_names):
+            genres_by_name.setdefault(genre.name, genre)
+    return genres_by_name
+
+
+# Get the streaming providers for TMDB provider data, creating the missing ones in one query
+def get_or_create_providers(providers_data):
+    provider_ids = {provider_data['provider_id'] for provider_data in providers_data}
+    providers_by_id = StreamingProvider.objects.in_bulk(provider_ids, field_name='provider_id')
+    missing_providers = {}
+    for provider_data in providers_data:
+        if provider_data['provider_id'] not in providers_by_id:
+            missing_providers[provider_data['provider_id']] = StreamingProvider(
+                provider_id=provider_data['provider_id'],
+                name=provider_data['name'],
+                logo_path=provider_data['logo_path'],
+            )
+    if missing_providers:
+        StreamingProvider.objects.bulk_create(missing_providers.values(), ignore_conflicts=True)
+        providers_by_id.update(StreamingProvider.objects.in_bulk(list(missing_providers), field_name='provider_id'))
+    return providers_by_id
+
+
+# Extract the directors and the top billed actors from the TMDB credits of a movie
+def extract_movie_credits(credits_data):
+    credits = []
+    directors = [crew_member for crew_member in credits_data.get('crew', []) if crew_member.get('job') == 'Director']
+    for order, crew_member in enumerate(directors):
+        credits.append({'tmdb_id': crew_member['id'], 'name': crew_member['name'], 'role': Credit.DIRECTOR, 'order': order})
+    for cast_member in credits_data.get('cast', []):
+        if cast_member.get('order', 0) < ACTOR_CREDITS:
+            credits.append({'tmdb_id': cast_member['id'], 'name': cast_member['name'], 'role': Credit.ACTOR,
+                            'order': cast_member.get('order', 0)})
+    return credits
+
+
+# Get the people with the given TMDB ids (a {tmdb_id: name} dict), creating the missing ones and renaming the
+# changed ones with one query each
+def get_or_create_people(people_data):
+    people_by_id = Person.objects.in_bulk(list(people_data), field_name='tmdb_id')
+    missing_people = [Person(tmdb_id=tmdb_id, name=name) for tmdb_id, name in people_data.items() if tmdb_id not in people_by_id]
+    if missing_people:
+        Person.objects.bulk_create(missing_people, ignore_conflicts=True)
+        people_by_id.update(Person.objects.in_bulk([person.tmdb_id for person in missing_people], field_name='tmdb_id'))
+    renamed_people = []
+    for tmdb_id, name in people_data.items():
+        if people_by_id[tmdb_id].name != name:
+            people_by_id[tmdb_id].name = name
+            renamed_people.append(people_by_id[tmdb_id])
+    if renamed_people:
+        Person.objects.bulk_update(renamed_people, ['name'])
+    return people_by_id
+
+
+# Store the credits extracted by extract_movie_credits() for a {movie: credits} dict of saved movies
+# With replace=True the previous credits of the movies are removed first, for refreshed movies
+def save_movie_credits(movie_credits, replace=False):
+    with transaction.atomic():
+        people_by_id = get_or_create_people(
+            {credit['tmdb_id']: credit['name'] for credits in movie_credits.values() for credit in credits})
+        if replace:
+            Credit.objects.filter(movie__in=[movie.pk for movie in movie_credits]).delete()
+        Credit.objects.bulk_create([
+            Credit(movie_id=movie.pk, person_id=people_by_id[credit['tmdb_id']].pk, role=credit['role'], order=credit['order'])
+            for movie, credits in movie_credits.items() for credit in credits
+        ], ignore_conflicts=True)
+        # Director and actor pages list the credited movies, and movie pages link to the credited people
+        movie_ids = [movie.pk for movie in movie_credits]
+        transaction.on_commit(lambda: page_cache.invalidate_movies(movie_ids))
+        transaction.on_commit(lambda: page_cache.invalidate_listings(['director', 'actor']))
 
 
 # Fetch detailed information about a movie from TMDB
 def fetch_movie_details_from_tmdb(tmdb_id):
     # Define the TMDB API endpoint and parameters
-    url = f"{TMDB_BASE_URL}/movie/{tmdb_id}?language=en-US&append_to_response=videos,watch/providers,recommendations"
-    # Fetch movie details, videos, and recommendations from TMDB
-    response = requests.get(url, headers=HEADERS)
+    url = f"{TMDB_BASE_URL}/movie/{tmdb_id}?language=en-US&append_to_response=videos,watch/providers,recommendations,credits"
+    # Fetch movie details, videos, recommendations, and credits from TMDB
+    response = http_client.get(url, headers=HEADERS)
     return response.json()
 
 
 # Fetch additional data about a movie from OMDB
 def fetch_movie_data_from_omdb(imdb_id):
     url = f"http://www.omdbapi.com/?i={imdb_id}&apikey={OMDB_API_KEY}"
-    response = requests.get(url)
+    response = http_client.get(url)
     data = response.json()
     movie_data = {}
     for rating in data.get('Ratings', []):
@@ -368,220 +587,195 @@ def fetch_popular_movies(start_page=1, end_page=5):
         end_page = 500  # Limit the number of pages to 500
 
     total_num_movies = 20 * (end_page - start_page + 1)
-    
     print(f"Fetching {total_num_movies} movies from TMDB")
-    fetches_per_second = 20
+    print(f"Movies in database: {Movie.objects.count()}")
 
-    movies = Movie.objects.all()
-    num_movies_in_db = movies.count()
-    print(f"Movies in database: {num_movies_in_db}")
-    
-    # Semaphore to limit the number of concurrent API fetches
-    semaphore = Semaphore(fetches_per_second)
-
-    def fetch_movie(movie_data, page_num):
-        movie_id = movie_data["id"]
-        tmdb_popularity = movie_data["popularity"]
-
-        # Check if the movie already exists in the database
-        movie = Movie.objects.filter(tmdb_id=movie_id).first()
-        
-        # If the movie already exists in db, update its tmdb_popularity attribute
-        if movie:
-            movie.tmdb_popularity = tmdb_popularity
-            movie.save()
-
-        # Avoid obscure foreign films
-        original_language = movie_data["original_language"]
-        movie_title = movie_data["title"]
-        if page_num > 40 and original_language != "en":
-            print(f"Skipped {original_language} film: {movie_title} ")
-            return
-
-        with semaphore:
-            # Ensure we don't make more than 20 requests per second
-            time.sleep(1/fetches_per_second)  # sleep 50ms
-            search_and_fetch_movie_by_id(movie_id)
-    
-    title = 'Fetching popular movies'
-    for page_num in range(start_page, end_page + 1):
-        index = (page_num - start_page + 1) * 20
-        # Create a loading progress bar
-        progress_bar_iteration(title, index, total_num_movies)
-        
-        url = f"{TMDB_BASE_URL}/movie/popular?language=en-US&page={page_num}"
-        response = requests.get(url, headers=HEADERS)
-        json_response = response.json()
-        results = json_response['results']
-
-        # Use a thread pool to process movies in parallel
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(fetch_movie, movie, page_num) for movie in results]
-            for future in as_completed(futures):
-                try:
-                    # If the function returns a result, it will be available as future.result()
-                    result = future.result()
-                except Exception as e:
-                    # Handle exception
-                    print(f"An error occurred: {str(e)}")
-
-    return json_response
+    return ingestion.ingest_movies('popular', start_page, end_page)
 
 
 # Fetch movies that are currently playing from TMDB
 def fetch_now_playing_movies(start_page=1, end_page=5):
-    # Set now_playing to False for all movies
-    Movie.objects.update(now_playing=False)
-    
-    total_num_movies = 20 * (end_page - start_page + 1)
-    
-    # Semaphore to limit the number of concurrent API fetches
-    semaphore = Semaphore(20)  # Allowing 20 fetches per second
-
-    def process_movie(movie):
-        with semaphore:
-            # Ensure we don't make more than 20 requests per second
-            time.sleep(1/20)  # sleep 50ms
-            tmdb_id = movie.get('id')
-            title = movie.get('title')
-            # Process each movie using the process_movie_search function
-            process_movie_search(tmdb_id, title, now_playing=True)
-    
-    title = 'Fetching now playing movies'
-    for page_num in range(start_page, end_page + 1):
-        index = (page_num - start_page + 1) * 20
-        # Create a loading progress bar
-        progress_bar_iteration(title, index, total_num_movies)
-        
-        url = f"{TMDB_BASE_URL}/movie/now_playing?language=en-US&page={page_num}"
-        response = requests.get(url, headers=HEADERS)
-        movies = response.json().get('results', [])
-
-        # Use a thread pool to process movies in parallel
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_movie, movie) for movie in movies]
-            for future in as_completed(futures):
-                try:
-                    # If the function returns a result, it will be available as future.result()
-                    result = future.result()
-                except Exception as e:
-                    # Handle exception
-                    print(f"An error occurred: {str(e)}")
-
-
-# Fetch movies for the index page
+    return ingestion.ingest_movies('now_playing', start_page, end_page)
+
+
+# Fetch movies for the index page, from the precomputed home feed
 def get_movies_for_index():
-    # Fetch movies that are marked as now_playing
-    now_playing_movies = Movie.objects.filter(now_playing=True)
-    # Fetch 24 random movies from the now_playing movies for "New Movies"
-    new_movies = random.sample(list(now_playing_movies), min(24, len(now_playing_movies)))
-    
-    # Order movies by tmdb_popularity in descending order, exclude the new movies, and take the top 200
-    top_200_popular_movies = Movie.objects.exclude(id__in=[movie.id for movie in new_movies]).order_by(F('tmdb_popularity').desc(nulls_last=True))[:200]
-    # Randomly select 24 movies from the top 200
-    popular_movies = random.sample(list(top_200_popular_movies), min(24, len(top_200_popular_movies)))
-
-    # Fetch the top 200 movies based on imdb_rating
-    top_200_movies = Movie.objects.all().exclude(id__in=[movie.id for movie in new_movies] + [movie.id for movie in popular_movies]).order_by('-imdb_rating')[:200]
-    # Randomly select 30 movies from the top 200
-    top_rated_movies = random.sample(list(top_200_movies), min(30, len(top_200_movies)))
-    # Sorts the selected 30 movies by their imdb_rating, with None values at the end
-    top_rated_movies.sort(key=lambda movie: (movie.imdb_rating is not None, movie.imdb_rating), reverse=True)
-    
-    # Fetch 120 random movies for "More Movies", excluding the ones already selected in new_movies, popular_movies, and top_rated_movies
-    more_movies = Movie.objects.all().exclude(id__in=[movie.id for movie in new_movies] + [movie.id for movie in popular_movies] + [movie.id for movie in top_rated_movies]).order_by('?')[:120]
-    
-    return {
-        'new_movies': new_movies,
-        'popular_movies': popular_movies,
-        'top_rated_movies': top_rated_movies,
-        'more_movies': more_movies,
-    }
+    return home_feed.get_home_feed()
 
 
-# Helper function for update_streaming_providers()
-def fetch_movie_streaming_data(movie, index):
-    url = f"{TMDB_BASE_URL}/movie/{movie.tmdb_id}?language=en-US&append_to_response=watch/providers"
-    response = requests.get(url, headers=HEADERS)
-    response_data = response.json()
-    return movie, response_data, index
+# Helper function for update_streaming_providers(), fetches only the watch providers of a movie
+# Returns the allowed TMDB providers, or None if the request failed
+def fetch_movie_streaming_data(movie):
+    url = f"{TMDB_BASE_URL}/movie/{movie.tmdb_id}/watch/providers"
+    try:
+        response = http_client.get(url, headers=HEADERS)
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        # ValueError: the body is not JSON (e.g. an HTML error page or a truncated response)
+        print(f"Failed to fetch streaming providers for movie '{movie.title}' (ID: {movie.tmdb_id}): {e}")
+        return movie, None
+
+    streaming_data = data.get('results', {}).get('US', {}).get('flatrate', [])
+    providers = []
+    for provider_data in streaming_data:
+        # Rename "Amazon Prime Video" to "Amazon Prime"
+        provider_name = provider_data['provider_name']
+        if provider_name == "Amazon Prime Video":
+            provider_name = "Amazon Prime"
 
-# Update the streaming providers for all movies in the Movie database
-def update_streaming_providers(test_limit=None, exclude_non_null_jw_url=False):
+        # Check if the provider is in the allowed list
+        if provider_name in filtered_providers:
+            providers.append({
+                'provider_id': provider_data['provider_id'],
+                'name': provider_name,
+                'logo_path': provider_data['logo_path'],
+            })
+    return movie, providers
+
+
+# Helper function for update_streaming_providers(), writes only the provider rows that changed for a batch of movies
+# fetched_data is a list of (movie, providers, justwatch_providers), justwatch_providers is None if JustWatch was not scraped
+def apply_streaming_provider_changes(fetched_data):
+    streaming_through = Movie.streaming_providers.through
+    top_streaming_through = Movie.top_streaming_providers.through
+    movie_ids = [movie.pk for movie, _, _ in fetched_data]
+    changed_movies = 0
+
+    with transaction.atomic():
+        providers_by_id = get_or_create_providers(
+            [provider_data for _, providers, _ in fetched_data for provider_data in providers])
+        justwatch_pks = dict(StreamingProvider.objects.filter(name__in=JUSTWATCH_PROVIDERS).values_list('name', 'pk'))
+
+        # Current through-table rows of the batch: movie id -> {provider pk: row id}
+        current_rows = {movie_id: {} for movie_id in movie_ids}
+        for row_id, movie_id, provider_pk in streaming_through.objects.filter(
+                movie_id__in=movie_ids).values_list('id', 'movie_id', 'streamingprovider_id'):
+            current_rows[movie_id][provider_pk] = row_id
+        current_top_rows = {movie_id: {} for movie_id in movie_ids}
+        for row_id, movie_id, provider_pk in top_streaming_through.objects.filter(
+                movie_id__in=movie_ids).values_list('id', 'movie_id', 'streamingprovider_id'):
+            current_top_rows[movie_id][provider_pk] = row_id
+
+        # Desired provider pks of each movie
+        desired_providers = {}
+        for movie, providers, justwatch_providers in fetched_data:
+            desired = {providers_by_id[provider_data['provider_id']].pk for provider_data in providers}
+            if justwatch_providers is None:
+                # JustWatch providers were not scraped this run, keep the current ones
+                desired |= set(justwatch_pks.values()) & current_rows[movie.pk].keys()
+            else:
+                for provider_name in justwatch_providers:
+                    if provider_name in justwatch_pks:
+                        desired.add(justwatch_pks[provider_name])
+                    else:
+                        print(f"Streaming provider '{provider_name}' is not in the database.")
+            desired_providers[movie.pk] = desired
+
+        rankings = dict(StreamingProvider.objects.filter(
+            pk__in={pk for desired in desired_providers.values() for pk in desired}).values_list('pk', 'ranking'))
+
+        # Set differences against the current rows
+        new_rows = []
+        removed_row_ids = []
+        removed_rows = []
+        new_top_rows = []
+        removed_top_row_ids = []
+        for movie_id, desired in desired_providers.items():
+            current = current_rows[movie_id]
+            added_pks = desired - current.keys()
+            removed_pks = current.keys() - desired
+            new_rows.extend(streaming_through(movie_id=movie_id, streamingprovider_id=pk) for pk in added_pks)
+            removed_row_ids.extend(current[pk] for pk in removed_pks)
+            removed_rows.extend((movie_id, pk) for pk in removed_pks)
+
+            # Keep the current top provider if it is still one of the best ranked
+            current_top = current_top_rows[movie_id]
+            top_pk = None
+            if desired:
+                best_ranking = min(rankings[pk] for pk in desired)
+                kept_tops = [pk for pk in current_top if pk in desired and rankings[pk] == best_ranking]
+                top_pk = kept_tops[0] if kept_tops else min(pk for pk in desired if rankings[pk] == best_ranking)
+            removed_top_row_ids.extend(row_id for pk, row_id in current_top.items() if pk != top_pk)
+            if top_pk is not None and top_pk not in current_top:
+                new_top_rows.append(top_streaming_through(movie_id=movie_id, streamingprovider_id=top_pk))
+
+            if added_pks or removed_pks:
+                changed_movies += 1
+
+        streaming_through.objects.bulk_create(new_rows, ignore_conflicts=True)
+        streaming_through.objects.filter(id__in=removed_row_ids).delete()
+        top_streaming_through.objects.bulk_create(new_top_rows, ignore_conflicts=True)
+        top_streaming_through.objects.filter(id__in=removed_top_row_ids).delete()
+
+        # Record the refresh, so the next run starts with the movies that were not refreshed
+        scraped_movies = [movie for movie, _, justwatch_providers in fetched_data if justwatch_providers is not None]
+        if scraped_movies:
+            Movie.objects.bulk_update(scraped_movies, ['justwatch_url'])
+        Movie.objects.filter(pk__in=movie_ids).update(last_updated=timezone.now())
+        transaction.on_commit(lambda: page_cache.invalidate_movies(movie_ids))
+        if new_rows or removed_row_ids:
+            transaction.on_commit(page_cache.invalidate_listings)
+            filter_index.update_links('provider', [(row.movie_id, row.streamingprovider_id) for row in new_rows],
+                                      removed_rows)
+
+    return changed_movies
+
+
+# Update the streaming providers of the movies in the Movie database
+# Movies are refreshed least recently updated first, and newest releases first among those, since their availability
+# changes the most. stale_days only refreshes movies not updated for that many days, and min_release_year only
+# refreshes movies released that year or later, so a nightly run can be limited to what is likely to have changed.
+def update_streaming_providers(test_limit=None, exclude_non_null_jw_url=False, stale_days=None, min_release_year=None,
+                               batch_size=STREAMING_UPDATE_BATCH_SIZE):
     # test_limit = 10   # Test mode, quantity of test cases
     process_justwatch = False           # Takes a while. Process JustWatch data for Tubi TV, Pluto TV, and Freevee
-    exclude_non_null_jw_url = False     # Filter only movies with null JW Urls
     include_2024 = True    # Null JW Urls are commonly 2024 before the movie is available
-    if test_limit:
-        # movies = list(Movie.objects.all()[:test_limit])
-        previous = 0
-        new_limit = test_limit + previous
-        movies = list(Movie.objects.all()[previous:new_limit])
-    else:
-        # movies = list(Movie.objects.order_by('-created_at')[:10])
-        movies = list(Movie.objects.all())
 
+    movies = Movie.objects.only('id', 'tmdb_id', 'title', 'release_year', 'justwatch_url')
+    if stale_days is not None:
+        movies = movies.filter(last_updated__lt=timezone.now() - datetime.timedelta(days=stale_days))
+    if min_release_year is not None:
+        movies = movies.filter(release_year__gte=min_release_year)
     if exclude_non_null_jw_url:
-        filtered_movies = [
-            movie for movie in movies 
-            if (not movie.justwatch_url) and (include_2024 or movie.release_year != 2024)
-        ]
-        movies = filtered_movies
-
-    print(f'Total movies to update: {len(movies)}')
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:  # Limit to 20 threads
-        futures = [executor.submit(fetch_movie_streaming_data, movie, index) for index, movie in enumerate(movies)]
-
-        for future in concurrent.futures.as_completed(futures):
-            movie, response_data, index = future.result()  # Unpack the results
-
-            # Clear all streaming providers except Tubi TV, Pluto TV, and Freevee
-            current_providers = movie.streaming_providers.all()
-            for provider in current_providers:
-                if provider.name not in ['Tubi TV', 'Pluto TV', 'Freevee']:
-                    movie.streaming_providers.remove(provider)
-                    
-            streaming_data = response_data.get('watch/providers', {}).get('results', {}).get('US', {}).get('flatrate', [])
-            # Update streaming providers based on the fetched data
-            for provider_data in streaming_data:
-                # Rename "Amazon Prime Video" to "Amazon Prime"
-                provider_name = provider_data['provider_name']
-                if provider_name == "Amazon Prime Video":
-                    provider_name = "Amazon Prime"
-
-                # Check if the provider is in the allowed list
-                if provider_name in filtered_providers:
-                    provider, created = StreamingProvider.objects.get_or_create(
-                        provider_id=provider_data['provider_id'],
-                        defaults={
-                            'name': provider_name,
-                            'logo_path': provider_data['logo_path'],
-                        }
-                    )
-                    movie.streaming_providers.add(provider)
+        # Filter only movies with null JW Urls
+        movies = movies.filter(Q(justwatch_url__isnull=True) | Q(justwatch_url=''))
+        if not include_2024:
+            movies = movies.exclude(release_year=2024)
+    movies = movies.order_by('last_updated', F('release_year').desc(nulls_last=True))
+    if test_limit:
+        movies = movies[:test_limit]
+    movies = list(movies)
 
+    total_movies = len(movies)
+    print(f'Total movies to update: {total_movies}')
+
+    changed_movies = 0
+    failed_movies = 0
+    with ThreadPoolExecutor(max_workers=20) as executor:  # Limit to 20 threads, http_client enforces the TMDB rate
+        for start in range(0, total_movies, batch_size):
+            batch = movies[start:start + batch_size]
+            fetched = [(movie, providers) for movie, providers in executor.map(fetch_movie_streaming_data, batch)
+                       if providers is not None]
+            failed_movies += len(batch) - len(fetched)
+
+            # Use the JustWatch scraper for Tubi TV, Pluto TV, and Freevee, the whole batch is scraped concurrently
+            justwatch_results = [None] * len(fetched)
             if process_justwatch:
-                # Remove Tubi TV, Pluto TV, and Freevee before calling process_justwatch_streamers
-                current_providers = movie.streaming_providers.all()
-                for provider in current_providers:
-                    if provider.name in ['Tubi TV', 'Pluto TV', 'Freevee']:
-                        movie.streaming_providers.remove(provider)
-
-                # Update the streaming providers using the JustWatch scraper for Tubi TV, Pluto TV, and Freevee
-                process_justwatch_streamers(movie, add_delay=True)
-
-            providers = movie.streaming_providers.all()
-            sorted_providers = sorted(providers, key=lambda x: x.ranking)
-            movie.top_streaming_providers.clear()
-
-            if sorted_providers:
-                top_provider = sorted_providers[0]
-                movie.top_streaming_providers.add(top_provider)
-
-            if index % 10 == 0 and index != 0:
-                print(f'Updated streaming providers for {index}/{len(movies)} movies')
-    executor.shutdown()  # Ensure that the executor is closed after completing all tasks
+                justwatch_results = jw_scrape.fetch_justwatch_many([movie for movie, _ in fetched])
+            fetched_data = []
+            for (movie, providers), justwatch_result in zip(fetched, justwatch_results):
+                justwatch_providers = None
+                if justwatch_result is not None:
+                    found_providers, movie.justwatch_url = justwatch_result
+                    justwatch_providers = [name for name in found_providers or [] if name in JUSTWATCH_PROVIDERS]
+                fetched_data.append((movie, providers, justwatch_providers))
+            if fetched_data:
+                changed_movies += apply_streaming_provider_changes(fetched_data)
+            progress_bar_iteration('Updating Streaming Providers', start + len(batch), total_movies)
+
+    print(f'Streaming providers changed for {changed_movies}/{total_movies} movies ({failed_movies} failed).')
+    return changed_movies
 
 
 # Helper function for update_omdb_movie_ratings()
@@ -624,84 +818,99 @@ def update_omdb_movie_ratings(test_limit=None):
                 print(f'Updated omdb ratings for {index}/{total_movies} movies')
 
 
+# Helper function for update_movie_recommendations(), fetches the recommendations of one movie from TMDB
+def fetch_movie_recommendations(movie):
+    url = f"{TMDB_BASE_URL}/movie/{movie.tmdb_id}/recommendations?language=en-US"
+    try:
+        response = http_client.get(url, headers=HEADERS)
+        response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx and 5xx)
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        # ValueError: the body is not JSON (e.g. an HTML error page or a truncated response)
+        print(f"Failed to fetch recommendations for movie '{movie.title}' (ID: {movie.tmdb_id}): {e}")
+        return movie, None
+
+    recommended_movie_data = []
+    for recommendation in data.get('results', []):
+        recommended_popularity = recommendation.get('popularity', 0)  # Default to 0 if popularity is not present
+        # Only append the recommendation if its popularity is greater than 10
+        if recommended_popularity > 10:
+            recommended_movie_data.append({
+                'tmdb_id': recommendation.get('id'),
+                'title': recommendation.get('title'),
+                'tmdb_popularity': recommended_popularity  # Store the tmdb_popularity here
+            })
+    return movie, recommended_movie_data
+
+
+# Helper functions for update_movie_recommendations(), the checkpoint holds the id of the last movie written
+def read_recommendations_checkpoint():
+    try:
+        with open(RECOMMENDATIONS_CHECKPOINT, 'r') as file:
+            return json.load(file)['last_id']
+    except (OSError, ValueError, KeyError):
+        return 0
+
+def write_recommendations_checkpoint(last_id):
+    # Write to a temporary file first, so a crash never leaves a partial checkpoint
+    temp_path = f"{RECOMMENDATIONS_CHECKPOINT}.tmp"
+    with open(temp_path, 'w') as file:
+        json.dump({'last_id': last_id}, file)
+    os.replace(temp_path, RECOMMENDATIONS_CHECKPOINT)
+
+
 # Updates the movie recommendations for all movies in the Movie database
-def update_movie_recommendations():
-    # Get all movies from your database
-    movies = Movie.objects.all()
+# Movies are processed in id order, fetched concurrently (bounded by the TMDB rate limit of http_client) and written back
+# with one bulk_update per batch. After each batch the checkpoint is saved, so with resume=True a run that was
+# interrupted continues after the last batch written instead of starting over.
+def update_movie_recommendations(test_limit=None, resume=True, batch_size=RECOMMENDATIONS_BATCH_SIZE):
+    # Test runs (test_limit) neither resume from nor record the checkpoint of the full runs
+    use_checkpoint = not test_limit
+    last_id = read_recommendations_checkpoint() if resume and use_checkpoint else 0
+    movies = Movie.objects.only('id', 'tmdb_id', 'title', 'recommended_movie_data').order_by('id')
     total_num_movies = movies.count()
-    
-    # Print the number of movies in the database
-    print(f'Total movies in database: {movies.count()}')
+    if test_limit:
+        total_num_movies = min(test_limit, total_num_movies)
+    processed = movies.filter(id__lte=last_id).count() if last_id else 0
 
-    for index, movie in enumerate(movies, start=1):
-        # Define the TMDB API endpoint and parameters for fetching recommendations
-        
-        # Create a loading progress bar
-        title = 'Updating Movie Recs'
-        progress_bar_iteration(title, index, total_num_movies)
-        
-        url = f"{TMDB_BASE_URL}/movie/{movie.tmdb_id}/recommendations?language=en-US"
+    # Print the number of movies in the database
+    print(f'Total movies in database: {total_num_movies}')
+    if processed:
+        print(f'Resuming after movie ID {last_id} ({processed} movies already processed)')
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        while processed < total_num_movies:
+            batch = list(movies.filter(id__gt=last_id)[:min(batch_size, total_num_movies - processed)])
+            if not batch:
+                break
 
-        # Fetch movie recommendations from TMDB
-        try:
-            response = requests.get(url, headers=HEADERS)
-            response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx and 5xx)
-        except requests.RequestException as e:
-            print(f"Failed to fetch recommendations for movie '{movie.title}' (ID: {movie.tmdb_id}): {e}")
-            continue  # Skip to the next movie
-        
-        recommendations = response.json().get('results', [])
-        
-        # Clear the existing recommendations
-        movie.recommended_movie_data.clear()
-        
-        for recommendation in recommendations:
-            recommended_tmdb_id = recommendation.get('id')
-            recommended_title = recommendation.get('title')
-            recommended_popularity = recommendation.get('popularity', 0)  # Default to 0 if popularity is not present
-
-            # Only append the recommendation if its popularity is greater than 10
-            if recommended_popularity > 10:
-                movie.recommended_movie_data.append({
-                    'tmdb_id': recommended_tmdb_id,
-                    'title': recommended_title,
-                    'tmdb_popularity': recommended_popularity  # Store the tmdb_popularity here
-                })
-        
-        # Save the updated recommended_movie_data field to the database
-        movie.save()
-        
-        # Print a message every 100 movies processed
-        if index % 100 == 0:
-            print(f'Processed recommendations for {index}/{movies.count()} movies')
-        
-    # After fetching TMDB recommendations
-    if len(movie.recommended_movie_data) < 20:
+            updated_movies = []
+            for movie, recommended_movie_data in executor.map(fetch_movie_recommendations, batch):
+                if recommended_movie_data is None:
+                    continue  # Skip to the next movie
+                movie.recommended_movie_data = recommended_movie_data
+                updated_movies.append(movie)
 
-        # Calculate number of recommendations needed
-        needed = 20 - len(movie.recommended_movie_data)
+            # Save the updated recommended_movie_data fields to the database
+            Movie.objects.bulk_update(updated_movies, ['recommended_movie_data'])
+            page_cache.invalidate_movies([movie.pk for movie in updated_movies])
+            last_id = batch[-1].id
+            if use_checkpoint:
+                write_recommendations_checkpoint(last_id)
 
-        # Query for recent movies in database
-        recent_movies = Movie.objects.order_by('-created_at')[:needed*2]
-        
-        for r_movie in recent_movies:
-            if len(movie.recommended_movie_data) >= 20:
-                break
+            processed += len(batch)
+            progress_bar_iteration('Updating Movie Recs', processed, total_num_movies)
 
-            movie.recommended_movie_data.append({
-                'tmdb_id': r_movie.tmdb_id,
-                'title': r_movie.title, 
-                'tmdb_popularity': r_movie.tmdb_popularity
-            })
-            
-            # Save updated recommendations 
-            movie.save()
+    # The full pass completed, the next run starts from the beginning
+    if use_checkpoint and os.path.exists(RECOMMENDATIONS_CHECKPOINT):
+        os.remove(RECOMMENDATIONS_CHECKPOINT)
+    print(f'Processed recommendations for {processed}/{total_num_movies} movies')
 
 # Update the streaming providers using the JustWatch scraper for Tubi TV, Pluto TV, and Freevee
-def process_justwatch_streamers(movie, add_delay=False):
+def process_justwatch_streamers(movie):
     movie_instance = Movie.objects.filter(title=movie.title, release_year=movie.release_year).first()
     if movie_instance:
-        providers, jw_url_movie = jw_scrape.fetch_justwatch(movie, add_delay)
+        providers, jw_url_movie = jw_scrape.fetch_justwatch(movie)
         movie_instance.justwatch_url = jw_url_movie
         movie_instance.save()
         if providers is not None:
@@ -715,13 +924,47 @@ def process_justwatch_streamers(movie, add_delay=False):
     else:
         print(f"Movie not found in the database: {movie.title}, {movie.release_year}")
 
+# Helper function for update_letterboxd_ratings(), scrapes the rating of one movie and sets it on the movie
+# Returns True if a rating was found
+def fetch_letterboxd_rating(movie):
+    try:
+        # Try to get rating information using letterboxd web scraper
+        rating_dict = lbd_scrape.get_rating_for_movie(movie)
+
+        # If rating dict exists, append information to movie model, otherwise fail
+        if rating_dict:
+            movie.letterboxd_rating = rating_dict["Weighted Average"]
+            # TODO: Add histogram weights or remove this line
+            # movie.letterboxd_histogram_weights = rating_dict["Histogram Weights"]
+            if "Letterboxd URL" in rating_dict:
+                movie.letterboxd_url = rating_dict.get("Letterboxd URL")
+            return True
+    except Exception:
+        pass
+    print("Failed Letterboxd scrape for", movie.title, "("+str(movie.release_year)+")")
+    return False
+
+# Helper function for update_letterboxd_ratings(), scrapes movies from the queue until it gets None
+def letterboxd_worker(movie_queue, result_queue):
+    while True:
+        movie = movie_queue.get()
+        if movie is None:
+            break
+        try:
+            found = fetch_letterboxd_rating(movie)
+        finally:
+            close_old_connections()     # The scraper's page cache is read and written from this thread
+        result_queue.put((movie, found))
+
 # Update the Letterboxd ratings for all movies in the Movie database
-def update_letterboxd_ratings(update_movie=None):
+# A fixed pool of LETTERBOXD_WORKERS threads scrapes the movies from a queue, http_client limits the request rate
+# to Letterboxd, and the results are written back with one bulk_update per LETTERBOXD_BATCH_SIZE movies.
+def update_letterboxd_ratings(update_movie=None, workers=LETTERBOXD_WORKERS, batch_size=LETTERBOXD_BATCH_SIZE):
     ''' Update the letterboxd ratings for all movies in the Movie database ''' 
     exclude_non_null_lbd_url = False
     
     # Get movies
-    movies = Movie.objects.all()  
+    movies = Movie.objects.only('id', 'title', 'release_year', *LETTERBOXD_FIELDS)
     if exclude_non_null_lbd_url:
         movies = movies.filter(letterboxd_url__isnull=True)
     if update_movie:
@@ -729,67 +972,51 @@ def update_letterboxd_ratings(update_movie=None):
         title = update_movie.title
         release_year = update_movie.release_year
         movies = movies.filter(title__icontains=title, release_year=release_year)
-        
-    # Limiter for calls; try to not overload Letterboxd
-    request_frequency = 8
-    sleep_time = 1/request_frequency
+    movies = list(movies)
+    total_movies = len(movies)
 
     # Start time
     start_ts = time.time()
     start_dt = datetime.datetime.fromtimestamp(start_ts)
     print("Start:", start_dt)
- 
-    # Calculate totals
-    total_movies = len(movies)
-    ratings_per_sec = 7.85
-    total_secs = int(total_movies / ratings_per_sec)
-  
     print(f"Total movies: {total_movies}")
-    print(f"Total estimated time: {seconds_to_readable_time(total_secs)}")
-
-    # Calculate completion datetime
-    delta = datetime.timedelta(seconds=total_secs)
-    completion_dt = start_dt + delta
 
-    print("Estimated completion:", completion_dt)
-
-    # Updates the movie with letterboxd rating
-    def iterate_movie(movie):
-        try:
-            # Try to get rating information using letterboxd web scraper
-            rating_dict = lbd_scrape.get_rating(movie.title, movie.release_year)
-
-            # If rating dict exists, append information to movie model, otherwise fail
-            if rating_dict:
-                movie.letterboxd_rating = rating_dict["Weighted Average"]
-                # TODO: Add histogram weights or remove this line
-                # movie.letterboxd_histogram_weights = rating_dict["Histogram Weights"]
-                if "Letterboxd URL" in rating_dict:
-                    movie.letterboxd_url = rating_dict.get("Letterboxd URL")
-            else:
-                raise Exception
+    # Queue every movie, followed by one stop signal per worker
+    movie_queue = queue.Queue()
+    result_queue = queue.Queue()
+    for movie in movies:
+        movie_queue.put(movie)
+    workers = min(workers, total_movies)
+    for _ in range(workers):
+        movie_queue.put(None)
+    threads = [threading.Thread(target=letterboxd_worker, args=(movie_queue, result_queue), daemon=True)
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
 
-            # print("Successful scrape of letterboxd for", movie.title, "("+str(movie.release_year)+")")
-        except Exception as e:
-            print("Failed Letterboxd scrape for", movie.title, "("+str(movie.release_year)+")")
-            
-        # Save the updated recommended_movie_data field to the database
-        movie.save()
+    # Collect the results and write them in batches, misses are written too so their backoff is kept
+    scraped_movies = []
+    failed = 0
+    for completed in range(1, total_movies + 1):
+        movie, found = result_queue.get()
+        scraped_movies.append(movie)
+        if not found:
+            failed += 1
+        if len(scraped_movies) >= batch_size or completed == total_movies:
+            Movie.objects.bulk_update(scraped_movies, LETTERBOXD_FIELDS)
+            page_cache.invalidate_movies([movie.pk for movie in scraped_movies])
+            scraped_movies = []
+
+        # Report the measured throughput and the estimated time left
+        progress_bar_iteration('Letterboxd Scraping Progress', completed, total_movies)
+        if completed % LETTERBOXD_PROGRESS_INTERVAL == 0 and completed < total_movies:
+            ratings_per_sec = completed / max(time.time() - start_ts, 0.001)
+            remaining_secs = (total_movies - completed) / ratings_per_sec
+            completion_dt = datetime.datetime.now() + datetime.timedelta(seconds=remaining_secs)
+            print(f"\n{completed}/{total_movies} movies, {ratings_per_sec:.2f} movies/sec, {failed} failed, "
+                  f"{seconds_to_readable_time(remaining_secs) or '0 seconds'} left (estimated completion: "
+                  f"{completion_dt:%H:%M:%S})")
 
-    # Make API Calls to update each movie
-    threads = []
-    for index, movie in enumerate(movies, start=1):
-        thread = threading.Thread(target=iterate_movie, args=(movie, ))
-        
-        # Create a loading progress bar
-        title = 'Letterboxd Scraping Progress'
-        progress_bar_iteration(title, index, total_movies)
-        
-        threads.append(thread)
-        thread.start()
-        time.sleep(sleep_time)
-        
-    # Wait until all threads are done
     for thread in threads:
         thread.join()
 
@@ -806,53 +1033,49 @@ def update_letterboxd_ratings(update_movie=None):
     duration_secs = duration.total_seconds()
     fmt_duration = time.strftime('%H:%M:%S', time.gmtime(duration_secs))
 
-    print(f"Total duration: {fmt_duration}")
+    print(f"Total duration: {fmt_duration} ({total_movies / max(duration_secs, 0.001):.2f} movies/sec, {failed} failed)")
 
 
 # Fetches pages from the TMDb API for Discover movies
 def fetch_tmdb_discover_movies(start_page=1, end_page=10):
     total_num_movies = 20 * (end_page - start_page + 1)
-    
     print(f"Fetching {total_num_movies} movies from TMDB")
-    fetches_per_second = 20
+    print(f"Movies in database: {Movie.objects.count()}")
 
-    movies = Movie.objects.all()
-    num_movies_in_db = movies.count()
-    print(f"Movies in database: {num_movies_in_db}")
-    
-    # Semaphore to limit the number of concurrent API fetches
-    semaphore = Semaphore(fetches_per_second)
-
-    def process_movie(movie):
-        with semaphore:
-            # Ensure we don't make more than 20 requests per second
-            time.sleep(1/fetches_per_second)  # sleep 50ms
-            tmdb_id = movie.get('id')
-            title = movie.get('title')
-            # Process each movie using the process_movie_search function
-            process_movie_search(tmdb_id, title)
-
-    for page in range(start_page, end_page + 1):
-        index = (page - start_page + 1) * 20
-        # Create a loading progress bar
-        title = 'Fetching TMDb discover movies'
-        progress_bar_iteration(title, index, total_num_movies)
-
-        url = f"{TMDB_BASE_URL}/discover/movie?sort_by=popularity.desc&language=en-US&page={page}"
-        response = requests.get(url, headers=HEADERS)
-        response.raise_for_status()  # This will raise an HTTPError for bad responses (4xx and 5xx)
-        movies = response.json().get('results', [])
-        
-        # Use a thread pool to process movies in parallel
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(process_movie, movie) for movie in movies]
-            for future in as_completed(futures):
-                try:
-                    # If the function returns a result, it will be available as future.result()
-                    result = future.result()
-                except Exception as e:
-                    # Handle exception
-                    print(f"An error occurred: {str(e)}")
+    return ingestion.ingest_movies('discover', start_page, end_page)
+
+
+# Helper function for update_movie_credits(), fetches the credits of one movie from TMDB
+def fetch_movie_credits(movie):
+    url = f"{TMDB_BASE_URL}/movie/{movie.tmdb_id}/credits?language=en-US"
+    try:
+        response = http_client.get(url, headers=HEADERS)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Failed to fetch credits for movie '{movie.title}' (ID: {movie.tmdb_id}): {e}")
+        return movie, None
+    return movie, extract_movie_credits(response.json())
+
+
+# Fetch the TMDB credits of the movies stored before credits were ingested, for the director and actor pages
+# Credits are fetched concurrently and written with one bulk insert per batch
+def update_movie_credits(test_limit=None, batch_size=CREDITS_BATCH_SIZE):
+    movies = Movie.objects.filter(credits__isnull=True).only('id', 'tmdb_id', 'title').order_by('id')
+    if test_limit:
+        movies = movies[:test_limit]
+    movies = list(movies)
+    total_movies = len(movies)
+    print(f'Movies without credits: {total_movies}')
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
+        batch = {}
+        for index, (movie, credits) in enumerate(executor.map(fetch_movie_credits, movies), start=1):
+            if credits:
+                batch[movie] = credits
+            if len(batch) >= batch_size or index == total_movies:
+                save_movie_credits(batch)
+                batch = {}
+                print(f'Updated credits for {index}/{total_movies} movies')
 
 
 def get_refreshed_movie_data(movie_tmdb_id):
@@ -927,6 +1150,7 @@ def get_refreshed_movie_data(movie_tmdb_id):
     movie.actors = omdb_data.get('actors')
     movie.mpa_rating = omdb_data.get('mpa_rating')
     movie.save()
+    save_movie_credits({movie: extract_movie_credits(movie_details.get('credits', {}))}, replace=True)
 
     # Extract genres
     genres = movie_details.get('genres', [])        
@@ -976,12 +1200,9 @@ def get_refreshed_movie_data(movie_tmdb_id):
 
     # Fetch Letterboxd ratings data
     try:
-        rating_data = lbd_scrape.get_rating(movie.title, movie.release_year)
+        rating_data = lbd_scrape.get_rating_for_movie(movie)
         if rating_data:
-            if isinstance(rating_data, dict):
-                movie.letterboxd_rating = rating_data['Weighted Average']
-            elif isinstance(rating_data, list): 
-                movie.letterboxd_rating = rating_data[0]
+            movie.letterboxd_rating = rating_data['Weighted Average']
     except Exception as e:
         print(f"Failure: {e}")
 
@@ -1030,89 +1251,192 @@ def get_person_names(person_name):
             name_list.append(person)
     return name_list
 
+# Movies credited to the people with exactly this name in a role, with one indexed join through Credit
+def get_movies_by_person(person_name, role):
+    return Movie.objects.filter(credits__person__name=person_name, credits__role=role).order_by('release_date')
+
 def get_movies_by_director(director_name):
-    # Query for movies containing the director's name
+    if Person.objects.filter(name=director_name).exists():
+        return get_movies_by_person(director_name, Credit.DIRECTOR)
+    # Movies stored before credits were ingested only have the OMDB names, until update_movie_credits() is run
     movies = Movie.objects.filter(director__icontains=director_name).order_by('release_date')
     return movies
 
 def get_movies_by_actor(actor_name):
-    # Query for movies containing the director's name
+    if Person.objects.filter(name=actor_name).exists():
+        return get_movies_by_person(actor_name, Credit.ACTOR)
+    # Movies stored before credits were ingested only have the OMDB names, until update_movie_credits() is run
     movies = Movie.objects.filter(actors__icontains=actor_name).order_by('release_date')
     return movies
 
-def get_person_id(actor_name):
-    search_url = f"{TMDB_BASE_URL}/search/person?query={actor_name}&include_adult=false&language=en-US&page=1"
-    response = requests.get(search_url, headers=HEADERS)
-    data = response.json()
-    if data.get('results'):
-        actor = data['results'][0]
-        return actor['id']
-    else:
-        return None
+# Names of the directors and of the first actors of a movie, as comma-joined strings for get_person_slugs()
+# Uses the TMDB credits, so the links match the director and actor pages, or the OMDB names if there are none
+def get_credited_names(movie):
+    credits = list(movie.credits.select_related('person').order_by('role', 'order'))
+    if not credits:
+        return movie.director, movie.actors
+    directors = [credit.person.name for credit in credits if credit.role == Credit.DIRECTOR]
+    actors = [credit.person.name for credit in credits if credit.role == Credit.ACTOR][:DETAIL_ACTORS]
+    return ", ".join(directors) or movie.director, ", ".join(actors) or movie.actors
+
+# Lock of a person cache key, taken on a cache miss so concurrent misses for the same key make a single TMDB call
+# Keys share a fixed set of locks, so the locks never need to be cleaned up
+_person_locks = [threading.Lock() for _ in range(PERSON_LOCK_STRIPES)]
+
+def get_person_lock(key):
+    return _person_locks[hash(key) % PERSON_LOCK_STRIPES]
+
+# TMDB id of the person best matching a name
+# A name credited to exactly one stored person needs no request. Otherwise TMDB search results are cached in
+# PersonSearchCache for TMDB_PERSON_CACHE_TTL seconds, and a stale result is used if TMDB cannot be reached
+def get_person_id(person_name):
+    person_ids = list(Person.objects.filter(name=person_name).values_list('tmdb_id', flat=True)[:2])
+    if len(person_ids) == 1:
+        return person_ids[0]
+
+    query = " ".join(person_name.split()).casefold()
+    cached_search = PersonSearchCache.objects.filter(query=query).first()
+    if cached_search and cached_search.is_fresh(settings.TMDB_PERSON_CACHE_TTL):
+        return cached_search.person_tmdb_id
+
+    with get_person_lock(('search', query)):
+        # Another request may have searched the name while this one waited
+        cached_search = PersonSearchCache.objects.filter(query=query).first()
+        if cached_search and cached_search.is_fresh(settings.TMDB_PERSON_CACHE_TTL):
+            return cached_search.person_tmdb_id
+
+        params = {'query': person_name, 'include_adult': 'false', 'language': 'en-US', 'page': 1}
+        try:
+            response = http_client.get(f"{TMDB_BASE_URL}/search/person", params=params, headers=HEADERS)
+            response.raise_for_status()
+            results = response.json().get('results')
+        except (requests.RequestException, ValueError) as e:
+            # ValueError: the body is not JSON (e.g. an HTML error page or a truncated response)
+            print(f"Failed to search TMDB for person '{person_name}': {e}")
+            return cached_search.person_tmdb_id if cached_search else None
+
+        person_id = results[0]['id'] if results else None
+        PersonSearchCache.objects.update_or_create(query=query, defaults={
+            'person_tmdb_id': person_id,
+            'fetched_at': timezone.now(),
+        })
+        return person_id
+
+# TMDB movie credits of a person, as {'cast': [...], 'crew': [...]} with the fields the fetch helpers use
+# Cached in PersonCreditsCache like the searches of get_person_id()
+def get_person_movie_credits(person_id):
+    cached_credits = PersonCreditsCache.objects.filter(person_tmdb_id=person_id).first()
+    if cached_credits and cached_credits.is_fresh(settings.TMDB_PERSON_CACHE_TTL):
+        return {'cast': cached_credits.cast, 'crew': cached_credits.crew}
+
+    with get_person_lock(('credits', person_id)):
+        cached_credits = PersonCreditsCache.objects.filter(person_tmdb_id=person_id).first()
+        if cached_credits and cached_credits.is_fresh(settings.TMDB_PERSON_CACHE_TTL):
+            return {'cast': cached_credits.cast, 'crew': cached_credits.crew}
 
-def get_movies_from_tmdb_by_actor(person_id):
-    credits_url = f"{TMDB_BASE_URL}/person/{person_id}/movie_credits"
-    response = requests.get(credits_url, headers=HEADERS)
-    data = response.json()
-    movie_ids = [credit['id'] for credit in data.get('cast', [])]
-    # Filter movies by IDs found in the database
-    movies = Movie.objects.filter(tmdb_id__in=movie_ids).order_by('release_date')
-    return movies
+        try:
+            response = http_client.get(f"{TMDB_BASE_URL}/person/{person_id}/movie_credits", headers=HEADERS)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            # ValueError: the body is not JSON (e.g. an HTML error page or a truncated response)
+            print(f"Failed to fetch movie credits for person (ID: {person_id}): {e}")
+            if cached_credits:
+                return {'cast': cached_credits.cast, 'crew': cached_credits.crew}
+            return {'cast': [], 'crew': []}
+
+        cast = [{'id': credit['id'], 'order': credit.get('order'), 'release_date': credit.get('release_date'),
+                 'popularity': credit.get('popularity', 0)} for credit in data.get('cast', [])]
+        crew = [{'id': credit['id'], 'job': credit.get('job'), 'release_date': credit.get('release_date')}
+                for credit in data.get('crew', [])]
+        PersonCreditsCache.objects.update_or_create(person_tmdb_id=person_id, defaults={
+            'cast': cast,
+            'crew': crew,
+            'fetched_at': timezone.now(),
+        })
+        return {'cast': cast, 'crew': crew}
 
 def get_director_movies_from_tmdb_to_fetch(person_id):
-    credits_url = f"{TMDB_BASE_URL}/person/{person_id}/movie_credits"
-    response = requests.get(credits_url, headers=HEADERS)
-    data = response.json()
+    data = get_person_movie_credits(person_id)
     
     # Filter movies by crew where the person is a director and the movie has a release date
     director_movie_ids = []
-    for crew_member in data.get('crew', []):
+    for crew_member in data['crew']:
         if crew_member.get('job') == 'Director' and crew_member.get('release_date'):
             director_movie_ids.append(crew_member['id'])
     
     return director_movie_ids
 
 def get_actor_movies_from_tmdb_to_fetch(person_id):
-    credits_url = f"{TMDB_BASE_URL}/person/{person_id}/movie_credits"
-    response = requests.get(credits_url, headers=HEADERS)
-    data = response.json()
+    data = get_person_movie_credits(person_id)
     
     # Filter movies by cast where the person is an actor and the movie has a release date and popularity above 5
     actor_movie_ids = []
-    for cast_member in data.get('cast', []):
-        if cast_member['order'] < 2 and cast_member.get('release_date') and cast_member.get('popularity', 0) > 5:
+    for cast_member in data['cast']:
+        if cast_member['order'] is not None and cast_member['order'] < 2 and cast_member.get('release_date') \
+                and (cast_member.get('popularity') or 0) > 5:
             actor_movie_ids.append(cast_member['id'])
     
     return actor_movie_ids
 
+# TMDB ids of the movies of a person (role Credit.DIRECTOR or Credit.ACTOR) that are not in the database yet
+# Resolved by the hydration jobs of the actor: and director: searches
+def get_person_movies_to_fetch(person_name, role):
+    person_id = get_person_id(person_name)
+    if not person_id:
+        return []
+    if role == Credit.DIRECTOR:
+        tmdb_ids = get_director_movies_from_tmdb_to_fetch(person_id)
+    else:
+        tmdb_ids = get_actor_movies_from_tmdb_to_fetch(person_id)
+    stored_ids = set(Movie.objects.filter(tmdb_id__in=tmdb_ids).values_list('tmdb_id', flat=True))
+    return [tmdb_id for tmdb_id in tmdb_ids if tmdb_id not in stored_ids]
+
 # Performs filtering to the movie ratings list
 def filter_ratings(movie_ratings, rating_begin, rating_end):
     if rating_begin is not None and rating_end is not None:
         movie_ratings = movie_ratings.filter(user_rating__range=(rating_begin, rating_end))
     return movie_ratings
 
-# Performs filtering to the movies list
-def filter_movies(movies, genres, streamers, year_begin, year_end, imdb_begin, imdb_end):
-    # Fitler for Genre
-    if genres is not None:
-        movies = movies.filter(genres__in=genres)
-
-    # Filter for Streaming Providers
-    if streamers is not None:
-        movies = movies.filter(streaming_providers__in=streamers)
-
-    # Filter for release year
+# Performs filtering to the movies list, with the filter index instead of joins on the genres and providers
+# Returns the ids of the movies with any of the genres, any of the streaming providers, and in the year and IMDb ranges,
+# in id order. The full IMDb range also keeps the movies without a rating. movie_ids restricts the result to those movies.
+def filter_movie_ids(genre_ids, streamer_ids, year_begin, year_end, imdb_begin, imdb_end, movie_ids=None):
+    year_range = None
     if year_begin is not None and year_end is not None:
-        movies = movies.filter(release_year__range=(year_begin, year_end))
-
-    # Filter for IMDB rating
+        year_range = (int(year_begin), int(year_end))
+    rating_range = None
+    include_unrated = False
     if imdb_begin is not None and imdb_end is not None:
-        if float(imdb_begin) != 0.0 or float(imdb_end) != 10.0:
-            movies = movies.filter(imdb_rating_num__isnull=False, imdb_rating_num__range=(imdb_begin, imdb_end))
-        else:
-            movies = movies.filter(Q(imdb_rating_num__range=(imdb_begin, imdb_end)) | Q(imdb_rating_num=None))
+        rating_range = (float(imdb_begin), float(imdb_end))
+        include_unrated = rating_range == (0.0, 10.0)
+
+    return filter_index.filter_movies(
+        genre_ids=genre_ids, provider_ids=streamer_ids, year_range=year_range, rating_range=rating_range,
+        include_unrated=include_unrated, movie_ids=movie_ids)
+
+# Page of movies from a list of movie ids, only the movies on the page are loaded
+def paginate_movie_ids(movie_ids, page_number, per_page=120):
+    paginator = Paginator(movie_ids, per_page)
+    try:
+        page_obj = paginator.page(page_number)
+    except EmptyPage:
+        page_obj = paginator.page(paginator.num_pages)  # If page is out of range, deliver last page
+    page_obj.object_list = list(home_feed.get_movie_cards(page_obj.object_list))
+    return page_obj
+
+# Pick random movies out of a list of movie ids, with the top streaming providers of the popup cards prefetched
+# Only the ids are sampled, so a pick takes two queries (the movies and their providers) however many movies match
+def pick_random_movies(movie_ids, count=RANDOM_PICK_COUNT):
+    picked_ids = random.sample(movie_ids, min(count, len(movie_ids)))
+    if not picked_ids:
+        return []
+    return list(Movie.objects.filter(id__in=picked_ids).prefetch_related('top_streaming_providers'))
 
-    return movies.distinct()
+# Number of rows of a queryset, cached until the version of a page cache scope changes (e.g. 'ratings:<user id>')
+def get_cached_count(queryset, scope):
+    version = page_cache.get_versions([scope])[scope]
+    return cache.get_or_set(f'count:{scope}:{version}', queryset.count, settings.PAGE_CACHE_SECONDS)
 
 # Get FilmFocus rating string for movie details page
 def get_filmfocus_rating(movie):
@@ -1501,6 +1501,44 @@ $(document).ready(function () {
 			sliderValueLabel.textContent = "Rating (1-10): " + value;
 		}
 	}
+
+
+	/*==============================
+	Actor and Director Search Jobs
+	==============================*/
+	// After an actor: or director: search the page polls the search job, adding the cards of the movies ingested so far
+	const personMovies = document.getElementById("person-movies");
+	const personJobUrl = personMovies ? personMovies.dataset.jobUrl : null;
+	const PERSON_JOB_POLL_DELAY = 2000;	// Milliseconds between polls
+
+	async function poll_person_job() {
+		const known = Array.from(personMovies.querySelectorAll("[data-tmdb-id]"), card => card.dataset.tmdbId);
+		const response = await fetch(personJobUrl + "?known=" + known.join(","));
+		if (!response.ok)
+			return;
+
+		const data = await response.json();
+		if (data.movies.length) {
+			const searchFail = personMovies.querySelector(".search__fail");
+			if (searchFail) searchFail.remove();
+		}
+		data.movies.forEach(movie => {
+			personMovies.insertAdjacentHTML("beforeend", movie.html);
+			const card = personMovies.lastElementChild;
+			card.querySelectorAll(".card__add").forEach(x => x.addEventListener("click", async () => {
+				request_popup(x.getAttribute("movie_id"));
+				open_popup(x);
+			}));
+			card.querySelectorAll(".card__rating").forEach(x => x.addEventListener("click", async () => {
+				request_rating_popup(x.getAttribute("movie_id"));
+				open_popup();
+			}));
+		});
+		if (data.status === "running")
+			setTimeout(poll_person_job, PERSON_JOB_POLL_DELAY);
+	}
+	if (personJobUrl)
+		setTimeout(poll_person_job, PERSON_JOB_POLL_DELAY);
 });
 
 
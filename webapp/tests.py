@@ -33,9 +33,47 @@ Any known faults: None.
 """
 
 import os
-from django.test import TestCase
+import re
+import asyncio
+import json
 import time
+import queue
 import datetime
+import email.utils
+import importlib
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import requests
+from bs4 import BeautifulSoup
+from django.test import TestCase, SimpleTestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.urls import reverse
+from django.db import connection
+from django.db.models import Q
+from django.contrib.auth.models import User
+from django.utils import timezone
+import webapp.http_client as http_client
+import webapp.just_watch_scraper as jw_scrape
+import webapp.letterboxd_scraper as lbd_scrape
+import webapp.home_feed as home_feed
+import webapp.filter_index as filter_index
+import webapp.hydration_queue as hydration_queue
+import webapp.ingestion as ingestion
+from webapp.master_list_store import MasterListStore, update_master_list
+from webapp.title_index import TitleIndex
+import webapp.services as services
+from webapp.models import parse_number
+from webapp.models import Movie, Genre, StreamingProvider, MovieRating, Person, Credit, PersonSearchCache, PersonCreditsCache
+from webapp.services import handle_test_for_ban, filter_movie_ids
+from webapp.services import save_movie_records, save_movie_credits, extract_movie_credits, get_movies_by_person
+from webapp.services import get_person_id, get_person_movie_credits
+from webapp.services import get_actor_movies_from_tmdb_to_fetch, get_director_movies_from_tmdb_to_fetch
+from webapp.services import apply_streaming_provider_changes, fetch_movie_streaming_data
+from webapp.services import update_movie_recommendations, read_recommendations_checkpoint, write_recommendations_checkpoint
+from webapp.services import fetch_movie_recommendations
 
 # Constant variables and other starter variables/functions.
 OUTPUT_DIR = '/webapp/outputs/'
@@ -155,9 +193,6 @@ OUTPUT_DIR = '/webapp/outputs/'
 
 
 
-import unittest
-from django.test import Client
-
 class TestViews(unittest.TestCase):
 
     def setUp(self):
@@ -189,5 +224,917 @@ class TestViews(unittest.TestCase):
     #     self.assertEqual(response.status_code, 302)
     #     self.assertEqual(Post.objects.get(pk=1).title, 'Updated Post')
 
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'html')
+
+class TestScraperParsing(SimpleTestCase):
+    ''' The scrapers only parse the elements they need, which must give the same results as parsing the full page. '''
+
+    def parse_fixture(self, file_name, strainer, parse):
+        with open(os.path.join(FIXTURES_DIR, file_name), 'rb') as file:
+            html = file.read()
+        full_result = parse(BeautifulSoup(html, 'html.parser'))
+        strained_result = parse(BeautifulSoup(html, 'lxml', parse_only=strainer))
+        self.assertEqual(strained_result, full_result)
+        return strained_result
+
+    def test_letterboxd_rating_histogram(self):
+        rating_info = self.parse_fixture('letterboxd_rating_histogram.html', lbd_scrape.RATING_STRAINER,
+                                         lbd_scrape.parse_rating_histogram)
+        self.assertEqual(rating_info['Weighted Average'], 4.52)
+        self.assertEqual(rating_info['Histogram Counts'][0], 1234)
+        self.assertEqual(len(rating_info['Histogram Weights']), 10)
+
+    def test_letterboxd_rating_histogram_without_average(self):
+        rating_info = self.parse_fixture('letterboxd_rating_histogram_no_average.html', lbd_scrape.RATING_STRAINER,
+                                         lbd_scrape.parse_rating_histogram)
+        self.assertAlmostEqual(rating_info['Weighted Average'], 4.115)
+
+    def test_justwatch_movie_page(self):
+        movie = Movie(title='Night of the Living Dead', release_year=1968)
+        result = self.parse_fixture('justwatch_movie_page.html', jw_scrape.MOVIE_PAGE_STRAINER,
+                                    lambda soup: jw_scrape.parse_movie_page(movie, soup, 'jw_url'))
+        self.assertEqual(result, (['Tubi TV', 'Pluto TV', 'Freevee'], True, 'jw_url'))
+
+    def test_justwatch_movie_page_release_year_mismatch(self):
+        movie = Movie(title='Night of the Living Dead', release_year=1990)
+        result = self.parse_fixture('justwatch_movie_page.html', jw_scrape.MOVIE_PAGE_STRAINER,
+                                    lambda soup: jw_scrape.parse_movie_page(movie, soup, 'jw_url'))
+        self.assertEqual(result, (None, False, 'jw_url'))
+
+    def test_justwatch_search(self):
+        movie = Movie(title='Children of the Living Dead', release_year=2001)
+        url = self.parse_fixture('justwatch_search.html', jw_scrape.SEARCH_STRAINER,
+                                 lambda soup: jw_scrape.find_search_result(soup, movie))
+        self.assertEqual(url, 'https://www.justwatch.com/us/movie/children-of-the-living-dead')
+
+FULL_SCAN_PATTERN = re.compile(r'\bSCAN (webapp_\w+)\s*$')    # A table scan, "SCAN table USING INDEX" is an index scan
+
+class TestIndexQueries(TestCase):
+    ''' The home page runs as many queries, each on an index, however many movies are in the database. '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genres = [Genre.objects.create(name=f'Genre {index}') for index in range(6)]
+        cls.provider = StreamingProvider.objects.create(name='Netflix', provider_id=8, ranking=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_movies(self, count, start=0):
+        for index in range(start, start + count):
+            movie = Movie.objects.create(tmdb_id=index + 1, title=f'Movie {index}', release_year=2023,
+                                         now_playing=index % 4 == 0, tmdb_popularity=str(index),
+                                         imdb_rating=f'{index % 10}.5/10')
+            movie.genres.add(*self.genres[:5])
+            movie.top_streaming_providers.add(self.provider)
+
+    # Queries run by a request of the home page, which builds one new shuffle of the home feed until
+    # HOME_FEED_SHUFFLES are cached
+    def index_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_index_query_count(self):
+        self.create_movies(80)
+        response, small_queries = self.index_queries()
+        self.assertEqual(len(response.context['more_movies']), 6)
+
+        self.create_movies(300, start=80)
+        response, large_queries = self.index_queries()
+        self.assertEqual(len(large_queries), len(small_queries))
+        self.assertEqual(len(response.context['new_movies']), 24)
+        self.assertEqual(len(response.context['more_movies']), 120)
+        self.assertContains(response, 'Genre 3')
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is specific to SQLite')
+    def test_index_queries_use_indexes(self):
+        self.create_movies(300)
+        for sql in self.index_queries()[1]:
+            with self.subTest(query=sql[:80]), connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                scans = [line for line in plan.splitlines() if FULL_SCAN_PATTERN.search(line)]
+                self.assertEqual(scans, [], f'The home page scans a table:\n{sql}\n{plan}')
+
+    def test_index_served_from_home_feed(self):
+        self.create_movies(80)
+        home_feed.refresh_home_feed()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('index'))
+        self.assertEqual(len(response.context['popular_movies']), 24)
+        self.assertContains(response, 'Genre 3')
+
+class TestNumericRatings(TestCase):
+    ''' Rating and popularity strings are stored as numbers for sorting and filtering. '''
+
+    def test_parse_number(self):
+        migration = importlib.import_module('webapp.migrations.0023_populate_movie_numeric_ratings')
+        for parse in (parse_number, migration.parse_number):
+            for value, expected in [('87%', 87.0), ('7.4/10', 7.4), ('74/100', 74.0), (' 123.45', 123.45),
+                                    ('N/A', None), ('', None), (None, None), (12.5, 12.5), (3, 3.0)]:
+                with self.subTest(parse=parse.__module__, value=value):
+                    self.assertEqual(parse(value), expected)
+
+    def test_derived_fields_set_on_save(self):
+        movie = Movie.objects.create(tmdb_id=1, title='Rated Movie', release_year=2023, tmdb_popularity='123.4',
+                                     rotten_tomatoes_rating='87%', metacritic_rating='74/100', imdb_rating='7.4/10')
+        movie.refresh_from_db()
+        self.assertEqual((movie.tmdb_popularity_num, movie.rt_score, movie.metacritic_score, movie.imdb_rating_num),
+                         (123.4, 87, 74, 7.4))
+
+        movie.rotten_tomatoes_rating = 'N/A'
+        movie.metacritic_rating = None
+        movie.save()
+        movie.refresh_from_db()
+        self.assertEqual((movie.rt_score, movie.metacritic_score), (None, None))
+
+class TestPageCache(TestCase):
+    ''' Anonymous catalog pages are served from the cache until a movie changes. '''
+
+    def setUp(self):
+        cache.clear()
+        filter_index.invalidate_filter_index()
+        self.movie = Movie.objects.create(tmdb_id=1, title='Cached Movie', release_year=2023)
+
+    def test_catalog_cached_until_movie_changes(self):
+        url = reverse('catalog') + '?page=1'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Cached Movie')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+        # The invalidation runs once the save is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.title = 'Renamed Movie'
+            self.movie.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Renamed Movie')
+
+    def test_movie_save_only_invalidates_its_pages(self):
+        other_movie = Movie.objects.create(tmdb_id=2, title='Other Movie', release_year=2023)
+        detail_url = reverse('movie_detail', args=[self.movie.slug])
+        self.client.get(detail_url)
+        home_feed.refresh_home_feed()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other_movie.title = 'Renamed Other Movie'
+            other_movie.save()
+        with self.assertNumQueries(0):
+            self.client.get(detail_url)
+        self.assertIsNotNone(cache.get(home_feed.HOME_FEED_CACHE_KEY))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.overview = 'A new overview'
+            self.movie.save()
+        self.assertContains(self.client.get(detail_url), 'A new overview')
+
+    def test_new_movie_invalidates_listings(self):
+        url = reverse('catalog')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.create(tmdb_id=3, title='New Movie', release_year=2023)
+        filter_index.invalidate_filter_index()
+        self.assertContains(self.client.get(url), 'New Movie')
+
+    def test_hydrated_recommendation_invalidates_detail_page(self):
+        self.movie.recommended_movie_data = [{'tmdb_id': 50, 'title': 'Hydrated Movie', 'tmdb_popularity': 20}]
+        self.movie.save()
+        detail_url = reverse('movie_detail', args=[self.movie.slug])
+        with mock.patch('webapp.hydration_queue.enqueue_movies') as enqueue_movies:
+            self.assertNotContains(self.client.get(detail_url), 'Hydrated Movie')
+            enqueue_movies.assert_called_once_with([50])
+
+            # The hydration queue stores the recommendation with a bulk insert, which sends no signals
+            record = {'fields': {'tmdb_id': 50, 'title': 'Hydrated Movie', 'release_year': 2023}, 'genres': [],
+                      'providers': [], 'justwatch_providers': [], 'credits': []}
+            with self.captureOnCommitCallbacks(execute=True):
+                save_movie_records([record])
+            self.assertContains(self.client.get(detail_url), 'Hydrated Movie')
+
+class TestRandomPick(TestCase):
+    ''' The catalog "select a movie" popup picks movies in a constant number of queries. '''
+
+    def setUp(self):
+        cache.clear()
+        filter_index.invalidate_filter_index()
+        provider = StreamingProvider.objects.create(name='Netflix', provider_id=8, ranking=1)
+        for index in range(40):
+            movie = Movie.objects.create(tmdb_id=index + 1, title=f'Movie {index}', release_year=2023)
+            movie.top_streaming_providers.add(provider)
+
+    def test_popup_catalog_select_queries(self):
+        url = reverse('popup_catalog_select') + '?genre=&streaming_provider=&year_begin=1900&year_end=2024&imdb_begin=0.0&imdb_end=10.0'
+        self.client.get(url)
+        # The matching ids come from the filter index, only the picked movies and their providers are queried
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['movies']), 3)
+        self.assertContains(response, 'Netflix logo', count=3)
+
+class TestFilterIndex(TestCase):
+    ''' The filter index returns the same movies as the equivalent database query, and follows movie changes. '''
+
+    def setUp(self):
+        filter_index.invalidate_filter_index()
+        self.genres = [Genre.objects.create(name=f'Genre {index}') for index in range(3)]
+        self.providers = [StreamingProvider.objects.create(name=f'Provider {index}', provider_id=index) for index in range(3)]
+        for index in range(60):
+            movie = Movie.objects.create(tmdb_id=index + 1, title=f'Movie {index}', release_year=1990 + index % 30,
+                                         imdb_rating_num=None if index % 7 == 0 else (index % 10) + 0.5)
+            movie.genres.add(self.genres[index % 3])
+            movie.streaming_providers.add(*self.providers[:index % 3])
+
+    def database_ids(self, genres, providers, year_range, rating_range):
+        movies = Movie.objects.filter(release_year__range=year_range)
+        if genres:
+            movies = movies.filter(genres__in=genres)
+        if providers:
+            movies = movies.filter(streaming_providers__in=providers)
+        if rating_range == (0.0, 10.0):
+            movies = movies.filter(Q(imdb_rating_num__range=rating_range) | Q(imdb_rating_num=None))
+        else:
+            movies = movies.filter(imdb_rating_num__range=rating_range)
+        return list(movies.distinct().order_by('id').values_list('id', flat=True))
+
+    def test_matches_database(self):
+        for genres, providers, year_range, rating_range in [
+                ([], [], (1900, 2024), (0.0, 10.0)),
+                ([self.genres[0].pk], [], (1995, 2005), (0.0, 10.0)),
+                ([self.genres[0].pk, self.genres[2].pk], [self.providers[1].pk], (1900, 2024), (3.0, 8.0)),
+                ([], [self.providers[0].pk], (2000, 2000), (5.5, 5.5))]:
+            self.assertEqual(filter_movie_ids(genres, providers, *year_range, *rating_range),
+                             self.database_ids(genres, providers, year_range, rating_range))
+
+    def test_follows_movie_changes(self):
+        filter_movie_ids([], [], None, None, None, None)    # Build the index
+        with self.captureOnCommitCallbacks(execute=True):
+            movie = Movie.objects.create(tmdb_id=1000, title='New Movie', release_year=2024, imdb_rating_num=9.9)
+            movie.genres.add(self.genres[1])
+        with self.assertNumQueries(0):
+            self.assertEqual(filter_movie_ids([self.genres[1].pk], [], 2024, 2024, 9.0, 10.0), [movie.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            movie.genres.remove(self.genres[1])
+        self.assertEqual(filter_movie_ids([self.genres[1].pk], [], 2024, 2024, 9.0, 10.0), [])
+
+    def test_bulk_writes_update_index_in_place(self):
+        index = filter_index.get_filter_index()
+        record = {'fields': {'tmdb_id': 1000, 'title': 'Bulk Movie', 'release_year': 2024, 'imdb_rating': '9.9/10'},
+                  'genres': ['Genre 1'], 'justwatch_providers': [], 'credits': [],
+                  'providers': [{'provider_id': 2, 'name': 'Provider 2', 'logo_path': None}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            movie, = save_movie_records([record])
+        self.assertIs(filter_index.get_filter_index(), index)
+        with self.assertNumQueries(0):
+            self.assertEqual(filter_movie_ids([self.genres[1].pk], [self.providers[2].pk], 2024, 2024, 9.0, 10.0), [movie.pk])
+
+        # Replace the provider of the new movie, and add one to an existing movie
+        provider_data = [{'provider_id': 1, 'name': 'Provider 1', 'logo_path': None}]
+        other = Movie.objects.get(tmdb_id=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_streaming_provider_changes([(movie, provider_data, None), (other, provider_data, None)])
+        self.assertIs(filter_index.get_filter_index(), index)
+        expected_ids = self.database_ids([], [self.providers[1].pk], (1900, 2024), (0.0, 10.0))
+        self.assertIn(other.pk, expected_ids)
+        with self.assertNumQueries(0):
+            self.assertEqual(filter_movie_ids([], [self.providers[2].pk], 2024, 2024, 0.0, 10.0), [])
+            self.assertEqual(filter_movie_ids([], [self.providers[1].pk], 1900, 2024, 0.0, 10.0), expected_ids)
+
+    def test_reads_wait_for_updates(self):
+        index = filter_index.get_filter_index()
+        results = []
+        reader = threading.Thread(target=lambda: results.append(filter_index.filter_movies(rating_range=(9.9, 9.9))))
+        # An update in progress holds the lock, the read waits for it instead of seeing half of it
+        with filter_index._index_lock:
+            reader.start()
+            reader.join(0.1)
+            self.assertTrue(reader.is_alive())
+            index.set_movie(index.movie_ids[0], 2000, 9.9)
+        reader.join()
+        self.assertEqual(results, [[index.movie_ids[0]]])
+
+class TestKeysetPagination(TestCase):
+    ''' Rating pages are read with cursors, in the same order as the offset pages, in a constant number of queries. '''
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='rater', password='password')
+        for index in range(250):
+            movie = Movie.objects.create(tmdb_id=index + 1, title=f'Movie {index}')
+            MovieRating.objects.create(user=self.user, movie=movie, user_rating=index % 10 + 1)
+
+    def test_cursor_pages_match_offset_pages(self):
+        url = reverse('user_rating', args=['rater'])
+        offset_ids = [[rating.pk for rating in self.client.get(url, {'page': number}).context['page_obj']]
+                      for number in (1, 2, 3)]
+
+        response = self.client.get(url)
+        for number in (2, 3):
+            page_obj = response.context['page_obj']
+            # The profile's user and the page, the count is cached
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'page': number, 'after': page_obj.next_cursor})
+            self.assertEqual([rating.pk for rating in response.context['page_obj']], offset_ids[number - 1])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+        page_obj = response.context['page_obj']
+        response = self.client.get(url, {'page': 2, 'before': page_obj.previous_cursor})
+        self.assertEqual([rating.pk for rating in response.context['page_obj']], offset_ids[1])
+        self.assertTrue(response.context['page_obj'].has_previous())
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is specific to SQLite')
+class TestQueryPlans(TestCase):
+    ''' The hot Movie queries of services.py and views.py use an index on a large catalog. '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genres = Genre.objects.bulk_create([Genre(name=f'Genre {index}') for index in range(20)])
+        cls.user = User.objects.create_user(username='planner', password='password')
+        movies = [Movie(tmdb_id=index + 1, title=f'Movie {index}', slug=f'movie-{index}', release_year=1950 + index % 75,
+                        now_playing=index % 50 == 0, tmdb_popularity_num=index % 997, imdb_rating_num=index % 100 / 10)
+                  for index in range(5000)]
+        Movie.objects.bulk_create(movies)
+        movie_ids = list(Movie.objects.values_list('id', flat=True))
+        Movie.genres.through.objects.bulk_create(
+            [Movie.genres.through(movie_id=movie_id, genre_id=cls.genres[movie_id % 20].pk) for movie_id in movie_ids])
+        MovieRating.objects.bulk_create([MovieRating(user=cls.user, movie_id=movie_id, user_rating=5) for movie_id in movie_ids[:500]])
+        people = Person.objects.bulk_create([Person(tmdb_id=index + 1, name=f'Person {index}') for index in range(1000)])
+        Credit.objects.bulk_create([Credit(movie_id=movie_id, person=people[movie_id % 1000], role=Credit.DIRECTOR)
+                                    for movie_id in movie_ids])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def hot_queries(self):
+        movie = Movie.objects.get(tmdb_id=100)
+        now = timezone.now()
+        return {
+            'movie_detail slug': Movie.objects.filter(slug='movie-100'),
+            'home now playing': Movie.objects.filter(now_playing=True).values_list('id', flat=True),
+            'home popular': Movie.objects.exclude(id__in=[1, 2, 3]).filter(tmdb_popularity_num__isnull=False)
+                                         .order_by('-tmdb_popularity_num').values_list('id', flat=True)[:200],
+            'home top rated': Movie.objects.exclude(id__in=[1, 2, 3]).filter(imdb_rating_num__isnull=False)
+                                           .order_by('-imdb_rating_num').values_list('id', flat=True)[:200],
+            'recent movies': Movie.objects.order_by('-created_at').values('tmdb_id', 'title', 'tmdb_popularity')[:40],
+            'test for ban': handle_test_for_ban(now - datetime.timedelta(days=7), now),
+            'recommendation fallback': Movie.objects.exclude(pk__in=[movie.pk]).filter(genres__in=movie.genres.all())
+                                                    .distinct().order_by('-created_at')[:6],
+            'justwatch title and year': Movie.objects.filter(title=movie.title, release_year=movie.release_year),
+            'stale streaming providers': Movie.objects.filter(last_updated__lt=now - datetime.timedelta(days=7))
+                                                      .order_by('last_updated'),
+            'ingest existing tmdb ids': Movie.objects.filter(tmdb_id__in=[1, 2, 3]),
+            'genres by name': Genre.objects.filter(name__in=['Genre 1', 'Genre 2']),
+            'providers by name': StreamingProvider.objects.filter(name__in=['Netflix', 'Hulu']),
+            'user ratings page': MovieRating.objects.filter(user=self.user).select_related('movie').order_by('-id')[:121],
+            'director page': get_movies_by_person('Person 7', Credit.DIRECTOR),
+            'movie credits': movie.credits.select_related('person').order_by('role', 'order'),
+        }
+
+    def test_no_full_scans(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                scans = [line for line in plan.splitlines() if FULL_SCAN_PATTERN.search(line)]
+                self.assertEqual(scans, [], f'{name} scans a table:\n{plan}')
+
+class TestPeopleCredits(TestCase):
+    ''' Director and actor pages list the movies credited to a person by exact name, without calling TMDB. '''
+
+    def setUp(self):
+        cache.clear()
+
+    def movie_record(self, tmdb_id, title, directors, cast):
+        credits_data = {
+            'crew': [{'id': person_id, 'name': name, 'job': 'Director'} for person_id, name in directors],
+            'cast': [{'id': person_id, 'name': name, 'order': order} for order, (person_id, name) in enumerate(cast)],
+        }
+        return {'fields': {'tmdb_id': tmdb_id, 'title': title, 'release_year': 2000 + tmdb_id}, 'genres': [],
+                'providers': [], 'justwatch_providers': [], 'credits': extract_movie_credits(credits_data)}
+
+    def test_credits_saved_at_ingest(self):
+        save_movie_records([
+            self.movie_record(1, 'First', [(10, 'Lee')], [(20, 'Ann Smith'), (21, 'Bo Chan')]),
+            self.movie_record(2, 'Second', [(11, 'Ang Lee')], [(20, 'Ann Smith')]),
+        ])
+        self.assertEqual(Person.objects.count(), 4)
+        self.assertEqual(Credit.objects.filter(person__tmdb_id=20, role=Credit.ACTOR).count(), 2)
+        self.assertEqual([movie.title for movie in get_movies_by_person('Lee', Credit.DIRECTOR)], ['First'])
+
+    def test_pages_use_credits(self):
+        save_movie_records([
+            self.movie_record(1, 'First', [(10, 'Lee')], [(20, 'Ann Smith')]),
+            self.movie_record(2, 'Second', [(11, 'Ang Lee')], [(20, 'Ann Smith')]),
+        ])
+        with mock.patch('webapp.services.http_client.get', side_effect=AssertionError('TMDB was called')):
+            response = self.client.get(reverse('director', kwargs={'director_name': 'Lee'}))
+            self.assertEqual([movie.title for movie in response.context['movies']], ['First'])
+            response = self.client.get(reverse('actor', kwargs={'actor_name': 'Ann-Smith'}))
+            self.assertEqual([movie.title for movie in response.context['movies']], ['First', 'Second'])
+
+    def test_refresh_replaces_credits(self):
+        save_movie_records([self.movie_record(1, 'First', [(10, 'Lee')], [(20, 'Ann Smith')])])
+        movie = Movie.objects.get(tmdb_id=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            save_movie_credits({movie: extract_movie_credits({'cast': [{'id': 20, 'name': 'Ann Smith-Jones', 'order': 0}]})},
+                                        replace=True)
+        self.assertEqual(list(movie.credits.values_list('person__name', 'role')), [('Ann Smith-Jones', Credit.ACTOR)])
+
+class TestPersonCache(TestCase):
+    ''' TMDB person searches and movie credits are fetched once and reused until they expire. '''
+
+    def tmdb_response(self, url, params=None, **kwargs):
+        response = mock.Mock(status_code=200)
+        if url.endswith('/search/person'):
+            response.json.return_value = {'results': [{'id': 31, 'name': params['query']}]}
+        else:
+            response.json.return_value = {
+                'cast': [{'id': 600, 'order': 0, 'release_date': '1994-07-06', 'popularity': 50},
+                         {'id': 601, 'order': 5, 'release_date': '1995-01-01', 'popularity': 50}],
+                'crew': [{'id': 602, 'job': 'Director', 'release_date': '2007-02-02'},
+                         {'id': 603, 'job': 'Producer', 'release_date': '2008-02-02'}],
+            }
+        return response
+
+    def test_repeat_searches_are_cached(self):
+        with mock.patch('webapp.services.http_client.get', side_effect=self.tmdb_response) as get:
+            for _ in range(2):
+                person_id = get_person_id('Tom  Hanks & Co')
+                self.assertEqual(get_actor_movies_from_tmdb_to_fetch(person_id), [600])
+                self.assertEqual(get_director_movies_from_tmdb_to_fetch(person_id), [602])
+            self.assertEqual(get.call_count, 2)
+            # The name is sent as a request parameter, so requests URL-encodes it
+            self.assertEqual(get.call_args_list[0].kwargs['params']['query'], 'Tom  Hanks & Co')
+            self.assertEqual(get_person_id('tom hanks & co'), 31)
+            self.assertEqual(get.call_count, 2)
+
+    def test_expired_search_is_refetched(self):
+        with mock.patch('webapp.services.http_client.get', side_effect=self.tmdb_response) as get:
+            get_person_id('Tom Hanks')
+            PersonSearchCache.objects.update(fetched_at=timezone.now() - datetime.timedelta(days=30))
+            get_person_id('Tom Hanks')
+            self.assertEqual(get.call_count, 2)
+
+    def test_invalid_json_uses_stale_cache(self):
+        with mock.patch('webapp.services.http_client.get', side_effect=self.tmdb_response):
+            person_id = get_person_id('Tom Hanks')
+            get_person_movie_credits(person_id)
+        PersonSearchCache.objects.update(fetched_at=timezone.now() - datetime.timedelta(days=30))
+        PersonCreditsCache.objects.update(fetched_at=timezone.now() - datetime.timedelta(days=30))
+        response = mock.Mock(status_code=200)    # e.g. an HTML page served with a 200
+        response.json.side_effect = ValueError('Expecting value')
+        with mock.patch('webapp.services.http_client.get', return_value=response) as get:
+            self.assertEqual(get_person_id('Tom Hanks'), 31)
+            self.assertEqual(get_actor_movies_from_tmdb_to_fetch(31), [600])
+            self.assertEqual(get_person_movie_credits(32), {'cast': [], 'crew': []})
+            self.assertEqual(get.call_count, 3)
+
+    def test_credited_person_needs_no_search(self):
+        Person.objects.create(tmdb_id=31, name='Tom Hanks')
+        with mock.patch('webapp.services.http_client.get', side_effect=AssertionError('TMDB was called')):
+            self.assertEqual(get_person_id('Tom Hanks'), 31)
+
+class TestPersonJobs(TestCase):
+    ''' actor: and director: searches redirect at once, and their pages poll the job ingesting the movies. '''
+
+    def setUp(self):
+        cache.clear()
+        # Keep the jobs of the test away from the worker threads
+        for name, value in [('_pending', queue.Queue()), ('_queued_ids', set()), ('_jobs', {}), ('_skipped_until', {})]:
+            patcher = mock.patch.object(hydration_queue, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(hydration_queue, '_start_workers')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_for_job(self, job_id):
+        for _ in range(100):
+            status = hydration_queue.job_status(job_id)
+            if status['tmdb_ids']:
+                return status
+            time.sleep(0.01)
+        self.fail('The job ids were not resolved')
+
+    def test_job_status(self):
+        job_id = hydration_queue.enqueue_job(lambda first, count: range(first, first + count), 5, 2)
+        self.assertEqual(self.wait_for_job(job_id), {'tmdb_ids': [5, 6], 'pending': 2, 'done': False})
+        hydration_queue._finish_movie(5, True)
+        hydration_queue._finish_movie(6, False)
+        self.assertEqual(hydration_queue.job_status(job_id), {'tmdb_ids': [5, 6], 'pending': 0, 'done': True})
+        self.assertIsNone(hydration_queue.job_status('unknown'))
+
+    def test_expired_skips_pruned(self):
+        hydration_queue._skipped_until[7] = time.time() - 1
+        hydration_queue._finish_movie(8, False)
+        self.assertEqual(list(hydration_queue._skipped_until), [8])
+        self.assertEqual(hydration_queue.enqueue_movies([7, 8]), 1)
+
+    def test_search_redirects_without_fetching(self):
+        with mock.patch.object(hydration_queue, 'enqueue_job', return_value='job1') as enqueue_job, \
+                mock.patch('webapp.services.http_client.get', side_effect=AssertionError('TMDB was called')):
+            response = self.client.get(reverse('search'), {'query': 'director: Ang Lee'})
+        self.assertRedirects(response, reverse('director', args=['Ang-Lee']) + '?job=job1', fetch_redirect_response=False)
+        self.assertEqual(enqueue_job.call_args.args[1:], ('Ang Lee', Credit.DIRECTOR))
+
+    def test_job_status_view_streams_new_movies(self):
+        first = Movie.objects.create(tmdb_id=1, title='First', release_year=2001)
+        Movie.objects.create(tmdb_id=2, title='Second', release_year=2002)
+        status = {'tmdb_ids': [1, 2, 3], 'pending': 1, 'done': False}
+        with mock.patch.object(hydration_queue, 'job_status', return_value=status):
+            response = self.client.get(reverse('person_job_status', args=['job1']), {'known': '1'})
+            data = response.json()
+            self.assertEqual(data['status'], 'running')
+            self.assertEqual([movie['tmdb_id'] for movie in data['movies']], [2])
+            self.assertIn('Second (2002)', data['movies'][0]['html'])
+
+            response = self.client.get(reverse('actor', args=['Nobody']), {'job': 'job1'})
+            self.assertContains(response, reverse('person_job_status', args=['job1']))
+        self.assertEqual(self.client.get(reverse('person_job_status', args=['job2'])).status_code, 404)
+
+class TestRecommendationsCheckpoint(TestCase):
+    ''' Only full runs of update_movie_recommendations() resume from and record the checkpoint. '''
+
+    def setUp(self):
+        for index in range(5):
+            Movie.objects.create(tmdb_id=index + 1, title=f'Movie {index}', release_year=2023)
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        for target, value in [('webapp.services.RECOMMENDATIONS_CHECKPOINT', self.checkpoint),
+                              ('webapp.services.fetch_movie_recommendations', lambda movie: (movie, []))]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_test_run_leaves_checkpoint(self):
+        update_movie_recommendations(test_limit=2, batch_size=1)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+        write_recommendations_checkpoint(Movie.objects.order_by('id')[2].id)
+        update_movie_recommendations(test_limit=2, batch_size=1)
+        self.assertEqual(read_recommendations_checkpoint(), Movie.objects.order_by('id')[2].id)
+
+    def test_full_pass_clears_checkpoint(self):
+        write_recommendations_checkpoint(Movie.objects.order_by('id')[2].id)
+        with mock.patch('webapp.services.write_recommendations_checkpoint') as write_checkpoint:
+            update_movie_recommendations(batch_size=1)
+        # The run resumed after the third movie
+        self.assertEqual(write_checkpoint.call_count, 2)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_invalid_json_skips_movie(self):
+        def get(url, **kwargs):
+            response = mock.Mock(status_code=200)
+            if '/movie/1/' in url:
+                response.json.side_effect = ValueError('Expecting value')   # e.g. an HTML page served with a 200
+            else:
+                response.json.return_value = {'results': [{'id': 99, 'title': 'Recommended', 'popularity': 50}]}
+            return response
+
+        with mock.patch('webapp.services.fetch_movie_recommendations', fetch_movie_recommendations), \
+                mock.patch('webapp.services.http_client.get', side_effect=get):
+            update_movie_recommendations(batch_size=5)
+        recommendations = dict(Movie.objects.values_list('tmdb_id', 'recommended_movie_data'))
+        self.assertFalse(recommendations[1])
+        self.assertEqual([movie['tmdb_id'] for movie in recommendations[2]], [99])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+class TestStreamingProviderUpdates(TestCase):
+    ''' Streaming provider updates write only the rows that changed, and skip movies whose data cannot be read. '''
+
+    def setUp(self):
+        self.providers = {name: StreamingProvider.objects.create(name=name, provider_id=provider_id, ranking=ranking)
+                          for name, provider_id, ranking in [('Netflix', 8, 1), ('Hulu', 15, 2), ('Max', 1899, 3)]}
+
+    def provider_data(self, *names):
+        return [{'provider_id': self.providers[name].provider_id, 'name': name, 'logo_path': None} for name in names]
+
+    def test_unchanged_rows_kept_and_stale_rows_removed(self):
+        changed = Movie.objects.create(tmdb_id=1, title='Changed', release_year=2023)
+        changed.streaming_providers.add(self.providers['Netflix'], self.providers['Hulu'])
+        changed.top_streaming_providers.add(self.providers['Netflix'])
+        unchanged = Movie.objects.create(tmdb_id=2, title='Unchanged', release_year=2023)
+        unchanged.streaming_providers.add(self.providers['Hulu'])
+        unchanged.top_streaming_providers.add(self.providers['Hulu'])
+        through = Movie.streaming_providers.through
+        rows_before = dict(through.objects.values_list('id', 'streamingprovider_id'))
+
+        changed_count = apply_streaming_provider_changes([
+            (changed, self.provider_data('Netflix', 'Max'), None),
+            (unchanged, self.provider_data('Hulu'), None),
+        ])
+
+        self.assertEqual(changed_count, 1)
+        rows_after = dict(through.objects.values_list('id', 'streamingprovider_id'))
+        # The Netflix and unchanged Hulu rows are the same rows, the stale Hulu row is gone
+        kept_row_ids = {row_id for row_id in rows_before if row_id in rows_after}
+        self.assertEqual(len(kept_row_ids), 2)
+        self.assertEqual({provider.name for provider in changed.streaming_providers.all()}, {'Netflix', 'Max'})
+        self.assertEqual([provider.name for provider in changed.top_streaming_providers.all()], ['Netflix'])
+        self.assertEqual([provider.name for provider in unchanged.streaming_providers.all()], ['Hulu'])
+
+    def test_invalid_json_skips_movie(self):
+        movie = Movie.objects.create(tmdb_id=1, title='Broken', release_year=2023)
+        response = mock.Mock(status_code=200)    # e.g. an HTML page served with a 200
+        response.json.side_effect = ValueError('Expecting value')
+        with mock.patch('webapp.services.http_client.get', return_value=response):
+            self.assertEqual(fetch_movie_streaming_data(movie), (movie, None))
+
+class TestMasterListStore(SimpleTestCase):
+    ''' A store written from TMDB export lines answers exact and fuzzy title lookups. '''
+
+    EXPORT_LINES = [
+        '{"adult": false, "id": 603, "original_title": "The Matrix", "popularity": 80.1, "video": false}',
+        '{"adult": false, "id": 604, "original_title": "The Matrix Reloaded", "popularity": 40.2, "video": false}',
+        '{"adult": false, "id": 550, "original_title": "Fight Club", "popularity": 70.3, "video": false}',
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'master_list.sqlite3')
+        entries = ((movie['id'], movie['original_title']) for movie in map(json.loads, self.EXPORT_LINES))
+        self.assertEqual(update_master_list(entries, path), {'added': 3, 'changed': 0, 'removed': 0})
+        self.store = MasterListStore(path)
+
+    def test_exact_lookup(self):
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(self.store.search_title('  the MATRIX '), [603])
+        self.assertEqual(self.store.search_id(550), 'Fight Club')
+
+    def test_fuzzy_lookup(self):
+        self.assertEqual(self.store.search_similar('Fight Clb')[0], 550)
+        self.assertEqual(set(self.store.search_similar('matrix')), {603, 604})
+
+class FakeClock:
+    ''' Stands in for the time module and asyncio.sleep of the JustWatch scraper, sleeping advances the clock. '''
+
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += max(0.0, seconds)
+
+    async def sleep(self, seconds):
+        self.advance(seconds)
+
+class TestHttpClient(SimpleTestCase):
+    ''' Requests to an upstream host are paced by its token bucket, retried with backoff and always time out. '''
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(http_client, 'time', mock.Mock(monotonic=self.clock.monotonic, sleep=self.clock.advance))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bucket_pacing_and_burst(self):
+        bucket = http_client.TokenBucket(rate=2, capacity=3)
+        start = self.clock.now
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.now, start)             # The burst is served at once
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(self.clock.now, start + 1.0)       # Then one token every 1/rate seconds
+
+        self.clock.advance(60)                              # Refills up to the capacity only
+        start = self.clock.now
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.now, start)
+        bucket.acquire()
+        self.assertEqual(self.clock.now, start + 0.5)
+
+    def test_get_uses_host_bucket_and_default_timeout(self):
+        limiters = {host: mock.Mock() for host in http_client.HOST_RATE_LIMITS}
+        with mock.patch.object(http_client, 'rate_limiters', limiters), \
+                mock.patch.object(http_client.session, 'get') as session_get:
+            http_client.get('https://api.themoviedb.org/3/movie/550', headers={'accept': 'application/json'})
+            http_client.get('https://www.justwatch.com/us/movie/fight-club', timeout=3)
+        self.assertEqual({host: limiter.acquire.call_count for host, limiter in limiters.items()},
+                         {host: int(host == 'api.themoviedb.org') for host in limiters})
+        self.assertEqual(session_get.call_args_list[0].kwargs,
+                         {'timeout': http_client.DEFAULT_TIMEOUT, 'headers': {'accept': 'application/json'}})
+        self.assertEqual(session_get.call_args_list[1].kwargs, {'timeout': 3})
+
+    def test_session_retries(self):
+        retry = http_client.create_session().get_adapter('https://api.themoviedb.org').max_retries
+        self.assertEqual(retry.total, 3)
+        self.assertEqual(set(retry.status_forcelist), {429, 500, 502, 503, 504})
+        self.assertEqual(retry.backoff_factor, 0.5)
+        self.assertTrue(retry.respect_retry_after_header)
+        self.assertFalse(retry.raise_on_status)
+        retry = http_client.create_session(retries=0).get_adapter('https://www.justwatch.com').max_retries
+        self.assertEqual(retry.total, 0)
+
+class TestJustWatchRateControl(SimpleTestCase):
+    ''' JustWatch requests are paced by the AIMD rate controller, which only speeds up on successful responses. '''
+
+    def setUp(self):
+        self.clock = FakeClock()
+        for patcher in [mock.patch.object(jw_scrape, 'time', self.clock),
+                        mock.patch.object(jw_scrape.asyncio, 'sleep', self.clock.sleep)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.controller = jw_scrape.RateController(rate=2.0, min_rate=0.2, max_rate=2.1, increase=0.1, decrease=0.5,
+                                                   default_pause=10)
+
+    def response(self, status_code, retry_after=None):
+        return mock.Mock(status_code=status_code, headers={'Retry-After': retry_after} if retry_after else {})
+
+    def fetch(self, *responses):
+        with mock.patch.object(jw_scrape.session, 'get', side_effect=responses) as get:
+            response = asyncio.run(jw_scrape.fetch_page('https://www.justwatch.com/us/movie/test', self.controller))
+        return response, get.call_count
+
+    def test_pacing(self):
+        self.assertEqual([self.controller.reserve() for _ in range(3)], [0.0, 0.5, 1.0])
+        self.controller.on_success()
+        self.controller.on_success()
+        self.assertEqual(self.controller.rate, 2.1)     # Capped at max_rate
+        self.controller.on_rate_limited(retry_after=30)
+        self.assertEqual(self.controller.rate, 1.05)
+        self.assertEqual(self.controller.reserve(), 30.0)
+        for _ in range(10):
+            self.controller.on_rate_limited(retry_after=0)
+        self.assertEqual(self.controller.rate, 0.2)     # Floored at min_rate
+
+    def test_parse_retry_after(self):
+        self.assertEqual(jw_scrape.parse_retry_after('5'), 5.0)
+        self.assertEqual(jw_scrape.parse_retry_after('-3'), 0.0)
+        self.assertEqual(jw_scrape.parse_retry_after(email.utils.formatdate(self.clock.now + 60, usegmt=True)), 60.0)
+        self.assertIsNone(jw_scrape.parse_retry_after('soon'))
+        self.assertIsNone(jw_scrape.parse_retry_after(None))
+
+    def test_failures_back_off_before_retrying(self):
+        ok = self.response(200)
+        response, attempts = self.fetch(requests.ConnectionError('reset'), self.response(503, retry_after='20'), ok)
+        self.assertIs(response, ok)
+        self.assertEqual(attempts, 3)
+        self.assertAlmostEqual(self.controller.rate, 2.0 * 0.5 * 0.5 + 0.1)
+        self.assertGreaterEqual(self.clock.now, 1700000000.0 + 10 + 20)     # default_pause, then Retry-After
+
+    def test_other_errors_returned_without_speeding_up(self):
+        for status_code in (403, 404):
+            response, attempts = self.fetch(self.response(status_code))
+            self.assertEqual((response.status_code, attempts), (status_code, 1))
+        self.assertEqual(self.controller.rate, 2.0)
+
+    def test_gives_up_after_max_attempts(self):
+        responses = [self.response(429, retry_after='1')] * (jw_scrape.MAX_ATTEMPTS + 1)
+        self.assertEqual(self.fetch(*responses), (None, jw_scrape.MAX_ATTEMPTS))
+
+class ListSource(ingestion.IngestionSource):
+    ''' Ingestion source serving fixed pages of movie ids, for the ingestion tests. '''
+
+    name = 'test_list'
+
+    def page_url(self, page_num):
+        return f'https://tmdb.test/list/{page_num}'
+
+    # Odd ids are rejected, like PopularSource rejects foreign films
+    def accept(self, movie_data, page_num):
+        return movie_data['id'] % 2 == 0
+
+class TestIngestion(TestCase):
+    ''' The ingestion engine queues each new movie once, skips failed pages, and writes from one thread at a time. '''
+
+    PAGES = {1: [2, 4, 6], 2: [4, 8, 3], 3: None, 4: [10, 12, 666]}    # None fails, 666 is banned
+
+    def setUp(self):
+        self.active_writes = 0
+        self.max_active_writes = 0
+        self.write_lock = threading.Lock()
+        self.saved_batches = []
+        for target, value in [('webapp.http_client.get', self.get_page),
+                              ('webapp.services.fetch_movie_record', lambda tmdb_id, now_playing: {'tmdb_id': tmdb_id}),
+                              ('webapp.services.save_movie_records', self.save_movie_records),
+                              ('webapp.services.progress_bar_iteration', lambda *args: None)]:
+            patcher = mock.patch(target, side_effect=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for patcher in [mock.patch.dict(ingestion.SOURCES, {ListSource.name: ListSource}),
+                        mock.patch('webapp.services.BAN_LIST', ['666'])]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_page(self, url, **kwargs):
+        movie_ids = self.PAGES[int(url.rsplit('/', 1)[1])]
+        if movie_ids is None:
+            return mock.Mock(status_code=500, raise_for_status=mock.Mock(side_effect=requests.HTTPError('500')))
+        return mock.Mock(status_code=200, json=lambda: {'results': [{'id': movie_id} for movie_id in movie_ids]})
+
+    # Records how many writes run at the same time
+    def write(self, result):
+        with self.write_lock:
+            self.active_writes += 1
+            self.max_active_writes = max(self.max_active_writes, self.active_writes)
+        time.sleep(0.02)
+        with self.write_lock:
+            self.active_writes -= 1
+        return result
+
+    def save_movie_records(self, movie_records):
+        self.saved_batches.append([movie_record['tmdb_id'] for movie_record in movie_records])
+        return self.write(movie_records)
+
+    def test_new_movies_stored_in_batches(self):
+        stored = ingestion.ingest_movies(ListSource.name, 1, 4, detail_workers=2, batch_size=4)
+        self.assertEqual(stored, 6)
+        # 4 is on two pages, 3 is not accepted, page 3 failed and 666 is banned
+        self.assertEqual(sorted(tmdb_id for batch in self.saved_batches for tmdb_id in batch), [2, 4, 6, 8, 10, 12])
+        self.assertEqual([len(batch) for batch in self.saved_batches], [4, 2])
+
+    def test_existing_movies_updated_by_one_writer(self):
+        updated_ids = []
+
+        def update_existing(source, existing_movies, movie_data_by_id):
+            updated_ids.extend(movie.tmdb_id for movie in existing_movies)
+            self.write(None)
+
+        # Every page holds a stored movie
+        existing_ids = {2, 8, 10}
+        movies_filter = lambda tmdb_id__in: [Movie(tmdb_id=tmdb_id) for tmdb_id in tmdb_id__in if tmdb_id in existing_ids]
+        with mock.patch.object(ListSource, 'update_existing', update_existing), \
+                mock.patch.object(Movie.objects, 'filter', side_effect=movies_filter):
+            stored = ingestion.ingest_movies(ListSource.name, 1, 4, detail_workers=2, batch_size=1)
+        self.assertEqual(sorted(updated_ids), [2, 8, 10])
+        self.assertEqual(stored, 3)
+        self.assertEqual(self.max_active_writes, 1)
+
+class TestMasterListFallback(SimpleTestCase):
+    ''' Without the SQLite store, title searches use a TitleIndex of the legacy JSON export. '''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        export_path = os.path.join(directory.name, 'tmdb_master_movie_list.json')
+        with open(export_path, 'w', encoding='utf-8') as file:
+            json.dump([{'id': 603, 'original_title': 'The Matrix'}, {'id': 604, 'original_title': 'The Matrix Reloaded'},
+                       {'id': 550, 'original_title': 'Fight Club'}, {'id': 551, 'original_title': 'Fight  club'}], file)
+        for name, value in [('MASTER_LIST_DB', os.path.join(directory.name, 'missing.sqlite3')),
+                            ('MASTER_LIST', export_path), ('master_list', None)]:
+            patcher = mock.patch(f'webapp.services.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_searches(self):
+        self.assertIsInstance(services.get_master_list(), TitleIndex)
+        self.assertEqual(services.search_movie_by_title('fight CLUB '), [550, 551])
+        self.assertEqual(services.search_movie_by_id(603), 'The Matrix')
+        self.assertEqual(services.search_movie_by_title_prefix('the mat'), [603, 604])
+        self.assertEqual(services.search_movie_by_title_prefix('the mat', limit=1), [603])
+        self.assertEqual(services.search_movie_by_title_prefix(' '), [])
+        self.assertEqual(services.search_movie_by_similar_title('The Matrx')[0], 603)
+        self.assertEqual(services.search_movie_by_similar_title('Zzzz'), [])
+
+class TestLetterboxdMisses(TestCase):
+    ''' Only pages that do not exist count as a Letterboxd miss, failed requests leave the movie untouched. '''
+
+    def setUp(self):
+        with open(os.path.join(FIXTURES_DIR, 'letterboxd_rating_histogram.html'), encoding='utf-8') as file:
+            self.page = file.read()
+        self.movie = Movie.objects.create(tmdb_id=1, title='Known Movie', release_year=2023,
+                                          letterboxd_slug='known-slug', letterboxd_misses=1)
+
+    # Serves the rating page for the given slugs and the given status code for every other URL
+    def respond(self, found_slugs, status_code=404):
+        def get(url, **kwargs):
+            if any(f"/film/{slug}/" in url for slug in found_slugs):
+                return mock.Mock(status_code=200, text=self.page, headers={})
+            return mock.Mock(status_code=status_code, text='', headers={})
+        return mock.patch('webapp.letterboxd_scraper.http_client.get', side_effect=get)
+
+    def test_failed_request_keeps_slug(self):
+        for status_code in (429, 503):
+            with self.respond([], status_code=status_code):
+                self.assertIsNone(lbd_scrape.get_rating_for_movie(self.movie))
+            self.assertEqual(self.movie.letterboxd_slug, 'known-slug')
+            self.assertEqual(self.movie.letterboxd_misses, 1)
+            self.assertIsNone(self.movie.letterboxd_checked_at)
+
+    def test_timeout_keeps_slug(self):
+        with mock.patch('webapp.letterboxd_scraper.http_client.get', side_effect=requests.exceptions.Timeout):
+            self.assertIsNone(lbd_scrape.get_rating_for_movie(self.movie))
+        self.assertEqual(self.movie.letterboxd_slug, 'known-slug')
+        self.assertEqual(self.movie.letterboxd_misses, 1)
+
+    def test_missing_slug_falls_back_to_title(self):
+        with self.respond(['known-movie-2023']):
+            self.assertIsNotNone(lbd_scrape.get_rating_for_movie(self.movie))
+        self.assertEqual(self.movie.letterboxd_slug, 'known-movie-2023')
+        self.assertEqual(self.movie.letterboxd_misses, 0)
+
+    def test_not_found_records_miss(self):
+        with self.respond([]):
+            self.assertIsNone(lbd_scrape.get_rating_for_movie(self.movie))
+        self.assertIsNone(self.movie.letterboxd_slug)
+        self.assertEqual(self.movie.letterboxd_misses, 2)
+        self.assertIsNotNone(self.movie.letterboxd_checked_at)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
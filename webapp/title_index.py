@@ -0,0 +1,113 @@
+"""
+Name of code artifact: title_index.py
+Brief description: Prebuilt, multi-valued lookup index from normalized movie title to TMDB ids, with prefix and trigram search,
+                    used to search the TMDB master list without scanning every entry.
+Programmer’s name: agent
+Date the code was created: 10/18/2026
+Dates the code was revised: None.
+Brief description of each revision & author: Initial creation of the title index (agent)
+Preconditions: None. This module does not depend on Django.
+Acceptable and unacceptable input values or types: TitleIndex expects an iterable of (tmdb_id, title) pairs; titles must be strings.
+Postconditions: Lookups return lists of TMDB ids (ints).
+Return values or types: Lists of TMDB ids, or the title string for an id.
+Error and exception condition values or types that can occur: None expected; unknown titles and ids return empty lists or None.
+Side effects: None.
+Invariants: Every id passed to the constructor can be found by its normalized title.
+Any known faults: The trigram index is built on first use and adds noticeable memory for the full TMDB export.
+"""
+
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+# Normalize a title for lookups: case-insensitive and with collapsed whitespace
+def normalize_title(title):
+    return _WHITESPACE.sub(' ', title).strip().casefold()
+
+
+# Split a normalized title into padded character trigrams
+def title_trigrams(normalized_title):
+    padded = f'  {normalized_title} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """In-memory index of the TMDB master list keyed by normalized title."""
+
+    def __init__(self, entries):
+        self.title_to_ids = defaultdict(list)   # normalized title -> list of TMDB ids, duplicate titles are kept
+        self.id_to_title = {}                   # TMDB id -> original title
+        for tmdb_id, title in entries:
+            self.title_to_ids[normalize_title(title)].append(tmdb_id)
+            self.id_to_title[tmdb_id] = title
+        self.title_to_ids = dict(self.title_to_ids)
+        self.sorted_titles = sorted(self.title_to_ids)  # Sorted normalized titles for prefix lookups
+        self._trigrams = None
+        self._trigram_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.id_to_title)
+
+    # TMDB ids whose title exactly matches, ignoring case and extra whitespace
+    def search_title(self, title):
+        return list(self.title_to_ids.get(normalize_title(title), []))
+
+    # Title for a TMDB id
+    def search_id(self, tmdb_id):
+        return self.id_to_title.get(tmdb_id)
+
+    # TMDB ids whose title starts with the prefix, in title order
+    def search_prefix(self, prefix, limit=20):
+        prefix = normalize_title(prefix)
+        tmdb_ids = []
+        if not prefix:
+            return tmdb_ids
+        position = bisect.bisect_left(self.sorted_titles, prefix)
+        while position < len(self.sorted_titles) and len(tmdb_ids) < limit:
+            title = self.sorted_titles[position]
+            if not title.startswith(prefix):
+                break
+            tmdb_ids.extend(self.title_to_ids[title])
+            position += 1
+        return tmdb_ids[:limit]
+
+    # TMDB ids with the most trigrams in common with the query, best match first
+    def search_similar(self, query, limit=20, min_similarity=0.5):
+        query_trigrams = title_trigrams(normalize_title(query))
+        if not query_trigrams:
+            return []
+        trigrams = self._get_trigrams()
+        shared_counts = defaultdict(int)
+        for trigram in query_trigrams:
+            for title in trigrams.get(trigram, ()):
+                shared_counts[title] += 1
+
+        # Rank titles by Jaccard similarity of their trigram sets
+        scored_titles = []
+        for title, shared in shared_counts.items():
+            similarity = shared / (len(query_trigrams) + len(title_trigrams(title)) - shared)
+            if similarity >= min_similarity:
+                scored_titles.append((similarity, title))
+        scored_titles.sort(key=lambda item: (-item[0], item[1]))
+
+        tmdb_ids = []
+        for _, title in scored_titles:
+            tmdb_ids.extend(self.title_to_ids[title])
+            if len(tmdb_ids) >= limit:
+                break
+        return tmdb_ids[:limit]
+
+    # Build the trigram -> titles index the first time it is needed
+    def _get_trigrams(self):
+        with self._trigram_lock:
+            if self._trigrams is None:
+                trigrams = defaultdict(list)
+                for title in self.sorted_titles:
+                    for trigram in title_trigrams(title):
+                        trigrams[trigram].append(title)
+                self._trigrams = dict(trigrams)
+        return self._trigrams
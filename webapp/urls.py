@@ -70,5 +70,6 @@ urlpatterns = [
     path("rating/<str:profile_name>/", views.rating, name="user_rating"),
     path('director/<str:director_name>/', views.director, name='director'),
     path('actor/<str:actor_name>/', views.actor, name='actor'),
+    path('person_job/<str:job_id>/', views.person_job_status, name='person_job_status'),
     path('popup_help/', views.popup_help, name='popup_help'),
 ]
@@ -18,7 +18,9 @@ Any known faults: None.
 from django.shortcuts import render, redirect, get_object_or_404, resolve_url
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
+from webapp.page_cache import cache_anonymous_page, track_page_movies
 from django.http import JsonResponse, Http404
+from django.template.loader import render_to_string
 from django.contrib import messages
 from .models import Movie, Watchlist, WatchlistEntry, UserProfile, MovieRating
 from django.core.exceptions import ObjectDoesNotExist
@@ -37,10 +39,11 @@ from django.contrib.auth import login, logout, authenticate, get_user_model, pas
 import json
 import re
 import webapp.password_reset as pass_reset
+import webapp.hydration_queue as hydration_queue
 from django.utils.http import urlsafe_base64_decode
 from .services import *
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator, EmptyPage
+from webapp.pagination import KeysetPaginator
 import concurrent.futures
 import random
 import webbrowser
@@ -49,6 +52,7 @@ import webbrowser
 
 # Constants
 RECOMMENDED_MOVIES_COUNT = 12
+SEARCH_PREFIX_FETCH_LIMIT = 10  # Movies fetched for a 'movie:' search with no exact title match
 
 
 # View function for the index/home page
@@ -81,9 +85,9 @@ def index(request):
 
 
 # View function for the catalog page
+@cache_anonymous_page
 def catalog(request):
     context = {}
-    context['full_catalog'] = Movie.objects.all()
     context["genres"] = Genre.objects.all()
     context["streamers"] = StreamingProvider.objects.filter(name__in=filtered_providers)
 
@@ -104,60 +108,37 @@ def catalog(request):
             context['filter_imdb_begin'] = form.cleaned_data.get("imdb_begin")
             context['filter_imdb_end'] = form.cleaned_data.get("imdb_end")
 
-            # Apply filter
-            context['full_catalog'] = filter_movies(
-                context.get('full_catalog'),
-                context.get('filter_genre'),
-                context.get('filter_streamer'),
-                context.get('filter_year_begin'),
-                context.get('filter_year_end'),
-                context.get('filter_imdb_begin'),
-                context.get('filter_imdb_end'))
-
-            page_number = 1  # Get the page number from the request
-            paginator = Paginator(context['full_catalog'], 120)  # 120 movies per page
-
-            try:
-                page_obj = paginator.page(page_number)
-            except EmptyPage:
-                page_obj = paginator.page(paginator.num_pages)  # If page is out of range, deliver last page
-
-            context["page_obj"] = page_obj
+            # Apply filter, only the movies of the first page are loaded
+            movie_ids = filter_movie_ids(genre_ids, streamer_ids,
+                                         context.get('filter_year_begin'), context.get('filter_year_end'),
+                                         context.get('filter_imdb_begin'), context.get('filter_imdb_end'))
+            context["page_obj"] = paginate_movie_ids(movie_ids, 1)
+            track_page_movies(request, context["page_obj"])
             return render(request, 'catalog.html', context)
     
     # Use url query if it exist
-    genre_ids = request.GET.get("genre")
-    context['filter_genre'] = Genre.objects.filter(pk__in=genre_ids.split()) if genre_ids else context.get('full_genre')
-    streamer_ids = request.GET.get("streaming_provider")
-    context['filter_streamer'] = StreamingProvider.objects.filter(pk__in=streamer_ids.split()) if streamer_ids else context.get('filter_streamer')
+    genre_ids = [int(genre) for genre in request.GET.get("genre", "").split()]
+    context['filter_genre'] = Genre.objects.filter(pk__in=genre_ids) if genre_ids else None
+    streamer_ids = [int(streamer) for streamer in request.GET.get("streaming_provider", "").split()]
+    context['filter_streamer'] = StreamingProvider.objects.filter(pk__in=streamer_ids) if streamer_ids else None
     context['filter_year_begin'] = request.GET.get("year_begin")
     context['filter_year_end'] = request.GET.get("year_end")
     context['filter_imdb_begin'] = request.GET.get("imdb_begin")
     context['filter_imdb_end'] = request.GET.get("imdb_end")
 
     # Apply filter
-    context['full_catalog'] = filter_movies(
-        context.get('full_catalog'),
-        context.get('filter_genre'),
-        context.get('filter_streamer'),
-        context.get('filter_year_begin'),
-        context.get('filter_year_end'),
-        context.get('filter_imdb_begin'),
-        context.get('filter_imdb_end'))
+    movie_ids = filter_movie_ids(genre_ids, streamer_ids,
+                                 context.get('filter_year_begin'), context.get('filter_year_end'),
+                                 context.get('filter_imdb_begin'), context.get('filter_imdb_end'))
 
     page_number = request.GET.get('page', 1)  # Get the page number from the request
-    paginator = Paginator(context['full_catalog'], 120)  # 120 movies per page
-
-    try:
-        page_obj = paginator.page(page_number)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)  # If page is out of range, deliver last page
-
-    context["page_obj"] = page_obj
+    context["page_obj"] = paginate_movie_ids(movie_ids, page_number)  # 120 movies per page
+    track_page_movies(request, context["page_obj"])
     return render(request, 'catalog.html', context)
 
 
 # View function for the movie details page
+@cache_anonymous_page
 def movie_detail(request, movie_slug):
     ''' Handles the movie details pages where more information for a movie is all displayed. '''
     
@@ -165,15 +146,11 @@ def movie_detail(request, movie_slug):
     
     # Fetch recommended movies
     recommended_movies = movie.get_recommended_movies(RECOMMENDED_MOVIES_COUNT)
-    rt_rating = None
-    # Parse the Rotten Tomatoes rating to an integer
-    try:
-        rt_rating = int(movie.rotten_tomatoes_rating.split('%')[0])
-    except (ValueError, AttributeError):
-        pass
-    
+    # The recommendations that are not stored yet are shown once the hydration queue adds them
+    recommended_tmdb_ids = [movie_data.get('tmdb_id') for movie_data in movie.recommended_movie_data]
+    recommended_movies = track_page_movies(request, [movie, *recommended_movies], recommended_tmdb_ids)[1:]
     # Determine which icon to use based on the Rotten Tomatoes rating
-    movie.rt_icon = determine_rt_icon(rt_rating)
+    movie.rt_icon = determine_rt_icon(movie.rt_score)
     
     if request.method == 'POST':
             form = NewWatchlistForm(request.POST)
@@ -203,12 +180,13 @@ def movie_detail(request, movie_slug):
     if user.is_authenticated:
         context['watchlists'] = Watchlist.objects.filter(user=user)
 
-    context['director_slugs'] = get_person_slugs(movie.director)
-    context['director_names'] = get_person_names(movie.director)
+    directors, actors = get_credited_names(movie)
+    context['director_slugs'] = get_person_slugs(directors)
+    context['director_names'] = get_person_names(directors)
     context['directors_pairs'] = zip(context['director_slugs'], context['director_names'])
 
-    context['actor_slugs'] = get_person_slugs(movie.actors)
-    context['actor_names'] = get_person_names(movie.actors)
+    context['actor_slugs'] = get_person_slugs(actors)
+    context['actor_names'] = get_person_names(actors)
     context['actors_pairs'] = zip(context['actor_slugs'], context['actor_names'])
     context['filmfocus_rating'] = get_filmfocus_rating(movie)
     return render(request, 'details.html', context)
@@ -306,8 +284,10 @@ def watchlist(request, profile_name=None):
                     context["genres"] = Genre.objects.all().filter(movies__in=movie_list).distinct()
                     context["streamers"] = StreamingProvider.objects.all().filter(movies__in=movie_list).distinct()
 
-                    # Apply filter
-                    movie_list = filter_movies(movie_list, genre, streamer, year_begin, year_end, imdb_begin, imdb_end)
+                    # Apply filter, the filter index narrows the watchlist movies down to the matching ids
+                    movie_ids = filter_movie_ids(genre_ids, streamer_ids, year_begin, year_end, imdb_begin, imdb_end,
+                                                 movie_ids=movie_list.values_list('id', flat=True))
+                    movie_list = Movie.objects.filter(id__in=movie_ids)
 
                     # Setup Context for the frontend
                     context['filter_watchlist'] = watchlist
@@ -371,7 +351,7 @@ def searchBar(request):
                     shift += 1
                 movie_title = query[shift:]     # Remove the 'movie:' prefix
                 context['query'] = movie_title  
-                search_and_fetch_movie_by_title(movie_title)
+                search_and_fetch_movie_by_title(movie_title, prefix_limit=SEARCH_PREFIX_FETCH_LIMIT)
                 movies = Movie.objects.filter(title__icontains=movie_title)
                 context['searchedMovies'] = movies
                 return render(request, 'results.html', context)
@@ -384,12 +364,9 @@ def searchBar(request):
                 actor_slug_list = get_person_slugs(actor_name)
                 actor_slug = actor_slug_list[0]
 
-                person_id = get_person_id(actor_name)
-                if person_id:
-                    tmdb_ids = get_actor_movies_from_tmdb_to_fetch(person_id)
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                        executor.map(search_and_fetch_movie_by_id, tmdb_ids)
-                return redirect('actor', actor_slug)
+                # The movies are ingested in the background, the actor page polls the job and adds them as they arrive
+                job_id = hydration_queue.enqueue_job(get_person_movies_to_fetch, actor_name, Credit.ACTOR)
+                return redirect(f"{reverse('actor', args=[actor_slug])}?job={job_id}")
 
             elif query[0:9] == 'director:':
                 shift = 9
@@ -399,12 +376,9 @@ def searchBar(request):
                 director_slug_list = get_person_slugs(director_name)
                 director_slug = director_slug_list[0]
                 
-                person_id = get_person_id(director_name)
-                if person_id:
-                    tmdb_ids = get_director_movies_from_tmdb_to_fetch(person_id)
-                    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                        executor.map(search_and_fetch_movie_by_id, tmdb_ids)
-                return redirect('director', director_slug)
+                # The movies are ingested in the background, the director page polls the job and adds them as they arrive
+                job_id = hydration_queue.enqueue_job(get_person_movies_to_fetch, director_name, Credit.DIRECTOR)
+                return redirect(f"{reverse('director', args=[director_slug])}?job={job_id}")
             
             else:
                 movies = Movie.objects.filter(title__icontains=query)
@@ -461,35 +435,29 @@ def popup_rating(request, movie_id):
         return render(request, "popup_rating.html", context)
 
 
+# Filters of the random movie selection popups, from the url query
+def get_select_filters(request):
+    genre_ids = sorted(int(genre) for genre in request.GET.get("genre").split())
+    streamer_ids = sorted(int(streamer) for streamer in request.GET.get("streaming_provider").split())
+    return (genre_ids, streamer_ids, request.GET.get('year_begin'), request.GET.get('year_end'),
+            request.GET.get('imdb_begin'), request.GET.get('imdb_end'))
+
 # View function for the Watchlist random movie selection popup
 def popup_select_movie(request, watchlist_id):
     context = {}
     if request.method == 'GET':
         user = request.user
-        all_watchlists = Watchlist.objects.filter(user=user)
 
-        watchlist_movies = Movie.objects.none()  # Initialize an empty queryset
         if watchlist_id == 9999:    # 9999 is the default watchlist id for all watchlist
             context['all_watchlist'] = True
-            for watchlist in all_watchlists:
-                watchlist_movies |= Movie.objects.filter(watchlistentry__watchlist=watchlist).distinct()
+            watchlist_movies = Movie.objects.filter(watchlistentry__watchlist__user=user)
         else:
             watchlist_id_int = int(watchlist_id)
             watchlist = Watchlist.objects.get(pk=watchlist_id_int)
             watchlist_movies = Movie.objects.filter(watchlistentry__watchlist=watchlist)
 
-        genre_ids = [int(genre) for genre in request.GET.get("genre").split()]
-        genre = Genre.objects.filter(pk__in=genre_ids) if genre_ids else None
-        streamer_ids = [int(streamer) for streamer in request.GET.get("streaming_provider").split()]
-        streamer = StreamingProvider.objects.filter(pk__in=streamer_ids) if streamer_ids else None
-        year_begin = request.GET.get('year_begin')
-        year_end = request.GET.get('year_end')
-        imdb_begin = request.GET.get('imdb_begin')
-        imdb_end = request.GET.get('imdb_end')
-
-        filtered_movies = filter_movies(watchlist_movies, genre, streamer, year_begin, year_end, imdb_begin, imdb_end)
-        movies = random.sample(list(filtered_movies), min(len(filtered_movies), 3))
-        context['movies'] = movies
+        movie_ids = filter_movie_ids(*get_select_filters(request), movie_ids=watchlist_movies.values_list('id', flat=True))
+        context['movies'] = pick_random_movies(movie_ids)
 
     return render(request, "popup_select_movie.html", context)
 
@@ -497,24 +465,12 @@ def popup_select_movie(request, watchlist_id):
 def popup_catalog_select(request):
     context = {}
     if request.method == 'GET':
-        movies = Movie.objects.all()
-
-        genre_ids = [int(genre) for genre in request.GET.get("genre").split()]
-        genre = Genre.objects.filter(pk__in=genre_ids) if genre_ids else None
-        streamer_ids = [int(streamer) for streamer in request.GET.get("streaming_provider").split()]
-        streamer = StreamingProvider.objects.filter(pk__in=streamer_ids) if streamer_ids else None
-        year_begin = request.GET.get('year_begin')
-        year_end = request.GET.get('year_end')
-        imdb_begin = request.GET.get('imdb_begin')
-        imdb_end = request.GET.get('imdb_end')
-
-        movies = filter_movies(movies, genre, streamer, year_begin, year_end, imdb_begin, imdb_end).order_by('?')[:3]
-
-        context['movies'] = movies
+        context['movies'] = pick_random_movies(filter_movie_ids(*get_select_filters(request)))
 
     return render(request, "popup_catalog_select.html", context)
 
 # View function for the about page
+@cache_anonymous_page
 def about(request):
     context = {}
     user = request.user
@@ -857,6 +813,7 @@ def signup(request):
 
 
 # View function for the FAQ page
+@cache_anonymous_page
 def faq(request):
     context = {}
     user = request.user
@@ -952,7 +909,7 @@ def rating(request, profile_name):
         context['logged_in_user_profile_picture'] = get_logged_in_user_profile_picture(request)
 
     user = get_object_or_404(User, username=profile_name)
-    movie_ratings = MovieRating.objects.filter(user=user).select_related('movie').order_by(F('id').desc())
+    movie_ratings = MovieRating.objects.filter(user=user).select_related('movie')
     context['user_name'] = profile_name
     context['movie_ratings'] = movie_ratings
 
@@ -968,28 +925,21 @@ def rating(request, profile_name):
                                                       context['filter_rating_begin'], 
                                                       context['filter_rating_end'])
 
-            paginator = Paginator(context['movie_ratings'], 120)  # 120 movies per page
-            try:
-                page_obj = paginator.page(1)
-            except EmptyPage:
-                page_obj = paginator.page(paginator.num_pages)  # If page is out of range, deliver last page
-            context["page_obj"] = page_obj
+            paginator = KeysetPaginator(context['movie_ratings'], 120)  # 120 movies per page
+            context["page_obj"] = paginator.page(1)
 
             return render(request, 'rating.html', context)
 
-    paginator = Paginator(movie_ratings, 120)  # 120 movies per page
+    # Pages are read after or before the cursor of the current page, the count is cached until a rating changes
+    paginator = KeysetPaginator(movie_ratings, 120, count=get_cached_count(movie_ratings, f'ratings:{user.pk}'))
 
     page_number = request.GET.get('page', 1)  # Get the page number from the request
-    try:
-        page_obj = paginator.page(page_number)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)  # If page is out of range, deliver last page
-
-    context["page_obj"] = page_obj
+    context["page_obj"] = paginator.page(page_number, after=request.GET.get('after'), before=request.GET.get('before'))
 
     return render(request, 'rating.html', context)
 
 # View function for the directors pages
+@cache_anonymous_page
 def director(request, director_name):
     context = {}
     user = request.user
@@ -1001,11 +951,13 @@ def director(request, director_name):
         director_name = director_name.replace("--", "-")          # Handles double hypen into single hyphen
         
     context['director_name'] = director_name
-    context['movies'] = get_movies_by_director(director_name)
+    context['movies'] = track_page_movies(request, get_movies_by_director(director_name))
+    context['job_id'] = get_running_job_id(request)
 
     return render(request, "director.html", context)
 
 # View function for the actors pages
+@cache_anonymous_page
 def actor(request, actor_name):
     context = {}
     user = request.user
@@ -1017,15 +969,36 @@ def actor(request, actor_name):
         actor_name = actor_name.replace("--", "-")          # Handles double hypen into single hyphen
     
     context['actor_name'] = actor_name
-
-    person_id = get_person_id(actor_name)
-    if person_id:
-        context['movies'] = get_movies_from_tmdb_by_actor(person_id)
-    else:
-        context['movies'] = get_movies_by_actor(actor_name)
+    context['movies'] = track_page_movies(request, get_movies_by_actor(actor_name))
+    context['job_id'] = get_running_job_id(request)
 
     return render(request, "actor.html", context)
 
+# Id of the search job of an actor or director page (the job parameter), if the job is still running
+def get_running_job_id(request):
+    job_id = request.GET.get('job')
+    status = hydration_queue.job_status(job_id) if job_id else None
+    return job_id if status and not status['done'] else None
+
+# View function for the status of an actor:/director: search job, polled by the actor and director pages
+# Returns the cards of the movies of the job ingested so far, except the ones whose TMDB ids are in known
+def person_job_status(request, job_id):
+    status = hydration_queue.job_status(job_id)
+    if status is None:
+        return JsonResponse({'status': 'error', 'message': 'Job not found.'}, status=404)
+
+    known_ids = {int(tmdb_id) for tmdb_id in request.GET.get('known', '').split(',') if tmdb_id.isdigit()}
+    new_ids = [tmdb_id for tmdb_id in status['tmdb_ids'] if tmdb_id not in known_ids]
+    movies = Movie.objects.filter(tmdb_id__in=new_ids).order_by('release_date') \
+                          .prefetch_related('genres', 'top_streaming_providers')
+    return JsonResponse({
+        'status': 'done' if status['done'] else 'running',
+        'pending': status['pending'],
+        'movies': [{'tmdb_id': movie.tmdb_id,
+                    'html': render_to_string('person_movie_cards.html', {'movies': [movie]}, request)}
+                   for movie in movies],
+    })
+
 
 # View function for getting refreshed movie data for a specific movie
 def refresh_movie_data(request, tmdb_id):